@@ -0,0 +1,84 @@
+"""
+Benchmark the calculator's expression engine against plain `eval`.
+
+Two workloads are timed:
+
+- scalar: the same expression evaluated repeatedly, as the calculator
+  tool does. `eval` reparses it every call; the engine compiles it once.
+- series: one formula over a series of transaction amounts. `eval` runs
+  once per amount; the engine evaluates the series with NumPy in one call.
+
+    python -m benchmarks.bench_calculator --calls 20000 --series 100000
+"""
+
+import argparse
+import random
+import time
+
+from oracle_server.tools.expression import compile_expression, evaluate
+
+DEFAULT_CALLS = 20000
+DEFAULT_SERIES = 100000
+SCALAR_EXPRESSION = "(1250.75 - 310.2) * 1.0825 / 12 + 3 ** 2"
+SERIES_EXPRESSION = "round(amount * (1 + rate) - fee, 2)"
+
+
+def time_scalar(calls: int) -> dict[str, float]:
+    """Return the time per call of each path, in microseconds."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        eval(SCALAR_EXPRESSION)  # pylint: disable=eval-used
+    eval_us = (time.perf_counter() - start) / calls * 1e6
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        evaluate(SCALAR_EXPRESSION)
+    engine_us = (time.perf_counter() - start) / calls * 1e6
+    return {"eval_us": eval_us, "engine_us": engine_us}
+
+
+def time_series(size: int) -> dict[str, float]:
+    """Return the time to evaluate the formula over a series, in milliseconds."""
+    amounts = [round(random.uniform(1, 5000), 2) for _ in range(size)]
+
+    start = time.perf_counter()
+    expected = [
+        eval(  # pylint: disable=eval-used
+            SERIES_EXPRESSION,
+            {"round": round},
+            {"amount": a, "rate": 0.0825, "fee": 0.3},
+        )
+        for a in amounts
+    ]
+    eval_ms = (time.perf_counter() - start) * 1000
+
+    compiled = compile_expression(SERIES_EXPRESSION)
+    start = time.perf_counter()
+    result = compiled.evaluate(amount=amounts, rate=0.0825, fee=0.3)
+    engine_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = sum(abs(a - b) > 0.011 for a, b in zip(expected, result))
+    return {"eval_ms": eval_ms, "engine_ms": engine_ms, "mismatches": mismatches}
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--calls", type=int, default=DEFAULT_CALLS)
+    parser.add_argument("--series", type=int, default=DEFAULT_SERIES)
+    args = parser.parse_args()
+
+    scalar = time_scalar(args.calls)
+    print(f"scalar, {args.calls} calls of {SCALAR_EXPRESSION!r}")
+    print(f"  eval:   {scalar['eval_us']:>10.2f} us/call")
+    print(f"  engine: {scalar['engine_us']:>10.2f} us/call")
+
+    series = time_series(args.series)
+    print(f"series of {args.series} amounts, {SERIES_EXPRESSION!r}")
+    print(f"  eval:   {series['eval_ms']:>10.2f} ms")
+    print(f"  engine: {series['engine_ms']:>10.2f} ms")
+    print(f"  results differing by over a cent: {series['mismatches']}")
+
+
+if __name__ == "__main__":
+    main()
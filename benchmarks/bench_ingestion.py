@@ -0,0 +1,159 @@
+"""
+Benchmark ingestion throughput against the number of worker processes.
+
+A synthetic data lake of transaction records is ingested into a fresh
+`NumpyVectorStore`, first in this process and then on embedding pools of
+increasing size. The script reports records per second and the speedup
+over one process.
+
+The embedding model is a stand-in whose cost is CPU-bound Python holding
+the GIL, like tokenization and the per-batch overhead of a real model, so
+the numbers measure how work spreads over cores rather than a model:
+
+    python -m benchmarks.bench_ingestion --records 20000 --workers 1 2 4 8
+"""
+
+import argparse
+import functools
+import hashlib
+import os
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from oracle_server.ingestion import EmbeddingPool, ingest
+from oracle_server.vectorstore import NumpyVectorStore
+
+DEFAULT_RECORDS = 10_000
+DEFAULT_DIM = 384
+# Hash rounds per text, which sets the cost of one embedding.
+DEFAULT_ROUNDS = 5000
+DEFAULT_WRITE_BATCH_SIZE = 256
+MODEL = "BAAI/bge-small-en-v1.5"
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeds texts by repeatedly hashing them, one text at a time."""
+
+    def __init__(self, dim: int = DEFAULT_DIM, rounds: int = DEFAULT_ROUNDS):
+        self._dim = dim
+        self._rounds = rounds
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        digest = text.encode()
+        for _ in range(self._rounds):
+            digest = hashlib.sha256(digest).digest()
+        seed = int.from_bytes(digest[:8], "little")
+        return np.random.default_rng(seed).normal(size=self._dim).tolist()
+
+
+class Cursor(list):
+    """A cursor over a list of records."""
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+class Collection:  # pylint: disable=too-few-public-methods
+    """A collection of records in memory."""
+
+    def __init__(self, records: list[dict]):
+        self._records = records
+
+    def find(self, *_args, **_kwargs) -> Cursor:
+        """Return a cursor over every record."""
+        return Cursor(self._records)
+
+
+class DataLake:
+    """An in-memory stand-in for a pymongo `Database`."""
+
+    def __init__(self, collections: dict[str, list[dict]]):
+        self._collections = collections
+
+    def list_collection_names(self) -> list[str]:
+        """Return the collection names."""
+        return list(self._collections)
+
+    def __getitem__(self, name: str) -> Collection:
+        return Collection(self._collections[name])
+
+
+def synthetic_data_lake(records: int, collections: int = 4) -> DataLake:
+    """Return a data lake of transaction records spread over collections."""
+    rng = np.random.default_rng(0)
+    merchants = ["Coffee shop", "Grocery store", "Gas station", "Bookstore", "Gym"]
+    rows = [
+        {
+            "_id": i,
+            "TransactionId": f"t-{i}",
+            "UtcTimestamp": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00Z",
+            "Description": f"{merchants[i % len(merchants)]} #{rng.integers(1000)}",
+            "Amount": round(float(rng.gamma(2, 20)), 2),
+        }
+        for i in range(records)
+    ]
+    return DataLake(
+        {f"chase-data-{c}": rows[c::collections] for c in range(collections)}
+    )
+
+
+def run(data_lake: DataLake, dim: int, rounds: int, workers: int) -> float:
+    """
+    Ingest the data lake into a fresh store and return records per second.
+    With 0 workers, ingest in this process.
+    """
+    with tempfile.TemporaryDirectory() as data_dir, patch(
+        "oracle_server.vectorstore.embeddings",
+        return_value=HashingEmbeddings(dim, rounds),
+    ):
+        store = NumpyVectorStore(model=MODEL, data_dir=data_dir, collection="bench")
+        if workers == 0:
+            stats = ingest(data_lake, store, write_batch_size=DEFAULT_WRITE_BATCH_SIZE)
+        else:
+            load_model = functools.partial(HashingEmbeddings, dim, rounds)
+            with EmbeddingPool(load_model, workers) as pool:
+                stats = ingest(
+                    data_lake,
+                    store,
+                    write_batch_size=DEFAULT_WRITE_BATCH_SIZE,
+                    pool=pool,
+                )
+    return stats.records / stats.seconds
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="Pool sizes to compare with ingesting in this process.",
+    )
+    args = parser.parse_args()
+
+    data_lake = synthetic_data_lake(args.records)
+    results = {
+        workers: run(data_lake, args.dim, args.rounds, workers)
+        for workers in [0, *args.workers]
+    }
+
+    print(f"{args.records} records, dim={args.dim}, {os.cpu_count()} cores")
+    print(f"{'workers':<12}{'records/s':>12}{'speedup':>10}")
+    for workers, rate in results.items():
+        name = "in-process" if workers == 0 else str(workers)
+        print(f"{name:<12}{rate:>12.0f}{rate / results[0]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark compact indexes of `NumpyVectorStore`: memory versus recall.
+
+One synthetic collection is stored once, then reopened with each
+quantization and re-scoring factor. For each, the script reports the
+memory a search scans, per-query latency, and recall@k against an exact
+brute-force ranking:
+
+    python -m benchmarks.bench_quantization --docs 100000 --queries 200
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.bench_vectorstore import (
+    DEFAULT_DIM,
+    DEFAULT_DOCS,
+    DEFAULT_QUERIES,
+    DEFAULT_TOP_K,
+    MODEL,
+    synthetic_workload,
+)
+from oracle_server.vectorstore import EmbeddingCache, NumpyVectorStore
+
+# (quantization, rescore factor) pairs to compare.
+CONFIGURATIONS = [
+    (None, 1),
+    ("int8", 1),
+    ("int8", 4),
+    ("binary", 1),
+    ("binary", 4),
+    ("binary", 16),
+]
+
+
+def run(store: NumpyVectorStore, queries: list[str], truth: list, k: int) -> dict:
+    """Time each query and score the results against the exact ranking."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        records = store.similarity_search(query, top_k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({int(doc.id) for doc, _ in records} & expected)
+    return {
+        "index_mb": store.index_bytes / 2**20,
+        "p50_ms": statistics.median(latencies),
+        "recall": hits / (k * len(queries)),
+    }
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--docs", type=int, default=DEFAULT_DOCS)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args()
+
+    workload = synthetic_workload(args.docs, args.queries, args.dim, args.k)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir, patch(
+        "oracle_server.vectorstore.embeddings", return_value=workload.embeddings
+    ):
+        NumpyVectorStore(
+            model=MODEL, data_dir=data_dir, collection="bench"
+        ).add_documents(workload.documents)
+        for quantization, rescore_factor in CONFIGURATIONS:
+            store = NumpyVectorStore(
+                model=MODEL,
+                data_dir=data_dir,
+                collection="bench",
+                embedding_cache=EmbeddingCache(),
+                quantization=quantization,
+                rescore_factor=rescore_factor,
+            )
+            name = f"{quantization or 'float32'} x{rescore_factor}"
+            results[name] = run(store, workload.queries, workload.truth, args.k)
+
+    print(f"{args.docs} docs, {args.queries} queries, dim={args.dim}, k={args.k}")
+    columns = ["index_mb", "p50_ms", "recall"]
+    print(f"{'index':<14}" + "".join(f"{column:>10}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:<14}" + "".join(f"{row[column]:>10.3f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark `NumpyVectorStore` against `ChromaVectorStore`.
+
+Both stores index the same synthetic corpus of clustered, unit-length
+embeddings and answer the same queries. The script reports build time,
+per-query search latency, the per-query cost of one batched search over
+all queries, and recall@k against an exact brute-force ranking.
+
+Embeddings come from a lookup table rather than a real model, so the
+numbers measure the index alone:
+
+    python -m benchmarks.bench_vectorstore --docs 50000 --queries 200
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from unittest.mock import patch
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from oracle_server.vectorstore import (
+    ChromaVectorStore,
+    EmbeddingCache,
+    NumpyVectorStore,
+    VectorStore,
+)
+
+DEFAULT_DOCS = 20_000
+DEFAULT_QUERIES = 200
+DEFAULT_DIM = 384
+DEFAULT_TOP_K = 5
+# Chroma rejects larger single writes.
+CHROMA_WRITE_BATCH = 5000
+MODEL = "BAAI/bge-small-en-v1.5"
+
+
+class LookupEmbeddings(Embeddings):
+    """Embeds texts by looking up precomputed vectors."""
+
+    def __init__(self, vectors: dict[str, list[float]]):
+        self._vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vectors[text]
+
+
+def synthetic_corpus(
+    docs: int, queries: int, dim: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return unit-length document and query vectors drawn around shared centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(max(docs // 100, 1), dim))
+
+    def sample(count: int) -> np.ndarray:
+        points = centroids[rng.integers(len(centroids), size=count)]
+        points = points + 0.5 * rng.normal(size=(count, dim))
+        return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(
+            np.float32
+        )
+
+    return sample(docs), sample(queries)
+
+
+@dataclass
+class Workload:
+    """A synthetic corpus and queries, with the exact top k of each query."""
+
+    embeddings: LookupEmbeddings
+    documents: list[Document]
+    queries: list[str]
+    truth: list
+
+
+def synthetic_workload(docs: int, queries: int, dim: int, k: int) -> Workload:
+    """Return a synthetic corpus whose texts embed to clustered vectors."""
+    doc_vectors, query_vectors = synthetic_corpus(docs, queries, dim)
+    doc_texts = [f"doc {i}" for i in range(docs)]
+    query_texts = [f"query {i}" for i in range(queries)]
+    vectors = dict(zip(doc_texts, doc_vectors.tolist()))
+    vectors.update(zip(query_texts, query_vectors.tolist()))
+    return Workload(
+        embeddings=LookupEmbeddings(vectors),
+        documents=[
+            Document(page_content=text, id=str(i)) for i, text in enumerate(doc_texts)
+        ],
+        queries=query_texts,
+        truth=exact_top_k(doc_vectors, query_vectors, k),
+    )
+
+
+def exact_top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> list:
+    """Return the ids of each query's true top k documents."""
+    similarities = query_vectors @ doc_vectors.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in similarities]
+
+
+def run(
+    store: VectorStore,
+    documents: list[Document],
+    queries: list[str],
+    truth: list,
+    k: int,
+) -> dict:
+    """Index the documents, then time each query and score it against the exact ranking."""
+    start = time.perf_counter()
+    for i in range(0, len(documents), CHROMA_WRITE_BATCH):
+        store.add_documents(documents[i : i + CHROMA_WRITE_BATCH])
+    build_seconds = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        records = store.similarity_search(query, top_k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({int(doc.id) for doc, _ in records} & expected)
+    latencies.sort()
+    start = time.perf_counter()
+    store.similarity_search_batch(queries, top_k=k)
+    batch_ms = (time.perf_counter() - start) * 1000
+    return {
+        "build_s": build_seconds,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "batch_ms": batch_ms / len(queries),
+        "recall": hits / (k * len(queries)),
+    }
+
+
+def main():
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--docs", type=int, default=DEFAULT_DOCS)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args()
+
+    workload = synthetic_workload(args.docs, args.queries, args.dim, args.k)
+
+    with tempfile.TemporaryDirectory() as data_dir, patch(
+        "oracle_server.vectorstore.embeddings", return_value=workload.embeddings
+    ):
+        stores: dict[str, VectorStore] = {
+            "chroma": ChromaVectorStore(
+                model=MODEL,
+                sqlite_dir=f"{data_dir}/chroma",
+                collection="bench",
+                embedding_cache=EmbeddingCache(),
+            ),
+            "numpy": NumpyVectorStore(
+                model=MODEL,
+                data_dir=f"{data_dir}/numpy",
+                collection="bench",
+                embedding_cache=EmbeddingCache(),
+            ),
+        }
+        results = {
+            name: run(
+                store, workload.documents, workload.queries, workload.truth, args.k
+            )
+            for name, store in stores.items()
+        }
+
+    print(f"{args.docs} docs, {args.queries} queries, dim={args.dim}, k={args.k}")
+    columns = ["build_s", "p50_ms", "p95_ms", "batch_ms", "recall"]
+    print(f"{'store':<8}" + "".join(f"{column:>10}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:<8}" + "".join(f"{row[column]:>10.3f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
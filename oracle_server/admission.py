@@ -0,0 +1,314 @@
+"""
+Admission control for LLM backends.
+
+A model server answers a few generations at a time; requests beyond that
+only queue inside it, and latency grows until clients time out. An
+`AdmissionController` in front of each backend lets at most
+`max_concurrent` requests through at once and queues the rest in order.
+
+A request which would wait longer than `max_queue_seconds`, judging by
+the queue ahead of it and how long recent requests took, is rejected up
+front instead, with the number of seconds after which a retry is likely
+to be admitted. The controller reports its queue depth and queue times.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Any, TypeVar
+
+from oracle_server.error import OverloadedError
+from oracle_server.event_loop import aclose
+
+_LOGGER = logging.getLogger()
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_MAX_QUEUE = 64
+# Requests expected to wait longer than this are rejected.
+DEFAULT_MAX_QUEUE_SECONDS = 10.0
+# Service time assumed until requests have been timed.
+DEFAULT_SERVICE_SECONDS = 2.0
+# Weight of the latest request in the moving averages.
+DEFAULT_EWMA_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class AdmissionSettings:
+    """
+    Limits of the admission controller of each backend.
+    """
+
+    max_concurrent: int = DEFAULT_MAX_CONCURRENT
+    max_queue: int = DEFAULT_MAX_QUEUE
+    max_queue_seconds: float = DEFAULT_MAX_QUEUE_SECONDS
+
+
+class Admission:
+    """
+    A request let into the queue of an `AdmissionController`. It holds a
+    slot from when `wait` returns until `release`; use it as an async
+    context manager.
+    """
+
+    def __init__(self, controller: "AdmissionController", slot: Future[None]):
+        self._controller = controller
+        self._slot = slot
+        self._queued_at = controller.clock()
+        self._started_at: float | None = None
+        self._released = False
+        self._lock = threading.Lock()
+
+    async def wait(self) -> None:
+        """
+        Wait for a slot.
+        """
+        try:
+            await asyncio.wrap_future(self._slot)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        self._started_at = self._controller.clock()
+        self._controller.record_wait(self._started_at - self._queued_at)
+
+    def release(self) -> None:
+        """
+        Give the slot back, or leave the queue if it was not granted yet.
+        Only the first call has an effect.
+        """
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller.release(self._slot, self._started_at)
+
+    async def __aenter__(self) -> "Admission":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    async def run(self, work: Callable[[], Awaitable[T]]) -> T:
+        """
+        Wait for a slot, then run work in it.
+
+        :param work: Returns the awaitable to run.
+        :return: Its result.
+        """
+        async with self:
+            return await work()
+
+    async def iterate(self, items: AsyncIterator[T]) -> AsyncIterator[T]:
+        """
+        Wait for a slot, then drain an async iterator in it. The iterator is
+        closed when this one is, even if it was not drained.
+
+        :param items: The iterator, e.g. a token stream.
+        :return: The same items.
+        """
+        async with self:
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                await aclose(items)
+
+
+# pylint: disable=too-many-instance-attributes
+class AdmissionController:
+    """
+    A concurrency limit with a bounded FIFO queue and queue-time-based
+    load shedding. Safe to use from any thread and event loop.
+    """
+
+    def __init__(
+        self,
+        settings: AdmissionSettings | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Constructor.
+
+        :param settings: Limits. Defaults to `AdmissionSettings()`.
+        :param clock: Monotonic clock, in seconds.
+        """
+        self._settings = settings or AdmissionSettings()
+        self.clock = clock
+        self._active = 0
+        self._waiting: deque[Future[None]] = deque()
+        self._service_seconds = DEFAULT_SERVICE_SECONDS
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._admitted = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self) -> AdmissionSettings:
+        """
+        Return the limits.
+
+        :return: The settings.
+        """
+        return self._settings
+
+    def admit(self) -> Admission:
+        """
+        Let a request into the queue, or reject it if the queue is full or
+        it would wait too long.
+
+        :return: The admission, which still has to wait for its slot.
+        :raise: OverloadedError - If the request is rejected.
+        """
+        slot: Future[None] = Future()
+        with self._lock:
+            expected_wait = self.__expected_wait()
+            if self._active < self._settings.max_concurrent and not self._waiting:
+                self._active += 1
+                slot.set_result(None)
+            elif (
+                len(self._waiting) >= self._settings.max_queue
+                or expected_wait > self._settings.max_queue_seconds
+            ):
+                self._rejected += 1
+                retry_after = max(1, math.ceil(expected_wait))
+                raise OverloadedError(
+                    message=(
+                        f"Backend overloaded: {len(self._waiting)} requests queued, "
+                        f"expected wait {expected_wait:.1f}s"
+                    ),
+                    retry_after=retry_after,
+                )
+            else:
+                self._waiting.append(slot)
+            self._admitted += 1
+        return Admission(self, slot)
+
+    def release(self, slot: Future[None], started_at: float | None) -> None:
+        """
+        Release a slot, handing it to the next queued request, or remove a
+        request from the queue. Called by `Admission.release`.
+
+        :param slot: The admission's slot.
+        :param started_at: When the slot was granted, or None if it was not.
+        """
+        with self._lock:
+            if started_at is None:
+                if slot in self._waiting:
+                    self._waiting.remove(slot)
+                    slot.cancel()
+                    return
+                if slot.cancelled():
+                    # Skipped over when it was its turn.
+                    return
+                # Otherwise the slot was granted, but nobody waited on it.
+            else:
+                self.__record_service(self.clock() - started_at)
+            while self._waiting:
+                waiter = self._waiting.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self._active -= 1
+
+    def record_wait(self, seconds: float) -> None:
+        """
+        Record how long a request waited for its slot.
+
+        :param seconds: Queue time.
+        """
+        with self._lock:
+            self._wait_seconds += DEFAULT_EWMA_ALPHA * (seconds - self._wait_seconds)
+            self._max_wait_seconds = max(self._max_wait_seconds, seconds)
+
+    def stats(self) -> dict[str, float]:
+        """
+        Return the controller's state and counters.
+
+        :return: Requests running and queued, queue times, and totals.
+        """
+        with self._lock:
+            return {
+                "max_concurrent": self._settings.max_concurrent,
+                "active": self._active,
+                "queued": len(self._waiting),
+                "expected_wait_seconds": self.__expected_wait(),
+                "avg_wait_seconds": self._wait_seconds,
+                "max_wait_seconds": self._max_wait_seconds,
+                "avg_service_seconds": self._service_seconds,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+            }
+
+    def __expected_wait(self) -> float:
+        """
+        Return how long a request arriving now would wait for a slot. Call
+        with the lock held.
+        """
+        if self._active < self._settings.max_concurrent and not self._waiting:
+            return 0.0
+        ahead = len(self._waiting) + 1
+        return ahead * self._service_seconds / max(1, self._settings.max_concurrent)
+
+    def __record_service(self, seconds: float) -> None:
+        """Update the average service time. Call with the lock held."""
+        self._service_seconds += DEFAULT_EWMA_ALPHA * (seconds - self._service_seconds)
+
+
+_SETTINGS = AdmissionSettings()
+_CONTROLLERS: dict[str, AdmissionController] = {}
+_CONTROLLERS_LOCK = threading.Lock()
+
+
+def configure_admission(settings: AdmissionSettings) -> None:
+    """
+    Set the limits of backends' admission controllers. Controllers which
+    already exist are replaced.
+
+    :param settings: Limits.
+    """
+    global _SETTINGS  # pylint: disable=global-statement
+    with _CONTROLLERS_LOCK:
+        _SETTINGS = settings
+        _CONTROLLERS.clear()
+    _LOGGER.info(f"Admission control: {settings}")
+
+
+def admission_controller(backend: str, replicas: int = 1) -> AdmissionController:
+    """
+    Return the admission controller of a backend, creating it on first use.
+
+    :param backend: Backend name, e.g. the model server url.
+    :param replicas: Servers behind the backend, e.g. of a load balanced
+                     pool. The concurrency and queue limits are per server.
+    :return: The controller.
+    """
+    with _CONTROLLERS_LOCK:
+        controller = _CONTROLLERS.get(backend)
+        if controller is None:
+            settings = replace(
+                _SETTINGS,
+                max_concurrent=_SETTINGS.max_concurrent * replicas,
+                max_queue=_SETTINGS.max_queue * replicas,
+            )
+            controller = _CONTROLLERS[backend] = AdmissionController(settings)
+        return controller
+
+
+def admission_stats() -> Mapping[str, dict[str, float]]:
+    """
+    Return the stats of every backend's admission controller.
+
+    :return: Stats by backend.
+    """
+    with _CONTROLLERS_LOCK:
+        controllers = dict(_CONTROLLERS)
+    return {backend: c.stats() for backend, c in controllers.items()}
@@ -7,6 +7,7 @@ import sys
 import datetime as dt
 from pathlib import Path
 from typing import Any
+from a2wsgi import WSGIMiddleware
 from connexion import FlaskApp  # type: ignore
 from connexion.middleware import MiddlewarePosition
 from starlette.middleware.cors import CORSMiddleware
@@ -14,14 +15,22 @@ from werkzeug.exceptions import NotFound
 
 from flask import request, jsonify
 
+from oracle_server.admission import AdmissionSettings, configure_admission
+from oracle_server.backend_pool import BackendPoolSettings, configure_backend_pools
 from oracle_server.config.config import (
     update_config_from_environment,
     update_config_from_secrets,
 )
+from oracle_server.handlers.registry import setup_handler_registry
 from oracle_server.health import setup_health_route
+from oracle_server.http_client import HttpPoolSettings, shared_http_pool
 from oracle_server.logger import logs
+from oracle_server.metrics import setup_metrics_route
+from oracle_server.embedding_backends import configure_embedding_backend
+from oracle_server.vectorstore import shared_embedding_cache
 
 DEFAULT_SWAGGER_API_SOURCE = "_api.yml"
+DEFAULT_WSGI_THREADS = 64
 
 
 def create_app() -> FlaskApp:
@@ -60,6 +69,12 @@ def create_app() -> FlaskApp:
     flask_app = app.app
     _setup_logging(app)
     _setup_config(app)
+    _setup_wsgi_threads(app)
+    _setup_embedding_cache(app)
+    _setup_embedding_backend(app)
+    _setup_http_pool(app)
+    _setup_admission(app)
+    _setup_backend_pools(app)
 
     cors_origins = flask_app.config.get("CORS_ORIGINS", "http://localhost:3000").split(
         ","
@@ -68,6 +83,8 @@ def create_app() -> FlaskApp:
     # CORS(app.app, resources={r"/api/*": {"origins": cors_origins}})
 
     setup_health_route(flask_app)
+    setup_metrics_route(flask_app)
+    setup_handler_registry(flask_app)
     _setup_http_error_handling(app)
 
     return app
@@ -199,3 +216,119 @@ def _setup_config(app: FlaskApp):
     update_config_from_environment(config)
     update_config_from_secrets(config)
     app.app.config.from_mapping(config)
+
+
+def _setup_wsgi_threads(app: FlaskApp):
+    """
+    Size the thread pool connexion serves the Flask app from.
+
+    Chat requests hand their work to the shared chat loop and only hold a
+    WSGI thread while they wait, so this pool, rather than the model, bounds
+    how many chats a worker has in flight.
+
+    Connexion has no option for the pool's size, so its `WSGIMiddleware` is
+    replaced. This relies on connexion internals, which is why connexion is
+    pinned to a minor version; if they change, connexion's default pool is
+    kept and a warning logged.
+
+    :param app: The connexion app.
+    """
+    threads = app.app.config.get("WSGI_THREADS", DEFAULT_WSGI_THREADS)
+    app.app.logger.debug(f"WSGI_THREADS: {threads}")
+    middleware_app = getattr(app, "_middleware_app", None)
+    if middleware_app is None or not isinstance(
+        getattr(middleware_app, "asgi_app", None), WSGIMiddleware
+    ):
+        app.app.logger.warning(
+            "Connexion no longer serves Flask through a2wsgi's WSGIMiddleware, "
+            "WSGI_THREADS is ignored"
+        )
+        return
+    middleware_app.asgi_app = WSGIMiddleware(app.app.wsgi_app, workers=threads)
+
+
+def _setup_embedding_cache(app: FlaskApp):
+    """
+    Size the process-wide query embedding cache.
+
+    :param app: The connexion app.
+    """
+    cache_mb = app.app.config.get("EMBEDDING_CACHE_MB")
+    if cache_mb is not None:
+        app.app.logger.debug(f"EMBEDDING_CACHE_MB: {cache_mb}")
+        shared_embedding_cache().resize(cache_mb * 1024 * 1024)
+
+
+def _setup_embedding_backend(app: FlaskApp):
+    """
+    Apply the configured CPU threads and batch size to the embedding backend.
+
+    :param app: The connexion app.
+    """
+    config = app.app.config
+    model = config.get("EMBEDDING_MODEL")
+    if model is None:
+        return
+    backend = configure_embedding_backend(
+        model,
+        threads=config.get("EMBEDDING_THREADS") or None,
+        batch_size=config.get("EMBEDDING_ENCODE_BATCH_SIZE"),
+    )
+    app.app.logger.debug(f"Embedding backend: {backend}")
+
+
+def _setup_http_pool(app: FlaskApp):
+    """
+    Apply the configured limits and timeouts to the HTTP connection pool
+    the LLM backends share.
+
+    :param app: The connexion app.
+    """
+    config = app.app.config
+    if config.get("LLM_HTTP_MAX_CONNECTIONS") is None:
+        return
+    settings = HttpPoolSettings(
+        max_connections=config["LLM_HTTP_MAX_CONNECTIONS"],
+        max_keepalive_connections=config["LLM_HTTP_MAX_KEEPALIVE"],
+        keepalive_expiry=config["LLM_HTTP_KEEPALIVE_SECONDS"],
+        connect_timeout=config["LLM_HTTP_CONNECT_TIMEOUT"],
+        read_timeout=config["LLM_HTTP_READ_TIMEOUT"],
+        http2=config["LLM_HTTP2"],
+    )
+    shared_http_pool().configure(settings)
+
+
+def _setup_admission(app: FlaskApp):
+    """
+    Apply the configured concurrency and queue limits to each LLM backend.
+
+    :param app: The connexion app.
+    """
+    config = app.app.config
+    if config.get("LLM_MAX_CONCURRENCY") is None:
+        return
+    configure_admission(
+        AdmissionSettings(
+            max_concurrent=config["LLM_MAX_CONCURRENCY"],
+            max_queue=config["LLM_MAX_QUEUE"],
+            max_queue_seconds=config["LLM_MAX_QUEUE_SECONDS"],
+        )
+    )
+
+
+def _setup_backend_pools(app: FlaskApp):
+    """
+    Apply the configured health tracking settings to LLM backend pools.
+
+    :param app: The connexion app.
+    """
+    config = app.app.config
+    if config.get("LLM_BACKEND_EJECT_FAILURES") is None:
+        return
+    configure_backend_pools(
+        BackendPoolSettings(
+            eject_failures=config["LLM_BACKEND_EJECT_FAILURES"],
+            eject_seconds=config["LLM_BACKEND_EJECT_SECONDS"],
+            slow_seconds=config["LLM_BACKEND_SLOW_SECONDS"],
+        )
+    )
@@ -0,0 +1,321 @@
+"""
+Load balancing over a pool of OpenAI-compatible LLM backends.
+
+A handler may send its model requests to several inference servers.
+`BackendPool` picks one per request: the healthy backend with the fewest
+requests outstanding, so slow backends receive less traffic and a backend
+which just finished a request gets the next one.
+
+Health is tracked passively from the requests themselves. A backend whose
+last `eject_failures` requests all failed, or took longer than
+`slow_seconds`, is ejected from the pool for `eject_seconds`. When every
+backend is ejected, requests go to the one due back soonest rather than
+failing outright.
+
+Each backend keeps a histogram of its request latencies.
+"""
+
+import bisect
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+_LOGGER = logging.getLogger()
+
+# Consecutive failed or slow requests after which a backend is ejected.
+DEFAULT_EJECT_FAILURES = 3
+DEFAULT_EJECT_SECONDS = 30.0
+# Requests which take longer than this count as failures.
+DEFAULT_SLOW_SECONDS = 60.0
+# Upper bounds of the latency histogram buckets, in seconds.
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@dataclass(frozen=True)
+class BackendPoolSettings:
+    """
+    Health tracking settings of backend pools.
+    """
+
+    eject_failures: int = DEFAULT_EJECT_FAILURES
+    eject_seconds: float = DEFAULT_EJECT_SECONDS
+    slow_seconds: float = DEFAULT_SLOW_SECONDS
+
+
+class LatencyHistogram:
+    """
+    Counts of latencies in fixed buckets. Not thread-safe on its own.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Constructor.
+
+        :param buckets: Ascending upper bounds of the buckets, in seconds.
+                        Latencies above the last go in an overflow bucket.
+        """
+        self._bounds = list(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        """
+        Return the number of latencies observed.
+
+        :return: Count.
+        """
+        return sum(self._counts)
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record a latency.
+
+        :param seconds: The latency.
+        """
+        self._counts[bisect.bisect_left(self._bounds, seconds)] += 1
+        self._sum += seconds
+        self._max = max(self._max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in,
+        or the largest latency observed if that is lower.
+
+        :param q: Quantile, between 0 and 1.
+        :return: Seconds, or 0 if nothing was observed.
+        """
+        count = self.count
+        if count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q * count))
+        seen = 0
+        for bound, bucket in zip([*self._bounds, math.inf], self._counts):
+            seen += bucket
+            if seen >= rank:
+                return min(bound, self._max)
+        return self._max
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Return the cumulative bucket counts, keyed by upper bound, with the
+        count, sum and estimated median and 95th percentile.
+
+        :return: Histogram data.
+        """
+        cumulative: dict[str, int] = {}
+        seen = 0
+        for bound, bucket in zip([*self._bounds, math.inf], self._counts):
+            seen += bucket
+            cumulative["+Inf" if bound == math.inf else str(bound)] = seen
+        return {
+            "buckets": cumulative,
+            "count": seen,
+            "sum": self._sum,
+            "max": self._max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+# pylint: disable=too-many-instance-attributes
+class _Backend:  # pylint: disable=too-few-public-methods
+    """The load and health of one backend."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.latency = LatencyHistogram()
+
+    def stats(self, now: float) -> dict[str, Any]:
+        """Return the backend's counters."""
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "ejected": self.ejected_until > now,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class BackendPool:
+    """
+    Routes requests to the least loaded healthy backend of a pool.
+    Safe to use from any thread and event loop.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[str],
+        settings: BackendPoolSettings | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Constructor.
+
+        :param backends: Backend names, e.g. model server urls.
+        :param settings: Health tracking settings. Defaults to `BackendPoolSettings()`.
+        :param clock: Monotonic clock, in seconds.
+        :raise: ValueError - If there are no backends.
+        """
+        if not backends:
+            raise ValueError("A backend pool needs at least one backend")
+        self._backends = [_Backend(name) for name in dict.fromkeys(backends)]
+        self._settings = settings or BackendPoolSettings()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def backends(self) -> list[str]:
+        """
+        Return the backend names.
+
+        :return: Names, in configured order.
+        """
+        return [backend.name for backend in self._backends]
+
+    def acquire(self) -> str:
+        """
+        Pick a backend for a request and count the request as outstanding
+        on it. Every `acquire` must be followed by a `release`.
+
+        :return: The backend name.
+        """
+        with self._lock:
+            now = self._clock()
+            healthy = [b for b in self._backends if b.ejected_until <= now]
+            if healthy:
+                backend = min(healthy, key=lambda b: (b.outstanding, b.requests))
+            else:
+                backend = min(self._backends, key=lambda b: b.ejected_until)
+                _LOGGER.warning(
+                    f"All LLM backends are ejected, routing to {backend.name}"
+                )
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend.name
+
+    def release(self, name: str, seconds: float, ok: bool | None = True) -> None:
+        """
+        Record the outcome of a request.
+
+        :param name: The backend the request went to.
+        :param seconds: How long the request took.
+        :param ok: Whether it succeeded, or None if it was abandoned, e.g.
+                   cancelled, and says nothing about the backend's health.
+        """
+        with self._lock:
+            backend = self.__backend(name)
+            backend.outstanding -= 1
+            if ok is None:
+                return
+            backend.latency.observe(seconds)
+            if ok and seconds <= self._settings.slow_seconds:
+                backend.consecutive_failures = 0
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures >= self._settings.eject_failures:
+                self.__eject(backend)
+
+    @contextmanager
+    def request(self) -> Iterator[str]:
+        """
+        Route a request. The block's exceptions count as failures of the
+        backend; cancellation does not.
+
+        :return: The backend name.
+        """
+        name = self.acquire()
+        start = self._clock()
+        ok: bool | None = None
+        try:
+            yield name
+            ok = True
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self.release(name, self._clock() - start, ok)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Return the load, health and latency histogram of each backend.
+
+        :return: Stats by backend name.
+        """
+        with self._lock:
+            now = self._clock()
+            return {backend.name: backend.stats(now) for backend in self._backends}
+
+    def __backend(self, name: str) -> _Backend:
+        """Return a backend by name."""
+        return next(backend for backend in self._backends if backend.name == name)
+
+    def __eject(self, backend: _Backend) -> None:
+        """Take a backend out of rotation. Call with the lock held."""
+        backend.ejected_until = self._clock() + self._settings.eject_seconds
+        backend.ejections += 1
+        backend.consecutive_failures = 0
+        _LOGGER.warning(
+            f"Ejected LLM backend {backend.name} for "
+            f"{self._settings.eject_seconds}s after repeated failed or slow requests"
+        )
+
+
+_SETTINGS = BackendPoolSettings()
+_POOLS: dict[tuple[str, ...], BackendPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def configure_backend_pools(settings: BackendPoolSettings) -> None:
+    """
+    Set the health tracking settings of backend pools. Pools which already
+    exist are replaced.
+
+    :param settings: Health tracking settings.
+    """
+    global _SETTINGS  # pylint: disable=global-statement
+    with _POOLS_LOCK:
+        _SETTINGS = settings
+        _POOLS.clear()
+    _LOGGER.info(f"LLM backend pools: {settings}")
+
+
+def backend_pool(backends: Sequence[str]) -> BackendPool:
+    """
+    Return the pool of a set of backends, creating it on first use. Handlers
+    with the same backends share their load and health.
+
+    :param backends: Backend names.
+    :return: The pool.
+    """
+    key = tuple(backends)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = BackendPool(backends, _SETTINGS)
+        return pool
+
+
+def backend_pool_stats() -> Mapping[str, dict[str, dict[str, Any]]]:
+    """
+    Return the stats of every backend pool.
+
+    :return: Stats by pool, named by its backends.
+    """
+    with _POOLS_LOCK:
+        pools = dict(_POOLS)
+    return {",".join(key): pool.stats() for key, pool in pools.items()}
@@ -0,0 +1,474 @@
+"""
+Conversation checkpointers.
+
+A checkpointer persists LangGraph state per conversation thread, which is
+what lets a `thread_id` sent back by a client pick up its history. The
+sqlite backend is shared by every worker process on a host, and keeps a
+bounded LRU of recently used threads in memory.
+"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Mapping, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_CHECKPOINT_BACKEND = "sqlite"
+DEFAULT_CHECKPOINT_SQLITE_PATH = "./checkpoints.sqlite"
+DEFAULT_HOT_THREADS = 256
+# How long (ms) a writer waits on a lock held by another worker process.
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# (thread id, checkpoint ns)
+_ThreadKey = tuple[str, str]
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer backed by a local sqlite file with an in-memory hot tier.
+
+    Every checkpoint is written through to sqlite, so evicting a thread
+    from the hot tier never loses state; it only means the next read for
+    that thread is served from disk. The hot tier caches the latest
+    checkpoint of at most `hot_threads` threads, which caps the memory
+    used for conversation state regardless of how many threads exist.
+
+    The database runs in WAL mode, so several worker processes can share
+    the same file. A cached checkpoint is only served if it is still the
+    latest one on disk, so a thread continued by another worker is never
+    answered from a stale cache.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CHECKPOINT_SQLITE_PATH,
+        hot_threads: int = DEFAULT_HOT_THREADS,
+        serde: SerializerProtocol | None = None,
+    ):
+        """
+        Constructor.
+
+        :param path: Path to the sqlite file. Created if it does not exist.
+        :param hot_threads: Max number of threads kept in memory.
+        :param serde: Optional checkpoint serializer.
+        """
+        super().__init__(serde=serde)
+        self._path = path
+        self._hot_threads = hot_threads
+        self._hot: OrderedDict[_ThreadKey, CheckpointTuple] = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            timeout=DEFAULT_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout={DEFAULT_BUSY_TIMEOUT_MS}")
+        self._conn.executescript(_SCHEMA)
+        _LOGGER.info(f"Opened sqlite checkpointer at {path}")
+
+    @property
+    def hot_thread_count(self) -> int:
+        """
+        Return the number of threads currently held in memory.
+
+        :return: Hot thread count.
+        """
+        return len(self._hot)
+
+    def close(self) -> None:
+        """Close the underlying sqlite connection."""
+        with self._lock:
+            self._hot.clear()
+            self._conn.close()
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """
+        Return a checkpoint tuple for the config.
+
+        If the config names a `checkpoint_id` that checkpoint is returned,
+        otherwise the latest checkpoint for the thread.
+
+        :param config: Runnable config naming the thread.
+        :return: The checkpoint tuple, or None if the thread has no checkpoints.
+        """
+        thread_id, checkpoint_ns = _thread_key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            if checkpoint_id is None:
+                row = self._conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+                if row is None:
+                    return None
+                checkpoint_id = row[0]
+            hot = self._hot.get((thread_id, checkpoint_ns))
+            if hot is not None and get_checkpoint_id(hot.config) == checkpoint_id:
+                self._hot.move_to_end((thread_id, checkpoint_ns))
+                # The graph mutates the checkpoint it resumes from.
+                return hot._replace(checkpoint=copy_checkpoint(hot.checkpoint))
+            tuples = list(
+                self._select(
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            )
+            if not tuples:
+                return None
+            if get_checkpoint_id(config) is None:
+                self._remember(
+                    tuples[0]._replace(checkpoint=copy_checkpoint(tuples[0].checkpoint))
+                )
+            return tuples[0]
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # pylint: disable=redefined-builtin
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """
+        List checkpoints, newest first.
+
+        :param config: Optional config restricting the thread/namespace/checkpoint.
+        :param filter: Optional metadata values every result must match.
+        :param before: Only list checkpoints created before this one.
+        :param limit: Max number of results.
+        :return: Iterator over checkpoint tuples.
+        """
+        clauses: list[str] = []
+        params: list[Any] = []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            results = list(self._select(where, tuple(params)))
+        for item in results:
+            if filter and not all(
+                item.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        Save a checkpoint, writing it through to disk.
+
+        :param config: Config of the parent checkpoint.
+        :param checkpoint: The checkpoint to save.
+        :param metadata: Checkpoint metadata.
+        :param new_versions: New channel versions as of this write.
+        :return: Config naming the saved checkpoint.
+        """
+        thread_id, checkpoint_ns = _thread_key(config)
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        full_metadata = get_checkpoint_metadata(config, metadata)
+        metadata_type, metadata_blob = self.serde.dumps_typed(full_metadata)
+        parent_id = config["configurable"].get("checkpoint_id")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_id,
+                    checkpoint_type,
+                    checkpoint_blob,
+                    metadata_type,
+                    metadata_blob,
+                ),
+            )
+            saved_config: RunnableConfig = _config(
+                thread_id, checkpoint_ns, checkpoint["id"]
+            )
+            self._remember(
+                CheckpointTuple(
+                    config=saved_config,
+                    checkpoint=copy_checkpoint(checkpoint),
+                    metadata=full_metadata,
+                    parent_config=(
+                        _config(thread_id, checkpoint_ns, parent_id)
+                        if parent_id
+                        else None
+                    ),
+                    pending_writes=[],
+                )
+            )
+        return saved_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """
+        Save intermediate writes linked to a checkpoint.
+
+        :param config: Config naming the checkpoint.
+        :param writes: (channel, value) pairs.
+        :param task_id: Task creating the writes.
+        :param task_path: Path of the task creating the writes.
+        """
+        thread_id, checkpoint_ns = _thread_key(config)
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+                task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            # Special channels (negative idx) overwrite, regular writes are kept once.
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] < 0],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] >= 0],
+            )
+            hot = self._hot.get((thread_id, checkpoint_ns))
+            if hot is not None and get_checkpoint_id(hot.config) == checkpoint_id:
+                del self._hot[(thread_id, checkpoint_ns)]
+
+    def delete_thread(self, thread_id: str) -> None:
+        """
+        Delete all checkpoints and writes of a thread.
+
+        :param thread_id: The thread to delete.
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self._hot if key[0] == thread_id]:
+                del self._hot[key]
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Async version of `get_tuple`, run off the event loop."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,  # pylint: disable=redefined-builtin
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Async version of `list`, run off the event loop."""
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in results:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Async version of `put`, run off the event loop."""
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Async version of `put_writes`, run off the event loop."""
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Async version of `delete_thread`, run off the event loop."""
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        """
+        Return the next version of a channel.
+
+        :param current: Current channel version.
+        :param channel: Unused.
+        :return: Next version, sortable as a string.
+        """
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def _remember(self, item: CheckpointTuple) -> None:
+        """Put a thread's latest checkpoint in the hot tier, evicting the LRU thread."""
+        key = _thread_key(item.config)
+        self._hot[key] = item
+        self._hot.move_to_end(key)
+        while len(self._hot) > self._hot_threads:
+            evicted, _ = self._hot.popitem(last=False)
+            _LOGGER.debug(f"Evicted thread {evicted[0]} from checkpoint hot tier")
+
+    def _select(self, where: str, params: tuple) -> Iterator[CheckpointTuple]:
+        """Load checkpoint tuples (with pending writes) matching a WHERE clause."""
+        rows = self._conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            f"type, checkpoint, metadata_type, metadata FROM checkpoints {where} "
+            "ORDER BY checkpoint_id DESC",
+            params,
+        ).fetchall()
+        for (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_id,
+            checkpoint_type,
+            checkpoint_blob,
+            metadata_type,
+            metadata_blob,
+        ) in rows:
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+                "ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+            yield CheckpointTuple(
+                config=_config(thread_id, checkpoint_ns, checkpoint_id),
+                checkpoint=self.serde.loads_typed((checkpoint_type, checkpoint_blob)),
+                metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+                parent_config=(
+                    _config(thread_id, checkpoint_ns, parent_id) if parent_id else None
+                ),
+                pending_writes=[
+                    (task_id, channel, self.serde.loads_typed((value_type, value)))
+                    for task_id, channel, value_type, value in writes
+                ],
+            )
+
+
+def create_checkpointer(cfg: Mapping[str, Any]) -> BaseCheckpointSaver:
+    """
+    Return a checkpointer for the configured backend.
+
+    :param cfg: App config. Reads `CHECKPOINT_BACKEND`, `CHECKPOINT_SQLITE_PATH`
+                and `CHECKPOINT_HOT_THREADS`.
+    :return: The checkpointer.
+    """
+    backend = cfg.get("CHECKPOINT_BACKEND", DEFAULT_CHECKPOINT_BACKEND)
+    match backend:
+        case "memory":
+            _LOGGER.info("Using in-memory checkpointer")
+            return MemorySaver()
+        case "sqlite":
+            return SqliteCheckpointSaver(
+                path=cfg.get("CHECKPOINT_SQLITE_PATH", DEFAULT_CHECKPOINT_SQLITE_PATH),
+                hot_threads=cfg.get("CHECKPOINT_HOT_THREADS", DEFAULT_HOT_THREADS),
+            )
+        case _:
+            raise ValueError(f"Unknown checkpoint backend: {backend}")
+
+
+def _thread_key(config: RunnableConfig) -> _ThreadKey:
+    """Return the (thread id, checkpoint ns) of a config."""
+    configurable = config["configurable"]
+    return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    """Return a config naming a checkpoint."""
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
@@ -7,7 +7,10 @@ from oracle_server.config.configuration_loaders import (
     required,
     required_secret,
     optional,
+    to_bool,
+    to_float,
     to_int,
+    to_list,
 )
 
 # todo: https://github.com/ajponte/babylon/issues/36
@@ -37,7 +40,68 @@ CONFIG_LOADERS: list[Loader] = [
     # on a system with greater resources.
     # See https://huggingface.co/BAAI/bge-small-en-v1.5
     optional(key="EMBEDDING_MODEL", default_val="BAAI/bge-small-en-v1.5"),
+    # CPU threads and texts per forward pass of the embedding backend.
+    # 0 threads keeps the runtime's default.
+    optional(key="EMBEDDING_THREADS", default_val="0", converter=to_int),
+    optional(key="EMBEDDING_ENCODE_BATCH_SIZE", default_val="32", converter=to_int),
+    # Load and warm up the default chat handler at startup.
+    optional(key="WARM_UP_HANDLERS", default_val="true", converter=to_bool),
     optional(key="CHROMA_SQLITE_DIR", default_val="./chromadb"),
+    # Vector store the chat handlers search: `chroma`, or `numpy` for an
+    # in-process brute-force index kept under NUMPY_VECTOR_DIR.
+    optional(key="VECTOR_STORE_BACKEND", default_val="chroma"),
+    optional(key="NUMPY_VECTOR_DIR", default_val="./vectors"),
+    # Compact in-memory index for the numpy backend (`int8` or `binary`), and
+    # how many candidates per result it re-scores against the full vectors.
+    optional(key="NUMPY_QUANTIZATION", default_val=""),
+    optional(key="NUMPY_RESCORE_FACTOR", default_val="4", converter=to_int),
+    # Keep a BM25 index alongside the vectors and fuse its ranking with the
+    # vector ranking, so exact merchant names and amounts are found.
+    optional(key="HYBRID_RETRIEVAL", default_val="false", converter=to_bool),
+    # Time the chat retrieval stage may take before answering without context.
+    optional(key="RETRIEVAL_BUDGET_MS", default_val="500", converter=to_int),
+    # Prompts keep the last MEMORY_TURNS turns of a thread verbatim. Once a
+    # thread is over MEMORY_TOKEN_BUDGET tokens, older turns are summarized.
+    optional(key="MEMORY_TURNS", default_val="4", converter=to_int),
+    optional(key="MEMORY_TOKEN_BUDGET", default_val="2000", converter=to_int),
+    # Memory budget of the process-wide query embedding cache.
+    optional(key="EMBEDDING_CACHE_MB", default_val="64", converter=to_int),
+    # Query embeddings from concurrent chats are batched into one forward pass
+    # of up to this many queries, waiting at most EMBEDDING_BATCH_WAIT_MS.
+    optional(key="EMBEDDING_BATCH_SIZE", default_val="32", converter=to_int),
+    optional(key="EMBEDDING_BATCH_WAIT_MS", default_val="5", converter=to_float),
+    # Serve answers to near-duplicate first questions without calling the LLM.
+    optional(key="SEMANTIC_CACHE_ENABLED", default_val="false", converter=to_bool),
+    # Min cosine similarity between two questions for one's answer to be reused.
+    optional(key="SEMANTIC_CACHE_THRESHOLD", default_val="0.95", converter=to_float),
+    optional(key="SEMANTIC_CACHE_MAX_ENTRIES", default_val="1024", converter=to_int),
+    optional(key="SEMANTIC_CACHE_TTL_SECONDS", default_val="3600", converter=to_int),
+    # Connection pool shared by the HTTP clients of all LLM backends.
+    optional(key="LLM_HTTP_MAX_CONNECTIONS", default_val="100", converter=to_int),
+    optional(key="LLM_HTTP_MAX_KEEPALIVE", default_val="20", converter=to_int),
+    optional(key="LLM_HTTP_KEEPALIVE_SECONDS", default_val="30", converter=to_float),
+    optional(key="LLM_HTTP_CONNECT_TIMEOUT", default_val="5", converter=to_float),
+    optional(key="LLM_HTTP_READ_TIMEOUT", default_val="120", converter=to_float),
+    # HTTP/2 needs the `http2` extra.
+    optional(key="LLM_HTTP2", default_val="false", converter=to_bool),
+    # Chat requests each LLM backend serves at once. Up to LLM_MAX_QUEUE more
+    # wait in line; requests expected to wait longer than LLM_MAX_QUEUE_SECONDS
+    # are rejected with 429.
+    optional(key="LLM_MAX_CONCURRENCY", default_val="4", converter=to_int),
+    optional(key="LLM_MAX_QUEUE", default_val="64", converter=to_int),
+    optional(key="LLM_MAX_QUEUE_SECONDS", default_val="10", converter=to_float),
+    # Comma separated OpenAI-compatible servers the default chat handler load
+    # balances between. A backend whose last LLM_BACKEND_EJECT_FAILURES requests
+    # failed or took over LLM_BACKEND_SLOW_SECONDS is ejected for
+    # LLM_BACKEND_EJECT_SECONDS.
+    optional(
+        key="LLM_BACKEND_URLS",
+        default_val="http://localhost:11434/v1",
+        converter=to_list,
+    ),
+    optional(key="LLM_BACKEND_EJECT_FAILURES", default_val="3", converter=to_int),
+    optional(key="LLM_BACKEND_EJECT_SECONDS", default_val="30", converter=to_float),
+    optional(key="LLM_BACKEND_SLOW_SECONDS", default_val="60", converter=to_float),
     # A way to mark only a specific subset of collections to process for the daemon.
     optional(key="DATALAKE_COLLECTION_PREFIX", default_val="chase-data-"),
     optional(key="MCP_SERVER_HOST", default_val="localhost"),
@@ -45,6 +109,14 @@ CONFIG_LOADERS: list[Loader] = [
     # todo: move to `required` (currently used for easier testing).
     optional(key="MCP_SERVER_URL", default_val="http://localhost:8080"),
     optional(key="CORS_ORIGINS", default_val="http://localhost:3000"),
+    # Max requests a worker serves concurrently.
+    optional(key="WSGI_THREADS", default_val="64", converter=to_int),
+    # Conversation state. `sqlite` is shared by all workers on a host,
+    # `memory` is local to a single process.
+    optional(key="CHECKPOINT_BACKEND", default_val="sqlite"),
+    optional(key="CHECKPOINT_SQLITE_PATH", default_val="./checkpoints.sqlite"),
+    # Max conversation threads kept in memory by the sqlite backend.
+    optional(key="CHECKPOINT_HOT_THREADS", default_val="256", converter=to_int),
 ]
 
 SECRETS_LOADERS: list[Loader] = [
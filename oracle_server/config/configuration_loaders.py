@@ -231,3 +231,18 @@ def to_int(val: Union[str, int, float]) -> int:
         return int(val)
     except Exception as e:
         raise ValueError(f"{val!r} could not be converted to a integer type.") from e
+
+
+def to_float(val: Union[str, int, float]) -> float:
+    """Convert the value to a float."""
+    try:
+        return float(val)
+    except Exception as e:
+        raise ValueError(f"{val!r} could not be converted to a float type.") from e
+
+
+def to_list(val: Union[str, list]) -> list[str]:
+    """Convert a comma separated value to a list of its non-empty items."""
+    if isinstance(val, list):
+        return val
+    return [item.strip() for item in val.split(",") if item.strip()]
@@ -1,60 +1,201 @@
 """Controller for handling chat requests."""
 
+import json
 import logging
+from collections.abc import AsyncIterator, Iterator
 from http import HTTPStatus
 from typing import Any
 
 import connexion
-from flask import current_app
+from flask import Response
 from langchain_core.messages import AIMessage
-from oracle_server.handlers.handler import BabylonChatHandler, ChatHandler
+from oracle_server.admission import Admission, admission_controller
+from oracle_server.error import OverloadedError, UnknownHandlerError
+from oracle_server.event_loop import chat_loop
+from oracle_server.handlers.handler import ChatHandler, new_thread_id
+from oracle_server.handlers.registry import get_handler_registry
+from oracle_server.single_flight import SingleFlight
+from oracle_server.vectorstore import normalize_query
 
 _LOGGER = logging.getLogger()
 
-# todo: move to config
-DEFAULT_GPT_MODEL = "llama3.2"
-DEFAULT_GPT_MODEL_URL = "http://localhost:11434/v1"
+# Requests without a thread id, by handler and normalized input.
+_STATELESS_REQUESTS = SingleFlight("chat")
 
 
-async def send_message(handler: str | None = None) -> tuple[dict[str, Any], int]:
+async def send_message(handler: str | None = None) -> tuple[Any, ...]:
     """
     Controller method for handling chat input.
 
+    Requests queue for their handler's LLM backend, and are rejected with
+    429 and a `Retry-After` header if they would queue too long.
+
+    A request without a thread id which arrives while an identical one is
+    being answered waits for that answer instead of generating its own. It
+    still gets a thread of its own, starting with a copy of that turn.
+
     :param handler: Desired chat handler, identified by name.
     :return: Response from invoking chat handler.
     """
     request_body = await connexion.request.json()
-    cfg = current_app.config
-    thread_id = request_body.get("thread_id")
-    chat_handler: ChatHandler = _select_handler(
-        handler_name=handler, cfg=cfg, thread_id=thread_id
-    )
-    response_parts = []
     try:
-        chat_response = chat_handler.handle_input_message(
-            message=request_body["user_input"]
-        )
-        for event in chat_response:
-            response_parts.append(_handle_chat_response(event=event))
+        chat_handler: ChatHandler = _select_handler(handler_name=handler)
+    except UnknownHandlerError as e:
+        _LOGGER.debug(e.message)
+        return {"message": e.message}, HTTPStatus.BAD_REQUEST
+    try:
+        if request_body.get("thread_id"):
+            response, thread_id = await _answer(
+                chat_handler, request_body, request_body["thread_id"]
+            )
+        else:
+            key = (
+                chat_handler,
+                normalize_query(request_body["user_input"]),
+                request_body.get("semantic_cache"),
+            )
+            thread_id = new_thread_id()
+            response, answered_thread_id = await _STATELESS_REQUESTS.ado(
+                key, lambda: _answer(chat_handler, request_body, thread_id)
+            )
+            if answered_thread_id != thread_id:
+                # Only the answer is shared: follow-ups must not mix into
+                # the thread of the request which generated it.
+                await chat_loop().run(
+                    chat_handler.acopy_thread(answered_thread_id, thread_id)
+                )
+    except OverloadedError as e:
+        return _overloaded_response(e)
     except Exception as e:
         message = f"Error while handling input message. {e}"
         _LOGGER.debug(message)
         return {"message": message}, HTTPStatus.INTERNAL_SERVER_ERROR
 
-    response = "".join(response_parts)
-    return {"text": response, "thread_id": chat_handler.thread_id}, HTTPStatus.OK
+    return {"text": response, "thread_id": thread_id}, HTTPStatus.OK
 
 
-def _select_handler(handler_name: str | None, cfg: dict, thread_id: str) -> ChatHandler:
-    """Return an appropriate handler."""
-    # todo: add check for handler name.
-    _LOGGER.info(f"handler name: {handler_name}")
-    return BabylonChatHandler(
-        llm_model=DEFAULT_GPT_MODEL,
-        embedding_model=cfg["EMBEDDING_MODEL"],
-        model_url=DEFAULT_GPT_MODEL_URL,
-        thread_id=thread_id,
+def chat_request_stats() -> dict[str, int]:
+    """
+    Return how many requests without a thread id were answered, and how
+    many of them shared the answer to an identical request.
+
+    :return: Counters.
+    """
+    return _STATELESS_REQUESTS.stats()
+
+
+async def _answer(
+    chat_handler: ChatHandler, request_body: dict[str, Any], thread_id: str
+) -> tuple[str, str]:
+    """Queue for the handler's backend, then answer the request in a thread."""
+    admission = _admit(chat_handler)
+    try:
+        chat_response = chat_handler.ahandle_input_message(
+            message=request_body["user_input"],
+            thread_id=thread_id,
+            use_semantic_cache=request_body.get("semantic_cache"),
+        )
+        # All chat work runs on the shared chat loop, so concurrent requests
+        # interleave on one loop while waiting on the model.
+        response = await chat_loop().run(
+            admission.run(lambda: _collect_chat_response(chat_response))
+        )
+    finally:
+        admission.release()
+    return response, thread_id
+
+
+async def stream_message(handler: str | None = None):
+    """
+    Controller method for handling chat input as a Server-Sent Events stream.
+
+    Emits a `token` event per generated token, then a single `done` event
+    carrying the thread id. Errors raised mid-stream are reported as an
+    `error` event, since the response status has already been sent.
+
+    :param handler: Desired chat handler, identified by name.
+    :return: A `text/event-stream` response.
+    """
+    request_body = await connexion.request.json()
+    thread_id = request_body.get("thread_id") or new_thread_id()
+    try:
+        chat_handler: ChatHandler = _select_handler(handler_name=handler)
+        admission = _admit(chat_handler)
+    except UnknownHandlerError as e:
+        _LOGGER.debug(e.message)
+        return {"message": e.message}, HTTPStatus.BAD_REQUEST
+    except OverloadedError as e:
+        return _overloaded_response(e)
+
+    tokens = chat_loop().iterate(
+        admission.iterate(
+            chat_handler.astream_input_message(
+                message=request_body["user_input"],
+                thread_id=thread_id,
+                use_semantic_cache=request_body.get("semantic_cache"),
+            )
+        )
     )
+    response = Response(
+        _sse_events(tokens=tokens, thread_id=thread_id),
+        status=HTTPStatus.OK,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Frees the slot if the client goes away before the stream is drained.
+    response.call_on_close(admission.release)
+    return response
+
+
+def _sse_events(tokens: Iterator[str], thread_id: str) -> Iterator[str]:
+    """Encode a token stream as Server-Sent Events."""
+    try:
+        for token in tokens:
+            yield _sse_event("token", {"text": token})
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        message = f"Error while streaming input message. {e}"
+        _LOGGER.debug(message)
+        yield _sse_event("error", {"message": message})
+        return
+    yield _sse_event("done", {"thread_id": thread_id})
+
+
+def _sse_event(event: str, data: dict[str, Any]) -> str:
+    """Return a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _admit(chat_handler: ChatHandler) -> Admission:
+    """Queue a request for the handler's pool of LLM backends."""
+    replicas = max(1, len(chat_handler.backends))
+    return admission_controller(str(chat_handler.backend), replicas).admit()
+
+
+def _overloaded_response(error: OverloadedError) -> tuple[Any, ...]:
+    """Return the 429 response to a request shed under load."""
+    _LOGGER.warning(error.message)
+    return (
+        {"message": error.message},
+        HTTPStatus.TOO_MANY_REQUESTS,
+        {
+            "Retry-After": str(error.retry_after),
+            "Content-Type": "application/json",
+        },
+    )
+
+
+def _select_handler(handler_name: str | None) -> ChatHandler:
+    """Return the app's shared handler for the name."""
+    _LOGGER.info(f"handler name: {handler_name}")
+    return get_handler_registry().get(handler_name)
+
+
+async def _collect_chat_response(chat_response: AsyncIterator) -> str:
+    """Drain a chat response stream and return its text."""
+    response_parts = []
+    async for event in chat_response:
+        response_parts.append(_handle_chat_response(event=event))
+    return "".join(response_parts)
 
 
 def _handle_chat_response(event) -> str:
@@ -1,3 +1,249 @@
 """
 Conversation memory helpers.
+
+Sending a thread's whole history to the model on every turn makes prompts,
+and so model latency, grow with the length of the conversation.
+`RollingSummaryMemory` keeps the last few turns verbatim and folds older
+turns into a running summary, so the prompt stays within a token budget.
+
+Summaries are written by the model on a background thread after a turn
+has been answered, and picked up by the next turn of the thread. Until a
+summary is ready, turns older than the verbatim window are left out of the
+prompt rather than waited for.
 """
+
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+_LOGGER = logging.getLogger()
+
+# User turns kept verbatim in the prompt.
+DEFAULT_MEMORY_TURNS = 4
+# Tokens the summary and the conversation may take up in a prompt.
+DEFAULT_MEMORY_TOKEN_BUDGET = 2000
+# Rough size of a token, for counting tokens without a tokenizer.
+DEFAULT_CHARS_PER_TOKEN = 4
+DEFAULT_SUMMARY_WORKERS = 2
+# Threads with a summary in progress or waiting to be picked up.
+DEFAULT_MAX_PENDING = 1024
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation between a user and an assistant about the "
+    "user's financial data. Keep the facts, figures, dates and open questions "
+    "later turns may refer to. Reply with the summary only."
+)
+MEMORY_PROMPT = "Summary of the earlier conversation:\n\n{summary}"
+
+# Summaries are written by the model, which blocks; they run here so the
+# turn which triggered them does not wait.
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(
+    max_workers=DEFAULT_SUMMARY_WORKERS, thread_name_prefix="summary"
+)
+
+# Writes a summary from a prompt.
+Summarizer = Callable[[list[BaseMessage]], str]
+
+
+@dataclass(frozen=True)
+class Summary:
+    """A summary of the first `covered` messages of a conversation."""
+
+    text: str = ""
+    covered: int = 0
+
+
+def approximate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """
+    Estimate the number of tokens in messages from their length.
+
+    :param messages: Messages.
+    :return: Estimated token count.
+    """
+    return sum(len(str(message.content)) for message in messages) // (
+        DEFAULT_CHARS_PER_TOKEN
+    )
+
+
+def recent_start(messages: Sequence[BaseMessage], turns: int) -> int:
+    """
+    Return the index of the first message of the last `turns` user turns.
+
+    :param messages: The conversation.
+    :param turns: Number of turns.
+    :return: Index into `messages`.
+    """
+    starts = [
+        i for i, message in enumerate(messages) if isinstance(message, HumanMessage)
+    ]
+    if turns <= 0:
+        return len(messages)
+    if len(starts) <= turns:
+        return 0
+    return starts[-turns]
+
+
+def summary_prompt(
+    summary: Summary, messages: Sequence[BaseMessage]
+) -> list[BaseMessage]:
+    """
+    Return the prompt which folds messages into a summary.
+
+    :param summary: The summary so far.
+    :param messages: Messages to fold in.
+    :return: Prompt messages.
+    """
+    lines = [f"Summary so far: {summary.text}"] if summary.text else []
+    lines.extend(f"{message.type}: {message.content}" for message in messages)
+    return [
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(content="\n".join(lines)),
+    ]
+
+
+class RollingSummaryMemory:
+    """
+    Keeps prompts within a token budget by summarizing older turns.
+
+    The summary of a thread lives in the thread's state; this class builds
+    prompts from it and writes new summaries in the background.
+    """
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        max_turns: int = DEFAULT_MEMORY_TURNS,
+        token_budget: int = DEFAULT_MEMORY_TOKEN_BUDGET,
+        count_tokens: Callable[[Sequence[BaseMessage]], int] = approximate_tokens,
+        executor: ThreadPoolExecutor | None = None,
+    ):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        Constructor.
+
+        :param summarize: Writes a summary from a prompt, e.g. with the chat model.
+        :param max_turns: User turns kept verbatim.
+        :param token_budget: Tokens the summary and conversation may take up.
+        :param count_tokens: Counts the tokens in messages.
+        :param executor: Runs summaries. Defaults to a shared pool.
+        """
+        self._summarize = summarize
+        self._max_turns = max_turns
+        self._token_budget = token_budget
+        self._count_tokens = count_tokens
+        self._executor = executor or _SUMMARY_EXECUTOR
+        self._pending: OrderedDict[str, Future[Summary]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def token_budget(self) -> int:
+        """
+        Return the prompt token budget.
+
+        :return: Tokens.
+        """
+        return self._token_budget
+
+    def prompt_messages(
+        self, messages: Sequence[BaseMessage], summary: Summary
+    ) -> list[BaseMessage]:
+        """
+        Return the conversation as it goes into the prompt: the summary,
+        then the messages it does not cover. Over the token budget, only
+        the last `max_turns` turns are kept.
+
+        :param messages: The conversation.
+        :param summary: The thread's summary.
+        :return: Prompt messages.
+        """
+        prompt = self.__with_summary(messages[summary.covered :], summary)
+        if self._count_tokens(prompt) <= self._token_budget:
+            return prompt
+        start = max(summary.covered, recent_start(messages, self._max_turns))
+        return self.__with_summary(messages[start:], summary)
+
+    def latest_summary(self, thread_id: str | None, summary: Summary) -> Summary:
+        """
+        Return the thread's summary, or the summary written since in the
+        background if it is newer and ready.
+
+        :param thread_id: Conversation thread.
+        :param summary: The summary in the thread's state.
+        :return: The newest summary.
+        """
+        with self._lock:
+            future = self._pending.get(thread_id) if thread_id else None
+            if future is None or not future.done():
+                return summary
+            del self._pending[thread_id]  # type: ignore[arg-type]
+        try:
+            written = future.result()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning(f"Failed to summarize conversation {thread_id}: {e}")
+            return summary
+        return written if written.covered > summary.covered else summary
+
+    def schedule(
+        self, thread_id: str | None, messages: Sequence[BaseMessage], summary: Summary
+    ) -> bool:
+        """
+        Start summarizing the turns before the verbatim window in the
+        background if the conversation is over its token budget.
+
+        :param thread_id: Conversation thread.
+        :param messages: The conversation, including the latest answer.
+        :param summary: The thread's summary.
+        :return: Whether a summary was started.
+        """
+        if not thread_id:
+            return False
+        covered = recent_start(messages, self._max_turns)
+        if covered <= summary.covered:
+            return False
+        prompt = self.__with_summary(messages[summary.covered :], summary)
+        if self._count_tokens(prompt) <= self._token_budget:
+            return False
+        with self._lock:
+            if thread_id in self._pending:
+                return False
+            self._pending[thread_id] = self._executor.submit(
+                self.__fold, summary, list(messages[summary.covered : covered]), covered
+            )
+            while len(self._pending) > DEFAULT_MAX_PENDING:
+                self._pending.popitem(last=False)[1].cancel()
+        _LOGGER.debug(f"Summarizing {covered} messages of conversation {thread_id}")
+        return True
+
+    def wait(self, thread_id: str, timeout: float | None = None) -> None:
+        """
+        Wait for a thread's summary in progress, if any.
+
+        :param thread_id: Conversation thread.
+        :param timeout: Max seconds to wait.
+        """
+        with self._lock:
+            future = self._pending.get(thread_id)
+        if future is not None:
+            future.exception(timeout=timeout)
+
+    def __fold(
+        self, summary: Summary, messages: list[BaseMessage], covered: int
+    ) -> Summary:
+        """Fold messages into a summary."""
+        return Summary(self._summarize(summary_prompt(summary, messages)), covered)
+
+    @staticmethod
+    def __with_summary(
+        messages: Sequence[BaseMessage], summary: Summary
+    ) -> list[BaseMessage]:
+        """Return messages preceded by the summary, if there is one."""
+        if not summary.text:
+            return list(messages)
+        return [
+            SystemMessage(content=MEMORY_PROMPT.format(summary=summary.text)),
+            *messages,
+        ]
@@ -0,0 +1,176 @@
+"""
+Embedding backends.
+
+An embedding backend says how to load and run an embedding model: which
+model, on which runtime, with how many CPU threads and what encode batch
+size. Backends are registered by the name `EMBEDDING_MODEL` selects.
+
+- `torch` runs the model with PyTorch through sentence-transformers.
+- `onnx` runs an ONNX export of the model with onnxruntime, which is
+  usually faster on CPU, and with a quantized export (e.g. the `int8`
+  backends) faster still. It needs the `onnx` extra
+  (`optimum[onnxruntime]`), and the export file must exist in the model
+  repo or a local copy of it; see
+  `sentence_transformers.backend.export_dynamic_quantized_onnx_model`.
+"""
+
+import dataclasses
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+DEFAULT_ENCODE_BATCH_SIZE = 32
+WARM_UP_TEXT = "How much did I spend last month?"
+
+
+@dataclass(frozen=True)
+class EmbeddingBackend:
+    """
+    How to load and run an embedding model.
+    """
+
+    # Hugging Face model id or local path.
+    model_name: str
+    # `torch` or `onnx`.
+    runtime: str = "torch"
+    # ONNX export to load, relative to the model repo.
+    onnx_file: str | None = None
+    # Texts encoded per forward pass.
+    batch_size: int = DEFAULT_ENCODE_BATCH_SIZE
+    # Intra-op CPU threads. None keeps the runtime's default.
+    threads: int | None = None
+    normalize: bool = True
+
+    def load(self, device: str = "cpu") -> HuggingFaceEmbeddings:
+        """
+        Load the model.
+
+        :param device: Target device type.
+        :return: The embedding model.
+        :raise: ValueError - If the runtime is unknown.
+        """
+        model_kwargs: dict[str, Any] = {"device": device}
+        match self.runtime:
+            case "torch":
+                if self.threads:
+                    _set_torch_threads(self.threads)
+            case "onnx":
+                model_kwargs["backend"] = "onnx"
+                model_kwargs["model_kwargs"] = self._onnx_model_kwargs()
+            case _:
+                raise ValueError(f"Unknown embedding runtime: {self.runtime}")
+        _LOGGER.info(
+            f"Instantiating HuggingFaceEmbeddings with model {self.model_name} "
+            f"(runtime={self.runtime}, threads={self.threads}, "
+            f"batch_size={self.batch_size})"
+        )
+        return HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs={
+                "normalize_embeddings": self.normalize,
+                "batch_size": self.batch_size,
+            },
+        )
+
+    def _onnx_model_kwargs(self) -> dict[str, Any]:
+        """Return the onnxruntime options of an ONNX backend."""
+        kwargs: dict[str, Any] = {"provider": "CPUExecutionProvider"}
+        if self.onnx_file:
+            kwargs["file_name"] = self.onnx_file
+        if self.threads:
+            # pylint: disable=import-outside-toplevel
+            import onnxruntime  # type: ignore
+
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = self.threads
+            kwargs["session_options"] = session_options
+        return kwargs
+
+
+EMBEDDING_BACKENDS: dict[str, EmbeddingBackend] = {
+    DEFAULT_EMBEDDING_MODEL: EmbeddingBackend(model_name=DEFAULT_EMBEDDING_MODEL),
+    f"{DEFAULT_EMBEDDING_MODEL}:onnx": EmbeddingBackend(
+        model_name=DEFAULT_EMBEDDING_MODEL,
+        runtime="onnx",
+        onnx_file="onnx/model.onnx",
+    ),
+    f"{DEFAULT_EMBEDDING_MODEL}:onnx-int8": EmbeddingBackend(
+        model_name=DEFAULT_EMBEDDING_MODEL,
+        runtime="onnx",
+        onnx_file="onnx/model_qint8_avx512_vnni.onnx",
+    ),
+}
+
+
+def register_embedding_backend(name: str, backend: EmbeddingBackend) -> None:
+    """
+    Register an embedding backend under a name `EMBEDDING_MODEL` can select.
+
+    :param name: Backend name.
+    :param backend: The backend.
+    """
+    EMBEDDING_BACKENDS[name] = backend
+
+
+def configure_embedding_backend(name: str, **settings: Any) -> EmbeddingBackend:
+    """
+    Override settings of a registered backend, e.g. `threads` or `batch_size`.
+    Settings given as None keep the backend's value.
+
+    :param name: Backend name.
+    :param settings: `EmbeddingBackend` fields to override.
+    :return: The updated backend.
+    """
+    backend = get_embedding_backend(name)
+    overrides = {key: value for key, value in settings.items() if value is not None}
+    if overrides:
+        backend = dataclasses.replace(backend, **overrides)
+        EMBEDDING_BACKENDS[name] = backend
+    return backend
+
+
+def get_embedding_backend(name: str) -> EmbeddingBackend:
+    """
+    Return a registered backend.
+
+    :param name: Backend name.
+    :return: The backend.
+    :raise: ValueError - If no backend has the name.
+    """
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown model: {name}")
+    return EMBEDDING_BACKENDS[name]
+
+
+def warm_up(model: Embeddings, batch_size: int = DEFAULT_ENCODE_BATCH_SIZE) -> float:
+    """
+    Run the model once on a query and on a full batch, so that lazy
+    initialization (weight loading, kernel selection, buffer allocation)
+    happens now rather than on the first user query.
+
+    :param model: The embedding model.
+    :param batch_size: Size of the warm-up batch.
+    :return: Time taken, in seconds.
+    """
+    start = time.perf_counter()
+    model.embed_query(WARM_UP_TEXT)
+    model.embed_documents([WARM_UP_TEXT] * batch_size)
+    elapsed = time.perf_counter() - start
+    _LOGGER.info(f"Warmed up embedding model in {elapsed * 1000:.0f}ms")
+    return elapsed
+
+
+def _set_torch_threads(threads: int) -> None:
+    """Set the number of intra-op threads PyTorch uses."""
+    # pylint: disable=import-outside-toplevel
+    import torch  # type: ignore
+
+    torch.set_num_threads(threads)
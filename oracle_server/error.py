@@ -67,3 +67,76 @@ class VectorDBError(Exception):
         :return: The exception cause.
         """
         return self._cause
+
+
+class UnknownHandlerError(ChatError):
+    """
+    Throw this error when a chat handler is requested by an unknown name.
+    """
+
+    def __init__(self, handler_name: str):
+        """
+        Constructor.
+
+        :param handler_name: The requested handler name.
+        """
+        super().__init__(message=f"Unknown chat handler: {handler_name}")
+
+
+class OverloadedError(ChatError):
+    """
+    Throw this error when a backend is too busy to take another request.
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        """
+        Constructor.
+
+        :param message: Custom message.
+        :param retry_after: Seconds after which a retry is likely to succeed.
+        """
+        super().__init__(message=message)
+        self._retry_after = retry_after
+
+    @property
+    def retry_after(self) -> int:
+        """
+        Return the seconds after which a retry is likely to succeed.
+
+        :return: Seconds.
+        """
+        return self._retry_after
+
+
+class ToolError(Exception):
+    """
+    Throw this error when a tool call cannot be made or does not finish.
+    """
+
+    def __init__(self, message: str, cause: Exception | None = None):
+        """
+        Constructor.
+
+        :param message: Custom message.
+        :param cause: Optional cause.
+        """
+        self._message = message
+        self._cause = cause
+
+    @property
+    def message(self) -> str:
+        """
+        Return the custom message.
+
+        :return: The message.
+        """
+        return self._message
+
+    @property
+    def cause(self) -> Exception | None:
+        """
+        Return the cause of this error.
+
+        :return: The exception cause.
+        """
+        return self._cause
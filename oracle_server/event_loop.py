@@ -0,0 +1,121 @@
+"""
+Process-wide background event loop.
+
+Connexion runs each async Flask view on its own short-lived event loop.
+Async clients such as `httpx.AsyncClient` bind their connections to the
+loop that opened them, so sharing them between requests only works if all
+async chat work runs on one long-lived loop. `BackgroundLoop` owns such a
+loop on a daemon thread and lets any thread or loop hand work to it.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import AsyncIterator, Coroutine, Iterator
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+_LOGGER = logging.getLogger()
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running forever on a daemon thread.
+    """
+
+    def __init__(self, name: str):
+        """
+        Constructor. The loop is started lazily on first use.
+
+        :param name: Name of the loop's thread.
+        """
+        self._name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Return the running loop, starting it if needed.
+
+        :return: The event loop.
+        """
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=loop.run_forever, name=self._name, daemon=True
+                    ).start()
+                    _LOGGER.info(f"Started background event loop '{self._name}'")
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> Future[T]:
+        """
+        Schedule a coroutine on the loop from any thread.
+
+        :param coro: The coroutine.
+        :return: A future for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Run a coroutine on the loop and await its result from another loop.
+
+        :param coro: The coroutine.
+        :return: Its result.
+        """
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def iterate(self, items: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Drive an async iterator on the loop from synchronous code. If the
+        consumer stops early, e.g. an SSE client disconnects, the iterator
+        is closed on the loop, so the work producing it stops as well.
+
+        :param items: The async iterator.
+        :return: A blocking iterator over the same items.
+        """
+        exhausted = False
+        try:
+            while True:
+                try:
+                    yield self.submit(_anext(items)).result()
+                except StopAsyncIteration:
+                    exhausted = True
+                    return
+        finally:
+            if not exhausted:
+                self.submit(aclose(items))
+
+
+async def _anext(items: AsyncIterator[T]) -> T:
+    """Coroutine wrapper around `anext`."""
+    return await anext(items)
+
+
+async def aclose(items: AsyncIterator[Any]) -> None:
+    """
+    Close an async iterator if it supports closing, as async generators do.
+
+    :param items: The async iterator.
+    """
+    close = getattr(items, "aclose", None)
+    if close is not None:
+        await close()
+
+
+_CHAT_LOOP = BackgroundLoop("chat-loop")
+
+
+def chat_loop() -> BackgroundLoop:
+    """
+    Return the loop all async chat work runs on.
+
+    :return: The shared chat loop.
+    """
+    return _CHAT_LOOP
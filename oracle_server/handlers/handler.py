@@ -1,28 +1,95 @@
 """Basic chat handler."""
 
+import asyncio
 import logging
+import time
 import uuid
 from abc import ABC, abstractmethod
-from collections.abc import Iterator
-
-from langchain_core.messages import HumanMessage
-from langchain_core.vectorstores import VectorStoreRetriever
+from collections.abc import AsyncIterator, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Annotated, Any
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI
-from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
 
-from oracle_server.error import ChatError
-from oracle_server.vectorstore import ChromaVectorStore
+from oracle_server.backend_pool import backend_pool
+from oracle_server.conversation_memory import (
+    DEFAULT_MEMORY_TOKEN_BUDGET,
+    DEFAULT_MEMORY_TURNS,
+    RollingSummaryMemory,
+    Summary,
+)
+from oracle_server.error import ChatError, VectorDBError
+from oracle_server.event_loop import aclose
+from oracle_server.http_client import shared_http_pool
+from oracle_server.semantic_cache import SemanticCache
+from oracle_server.vectorstore import (
+    DEFAULT_SQLITE_DIR,
+    DEFAULT_VECTOR_COLLECTION,
+    ChromaVectorStore,
+    SimilarEmbeddingRecord,
+    VectorStore,
+    VectorStoreFactory,
+)
 
 _LOGGER = logging.getLogger()
 
 # todo: move to config
 DEFAULT_MODEL_TEMP = 0.7
 DEFAULT_TOP_K = 5
-DEFAULT_SQLITE_DIR = "./chromadb"
-DEFAULT_VECTOR_COLLECTION = "babylon_vectors"
 DEFAULT_CHAT_MEMORY_KEY = "chat_history"
 DEFAULT_OPEN_API_KEY = "ollama"
+# Time the retrieval stage may take before the model answers without context.
+DEFAULT_RETRIEVAL_BUDGET_MS = 500
+DEFAULT_RETRIEVAL_WORKERS = 8
+# Max queries embedded per forward pass. 1 embeds each query on its own.
+DEFAULT_EMBEDDING_BATCH_SIZE = 1
+DEFAULT_EMBEDDING_BATCH_WAIT_MS = 5
+
+CONTEXT_PROMPT = (
+    "Use the following context from the user's data to answer their "
+    "question. If the context is not relevant, ignore it.\n\n{context}"
+)
+
+# Vector store queries are blocking; they run here so the retrieval stage
+# can give up on them once its time budget is spent.
+_RETRIEVAL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=DEFAULT_RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+)
+
+
+def _merge_timings(
+    current: dict[str, float], update: dict[str, float]
+) -> dict[str, float]:
+    """Reducer which keeps the latest timing of each stage."""
+    return {**current, **update}
+
+
+class RagState(MessagesState):
+    """
+    Graph state: the conversation, plus the context retrieved for the
+    current turn and how long each stage of the turn took (in seconds).
+
+    `use_semantic_cache` is kept per thread, so a conversation can opt out
+    of the semantic cache, and `cached` records whether the current turn
+    was answered from it.
+
+    `summary` summarizes the first `summarized` messages, which prompts
+    include in their place.
+    """
+
+    context: list[Document]
+    timings: Annotated[dict[str, float], _merge_timings]
+    use_semantic_cache: bool
+    cached: bool
+    summary: str
+    summarized: int
 
 
 # todo: add factory
@@ -34,56 +101,167 @@ class ChatHandler(ABC):
         self,
         embedding_model: str,
         llm_model: str,
-        model_url: str | None = None,
-        thread_id: str | None = None,
-    ):
+        model_url: str | Sequence[str] | None = None,
+        checkpointer: BaseCheckpointSaver | None = None,
+        hyper_parameters: dict | None = None,
+        semantic_cache: SemanticCache | None = None,
+        vector_store_factory: VectorStoreFactory | None = None,
+    ):  # pylint: disable=too-many-arguments,too-many-positional-arguments
         """
         Constructor.
 
+        A handler owns the expensive, thread-agnostic resources (embedding
+        model, vector store, LLM clients and compiled graph) and is safe to
+        share across concurrent requests. Conversation state is selected
+        per call through the thread id.
+
         :param llm_model: Model identifier.
+        :param model_url: Url of the OpenAI-compatible server serving the
+                          model, or of several, between which requests are
+                          load balanced. None for hosted models.
+        :param checkpointer: Conversation state store. Defaults to an
+                             in-memory store local to this handler.
+        :param hyper_parameters: Overrides of the default hyper parameters.
+        :param semantic_cache: Cache of answers to first questions. Disabled if None.
+        :param vector_store_factory: Builds the vector store for the embedding
+                                     model. Defaults to a local Chroma store.
         """
         self._embedding_model = embedding_model
         self._llm_model = llm_model
-        self._model_url = model_url
+        self._model_urls = list(
+            dict.fromkeys(
+                [model_url] if isinstance(model_url, str) else model_url or []
+            )
+        )
         # Set up hyper params.
         self._hyper_parameters = {
             "temperature": DEFAULT_MODEL_TEMP,
             "top_k": DEFAULT_TOP_K,
+            "retrieval_budget_ms": DEFAULT_RETRIEVAL_BUDGET_MS,
+            "embedding_batch_size": DEFAULT_EMBEDDING_BATCH_SIZE,
+            "embedding_batch_wait_ms": DEFAULT_EMBEDDING_BATCH_WAIT_MS,
+            "memory_turns": DEFAULT_MEMORY_TURNS,
+            "memory_token_budget": DEFAULT_MEMORY_TOKEN_BUDGET,
+            **(hyper_parameters or {}),
         }
-        self._vector_store = ChromaVectorStore(
-            model=self._embedding_model,
-            sqlite_dir=DEFAULT_SQLITE_DIR,
-            collection=DEFAULT_VECTOR_COLLECTION,
-        )
-        self._chatbot = self.retrieve_chatbot()
-        self._vector_retriever = self._retrieve_vectors()
-        self._thread_id = thread_id or str(uuid.uuid4())
-        self._config = {"configurable": {"thread_id": self._thread_id}}
+        self._vector_store = (vector_store_factory or _chroma_vector_store)(
+            self._embedding_model
+        )
+        if self._hyper_parameters["embedding_batch_size"] > 1:
+            # Concurrent chats share forward passes for their query embeddings.
+            self._vector_store.enable_batching(
+                max_batch=self._hyper_parameters["embedding_batch_size"],
+                max_wait_ms=self._hyper_parameters["embedding_batch_wait_ms"],
+            )
+        self._semantic_cache = semantic_cache
+        self._chatbots = (
+            {url: self.retrieve_chatbot(url) for url in self._model_urls}
+            if self._model_urls
+            else {self._llm_model: self.retrieve_chatbot()}
+        )
+        self._memory = RollingSummaryMemory(
+            summarize=self._summarize,
+            max_turns=self._hyper_parameters["memory_turns"],
+            token_budget=self._hyper_parameters["memory_token_budget"],
+        )
         try:
             _LOGGER.info("Compiling LangGraph workflow")
             self._workflow = self._create_workflow()
-            self._app = self._workflow.compile(checkpointer=MemorySaver())
+            self._app = self._workflow.compile(
+                checkpointer=checkpointer or MemorySaver()
+            )
         except Exception as e:
-            message = f"Error compiling workflow for thread {self._thread_id}"
+            message = f"Error compiling workflow for model {self._llm_model}"
             _LOGGER.info(message)
             raise ChatError(message=message, cause=e) from e
 
     @abstractmethod
-    def handle_input_message(self, message: str):
+    def handle_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ):
         """
         Handles a message inputted from the user.
 
         :param message: The user's message.
+        :param thread_id: Conversation thread to continue. A new thread
+                          is started if none is given.
+        :param use_semantic_cache: Whether the thread may be answered from the
+                                   semantic cache. Unchanged if None.
         """
 
-    @property
-    def thread_id(self) -> str:
+    @abstractmethod
+    def stream_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> Iterator[str]:
+        """
+        Handles a message inputted from the user, yielding the response
+        token by token as the model generates it.
+
+        :param message: The user's message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
+        :return: Iterator over response tokens.
+        """
+
+    @abstractmethod
+    def ahandle_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> AsyncIterator:
+        """
+        Async version of `handle_input_message`. Model and vector store
+        calls are awaited rather than blocking the event loop.
+
+        :param message: The user's message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
+        :return: Async iterator over message responses.
+        """
+
+    @abstractmethod
+    def astream_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Async version of `stream_input_message`.
+
+        :param message: The user's message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
+        :return: Async iterator over response tokens.
+        """
+
+    async def acopy_thread(self, source_thread_id: str, thread_id: str) -> None:
         """
-        Return the thread id.
+        Start a thread with a copy of another thread's conversation, e.g. to
+        give a client its own thread for an answer generated for another.
+        The two threads continue independently.
 
-        :return: The thread id.
+        :param source_thread_id: Thread to copy.
+        :param thread_id: New thread.
         """
-        return self._thread_id
+        snapshot = await self._app.aget_state(
+            thread_config(source_thread_id)  # type: ignore
+        )
+        # As if the turn had run on the new thread; the model stage ends a turn.
+        await self._app.aupdate_state(
+            thread_config(thread_id), snapshot.values, as_node="model"  # type: ignore
+        )
+
+    def warm_up(self) -> None:
+        """Initialize lazily loaded resources before the first request."""
+        self._vector_store.warm_up()
 
     @property
     def embedding_model(self) -> str:
@@ -95,6 +273,25 @@ class ChatHandler(ABC):
         """
         return self._embedding_model
 
+    @property
+    def backends(self) -> list[str]:
+        """
+        Return the LLM backends this handler's requests are balanced
+        between: the model server urls, or the model name for hosted models.
+
+        :return: Backend names.
+        """
+        return self._model_urls or [self._llm_model]
+
+    @property
+    def backend(self) -> str:
+        """
+        Return the name of this handler's pool of LLM backends.
+
+        :return: Backend names, comma separated.
+        """
+        return ",".join(self.backends)
+
     @property
     def hyper_parameters(self) -> dict:
         """
@@ -104,58 +301,86 @@ class ChatHandler(ABC):
         """
         return self._hyper_parameters
 
+    @property
+    def memory(self) -> RollingSummaryMemory:
+        """
+        Return the memory which keeps prompts within their token budget.
+
+        :return: The conversation memory.
+        """
+        return self._memory
+
     @property
     def chatbot(self) -> ChatOpenAI:
         """
-        Return this handler's LLM Chatbot.
+        Return this handler's LLM Chatbot for its first backend.
 
         :return: The LLM Chatbot for the handler.
         """
-        return self._chatbot
+        return self._chatbots[self.backends[0]]
 
     def retrieve_chatbot(
         self,
+        model_url: str | None = None,
     ) -> ChatOpenAI:
         """
-        Retrieve a chatbot based on model identifier.
+        Retrieve a chatbot based on model identifier. The chatbot sends its
+        requests through the process-wide HTTP connection pool.
 
+        :param model_url: Model server url. None for hosted models.
         :return: A  `ChatOpenAI` instantiation with the model.
         """
         temperature = self.hyper_parameters.get("temperature", DEFAULT_MODEL_TEMP)
+        http_pool = shared_http_pool()
         # Some models require slightly different configurations.
-        if self._model_url:
+        if model_url:
             _LOGGER.debug(f"Opening ChatOpenAI interface for model {self._llm_model}")
             llm = ChatOpenAI(
                 temperature=temperature,
                 model=self._llm_model,
-                base_url=self._model_url,
+                base_url=model_url,
                 api_key=DEFAULT_OPEN_API_KEY,  # type: ignore
+                http_client=http_pool.client,
+                http_async_client=http_pool.async_client,
             )
         else:
             _LOGGER.debug(f"Opening ChatOpenAI interface for model {self._llm_model}")
-            llm = ChatOpenAI(temperature=temperature, model=self._llm_model)
+            llm = ChatOpenAI(
+                temperature=temperature,
+                model=self._llm_model,
+                http_client=http_pool.client,
+                http_async_client=http_pool.async_client,
+            )
         return llm
 
-    def _retrieve_vectors(self) -> VectorStoreRetriever:
-        """
-        Return a retriever for the vector store.
-
-        :return: VectorStoreRetriever.
-        """
-        top_k = self.hyper_parameters.get("top_k", DEFAULT_TOP_K)
-        _LOGGER.debug("Retrieving vector store retriever")
-        return self._vector_store.db_client.as_retriever(search_kwargs={"k": top_k})
-
     def _create_workflow(self) -> StateGraph:
         """
-        Create the workflow for the chatbot.
+        Create the workflow for the chatbot: retrieve context, then answer.
+        With a semantic cache, a cached answer short-circuits both stages.
 
         :return: A `StateGraph` instance.
         """
         _LOGGER.info("Building State Graph")
-        workflow = StateGraph(state_schema=MessagesState)
-        workflow.add_node("model", self.rag_model)
-        workflow.add_edge(START, "model")
+        workflow = StateGraph(state_schema=RagState)
+        # Each node runs its sync function under `stream` and its async
+        # function under `astream`.
+        workflow.add_node(
+            "retrieve", RunnableLambda(self.retrieve, afunc=self.aretrieve)
+        )
+        workflow.add_node(
+            "model", RunnableLambda(self.rag_model, afunc=self.arag_model)
+        )
+        if self._semantic_cache is not None:
+            workflow.add_node(
+                "cache", RunnableLambda(self.cache_lookup, afunc=self.acache_lookup)
+            )
+            workflow.add_edge(START, "cache")
+            workflow.add_conditional_edges(
+                "cache", _after_cache_lookup, ["retrieve", END]
+            )
+        else:
+            workflow.add_edge(START, "retrieve")
+        workflow.add_edge("retrieve", "model")
         return workflow
 
     # Define the function that calls the chatbot LLM model.
@@ -166,17 +391,217 @@ class ChatHandler(ABC):
         :param state: Current message history.
         :return: Chat response.
         """
-        return self.chatbot.invoke(state["messages"])
+        return self._invoke(state["messages"])
 
-    def rag_model(self, state: MessagesState) -> dict:
+    def _invoke(self, prompt: Sequence[BaseMessage]) -> BaseMessage:
+        """
+        Invoke the chat model on the least loaded healthy backend.
+
+        :param prompt: Prompt messages.
+        :return: The model's response.
+        """
+        with backend_pool(self.backends).request() as backend:
+            return self._chatbots[backend].invoke(prompt)
+
+    async def _ainvoke(self, prompt: Sequence[BaseMessage]) -> BaseMessage:
+        """
+        Async version of `_invoke`.
+
+        :param prompt: Prompt messages.
+        :return: The model's response.
+        """
+        with backend_pool(self.backends).request() as backend:
+            return await self._chatbots[backend].ainvoke(prompt)
+
+    def cache_lookup(self, state: RagState) -> dict:
+        """
+        Answer the turn from the semantic cache if a near-duplicate question
+        was answered before.
+
+        :param state: Current graph state.
+        :return: State update with the cached answer, if any.
+        """
+        if not self._uses_semantic_cache(state):
+            return {"cached": False}
+        start = time.perf_counter()
+        answer = self._semantic_cache.lookup(  # type: ignore[union-attr]
+            self._vector_store.embed_query(_latest_user_text(state["messages"])),
+            self._vector_store.corpus_version,
+        )
+        timings = {"cache": time.perf_counter() - start}
+        if answer is None:
+            return {"cached": False, "timings": timings}
+        _LOGGER.info("Answered from semantic cache")
+        return {
+            "messages": [AIMessage(content=answer)],
+            "cached": True,
+            "timings": timings,
+        }
+
+    async def acache_lookup(self, state: RagState) -> dict:
+        """
+        Async version of `cache_lookup`. Embedding the question blocks, so it
+        runs on a worker thread.
+
+        :param state: Current graph state.
+        :return: State update with the cached answer, if any.
+        """
+        return await asyncio.to_thread(self.cache_lookup, state)
+
+    def retrieve(self, state: RagState) -> dict:
+        """
+        Retrieve context for the latest user message from the vector store.
+
+        If the search does not finish within the retrieval budget, or fails,
+        the turn continues without context.
+
+        :param state: Current graph state.
+        :return: State update with the retrieved context and stage timing.
+        """
+        start = time.perf_counter()
+        future = _RETRIEVAL_EXECUTOR.submit(
+            self._vector_store.search,
+            _latest_user_text(state["messages"]),
+            self.hyper_parameters["top_k"],
+        )
+        try:
+            records = future.result(timeout=self._retrieval_budget_seconds)
+        except (FutureTimeoutError, VectorDBError) as e:
+            future.cancel()
+            records = self._retrieval_fallback(e)
+        return _retrieval_update(records, time.perf_counter() - start)
+
+    async def aretrieve(self, state: RagState) -> dict:
+        """
+        Async version of `retrieve`.
+
+        :param state: Current graph state.
+        :return: State update with the retrieved context and stage timing.
+        """
+        start = time.perf_counter()
+        search = asyncio.get_running_loop().run_in_executor(
+            _RETRIEVAL_EXECUTOR,
+            self._vector_store.search,
+            _latest_user_text(state["messages"]),
+            self.hyper_parameters["top_k"],
+        )
+        try:
+            records = await asyncio.wait_for(
+                search, timeout=self._retrieval_budget_seconds
+            )
+        except (asyncio.TimeoutError, VectorDBError) as e:
+            records = self._retrieval_fallback(e)
+        return _retrieval_update(records, time.perf_counter() - start)
+
+    def rag_model(self, state: RagState, config: RunnableConfig | None = None) -> dict:
         """
         Invoke the RAG model.
 
-        :param state: Current message history.
+        The prompt holds the thread's summary and its recent turns; older
+        turns are summarized in the background once the conversation is
+        over its token budget.
+
+        :param state: Current graph state.
+        :param config: Runnable config, which names the thread.
         :return: Chat response.
         """
-        response = self.chatbot.invoke(state["messages"])
-        return {"messages": [response]}
+        start = time.perf_counter()
+        thread_id = _thread_id(config)
+        summary = self._memory.latest_summary(thread_id, _summary(state))
+        response = self._invoke(self._prompt(state, summary))
+        self._cache_answer(state, response)
+        return self._turn_update(
+            state, thread_id, summary, response, time.perf_counter() - start
+        )
+
+    async def arag_model(
+        self, state: RagState, config: RunnableConfig | None = None
+    ) -> dict:
+        """
+        Async version of `rag_model`.
+
+        :param state: Current graph state.
+        :param config: Runnable config, which names the thread.
+        :return: Chat response.
+        """
+        start = time.perf_counter()
+        thread_id = _thread_id(config)
+        summary = self._memory.latest_summary(thread_id, _summary(state))
+        response = await self._ainvoke(self._prompt(state, summary))
+        # Embedding the question blocks, so it runs on a worker thread.
+        await asyncio.to_thread(self._cache_answer, state, response)
+        return self._turn_update(
+            state, thread_id, summary, response, time.perf_counter() - start
+        )
+
+    def _prompt(self, state: RagState, summary: Summary) -> Sequence[BaseMessage]:
+        """Return the model prompt: the retrieved context, then the conversation."""
+        return _prompt(state, self._memory.prompt_messages(state["messages"], summary))
+
+    def _turn_update(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        state: RagState,
+        thread_id: str | None,
+        summary: Summary,
+        response: BaseMessage,
+        elapsed: float,
+    ) -> dict:
+        """
+        Return the state update of the model stage, with the summary if it
+        changed, and summarize the conversation if it is over its budget.
+        """
+        update = _model_update(state, response, elapsed)
+        if summary.covered > state.get("summarized", 0):
+            update["summary"] = summary.text
+            update["summarized"] = summary.covered
+        self._memory.schedule(thread_id, [*state["messages"], response], summary)
+        return update
+
+    def _summarize(self, prompt: list[BaseMessage]) -> str:
+        """Write a conversation summary with the chat model."""
+        return _content_text(self._invoke(prompt).content)
+
+    def _uses_semantic_cache(self, state: RagState) -> bool:
+        """
+        Return whether the current turn may use the semantic cache. Only a
+        thread's first question is cached, as later answers depend on the
+        conversation so far.
+        """
+        return (
+            self._semantic_cache is not None
+            and state.get("use_semantic_cache", True)
+            and len(state["messages"]) == 1
+        )
+
+    def _cache_answer(self, state: RagState, response: BaseMessage) -> None:
+        """Store the model's answer to a first question in the semantic cache."""
+        answer = _content_text(response.content)
+        if not answer or not self._uses_semantic_cache(state):
+            return
+        self._semantic_cache.store(  # type: ignore[union-attr]
+            self._vector_store.embed_query(_latest_user_text(state["messages"])),
+            answer,
+            self._vector_store.corpus_version,
+        )
+
+    @property
+    def _retrieval_budget_seconds(self) -> float:
+        """Return the retrieval time budget in seconds."""
+        return self.hyper_parameters["retrieval_budget_ms"] / 1000
+
+    def _retrieval_fallback(self, error: Exception) -> list[SimilarEmbeddingRecord]:
+        """Log why retrieval was skipped and return no context."""
+        if isinstance(error, VectorDBError):
+            _LOGGER.warning(
+                f"Retrieval failed, answering without context: {error.message}"
+            )
+        else:
+            _LOGGER.warning(
+                "Retrieval exceeded its budget of "
+                f"{self.hyper_parameters['retrieval_budget_ms']}ms, "
+                "answering without context"
+            )
+        return []
 
 
 class BabylonChatHandler(ChatHandler):
@@ -188,35 +613,234 @@ class BabylonChatHandler(ChatHandler):
         self,
         embedding_model: str,
         llm_model: str,
-        model_url: str | None = None,
-        thread_id: str | None = None,
-    ):
+        model_url: str | Sequence[str] | None = None,
+        checkpointer: BaseCheckpointSaver | None = None,
+        hyper_parameters: dict | None = None,
+        semantic_cache: SemanticCache | None = None,
+        vector_store_factory: VectorStoreFactory | None = None,
+    ):  # pylint: disable=too-many-arguments,too-many-positional-arguments
         """
         Constructor.
 
         :param embedding_model: Target embeddings model.
         :param llm_model: Target chatbot model.
-        :param model_url: Model url.
-        :param thread_id: Any predifined thread a current process is running on.
+        :param model_url: Model server url, or urls to load balance between.
+        :param checkpointer: Conversation state store.
+        :param hyper_parameters: Overrides of the default hyper parameters.
+        :param semantic_cache: Cache of answers to first questions.
+        :param vector_store_factory: Builds the vector store for the embedding model.
         """
         super().__init__(
             embedding_model=embedding_model,
             llm_model=llm_model,
             model_url=model_url,
-            thread_id=thread_id,
+            checkpointer=checkpointer,
+            hyper_parameters=hyper_parameters,
+            semantic_cache=semantic_cache,
+            vector_store_factory=vector_store_factory,
         )
 
-    def handle_input_message(self, message: str) -> Iterator:
+    def handle_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> Iterator:
         """
         Handle a user's input message.
 
         :param message: The user message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
         :return: Iterator over message responses.
         """
-        input_message = HumanMessage(content=message)
         _LOGGER.debug(f"Generating streamed response for message: {message}")
         return self._app.stream(
-            {"messages": [input_message]},  # type: ignore
-            self._config,  # type: ignore
+            _turn_input(message, use_semantic_cache),  # type: ignore
+            thread_config(thread_id or new_thread_id()),  # type: ignore
             stream_mode="values",
         )
+
+    def stream_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> Iterator[str]:
+        """
+        Handle a user's input message, streaming the model's tokens.
+
+        :param message: The user message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
+        :return: Iterator over response tokens.
+        """
+        _LOGGER.debug(f"Generating token stream for message: {message}")
+        for chunk, metadata in self._app.stream(  # type: ignore
+            _turn_input(message, use_semantic_cache),  # type: ignore
+            thread_config(thread_id or new_thread_id()),  # type: ignore
+            stream_mode="messages",
+        ):
+            if token := _model_token(chunk, metadata):  # type: ignore[arg-type]
+                yield token
+
+    def ahandle_input_message(
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> AsyncIterator:
+        """
+        Handle a user's input message asynchronously.
+
+        :param message: The user message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
+        :return: Async iterator over message responses.
+        """
+        _LOGGER.debug(f"Generating async streamed response for message: {message}")
+        return self._app.astream(
+            _turn_input(message, use_semantic_cache),  # type: ignore
+            thread_config(thread_id or new_thread_id()),  # type: ignore
+            stream_mode="values",
+        )
+
+    async def astream_input_message(  # pylint: disable=invalid-overridden-method
+        self,
+        message: str,
+        thread_id: str | None = None,
+        use_semantic_cache: bool | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Handle a user's input message asynchronously, streaming the model's tokens.
+
+        :param message: The user message.
+        :param thread_id: Conversation thread to continue.
+        :param use_semantic_cache: Whether the thread may use the semantic cache.
+        :return: Async iterator over response tokens.
+        """
+        _LOGGER.debug(f"Generating async token stream for message: {message}")
+        chunks = self._app.astream(  # type: ignore
+            _turn_input(message, use_semantic_cache),  # type: ignore
+            thread_config(thread_id or new_thread_id()),  # type: ignore
+            stream_mode="messages",
+        )
+        try:
+            async for chunk, metadata in chunks:
+                if token := _model_token(chunk, metadata):  # type: ignore[arg-type]
+                    yield token
+        finally:
+            # Closing the graph's stream cancels the generation behind it.
+            await aclose(chunks)
+
+
+def _chroma_vector_store(embedding_model: str) -> VectorStore:
+    """Return the default vector store: the local Chroma collection."""
+    return ChromaVectorStore(
+        model=embedding_model,
+        sqlite_dir=DEFAULT_SQLITE_DIR,
+        collection=DEFAULT_VECTOR_COLLECTION,
+    )
+
+
+def _latest_user_text(messages: Sequence[BaseMessage]) -> str:
+    """Return the text of the most recent user message."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return _content_text(message.content)
+    return ""
+
+
+def _turn_input(message: str, use_semantic_cache: bool | None) -> dict:
+    """Return the graph input for a user message."""
+    turn: dict[str, Any] = {"messages": [HumanMessage(content=message)]}
+    if use_semantic_cache is not None:
+        turn["use_semantic_cache"] = use_semantic_cache
+    return turn
+
+
+def _after_cache_lookup(state: RagState) -> str:
+    """Return the stage after the cache lookup: done on a hit, else retrieval."""
+    return END if state.get("cached") else "retrieve"
+
+
+def _retrieval_update(records: list[SimilarEmbeddingRecord], elapsed: float) -> dict:
+    """Return the state update of the retrieval stage."""
+    return {
+        "context": [document for document, _ in records],
+        "timings": {"retrieve": elapsed},
+    }
+
+
+def _prompt(state: RagState, messages: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
+    """Return the model prompt: the retrieved context, then the messages."""
+    context = state.get("context") or []
+    if not context:
+        return messages
+    context_text = "\n\n".join(document.page_content for document in context)
+    return [
+        SystemMessage(content=CONTEXT_PROMPT.format(context=context_text)),
+        *messages,
+    ]
+
+
+def _summary(state: RagState) -> Summary:
+    """Return the conversation summary in a thread's state."""
+    return Summary(state.get("summary", ""), state.get("summarized", 0))
+
+
+def _thread_id(config: RunnableConfig | None) -> str | None:
+    """Return the thread a runnable config names, if any."""
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def _model_update(state: RagState, response: BaseMessage, elapsed: float) -> dict:
+    """Return the state update of the model stage, logging the turn's timings."""
+    timings = {**state.get("timings", {}), "model": elapsed}
+    stages = ", ".join(
+        f"{stage}={seconds * 1000:.1f}" for stage, seconds in timings.items()
+    )
+    _LOGGER.info(f"Stage timings (ms): {stages}")
+    return {"messages": [response], "timings": {"model": elapsed}}
+
+
+def _model_token(chunk: Any, metadata: dict) -> str:
+    """
+    Return the text of a streamed model token, or "" for any other message.
+    A cached answer is streamed as a single token.
+    """
+    if metadata.get("langgraph_node") not in ("model", "cache"):
+        return ""
+    # Models which don't stream emit their whole reply as a single message.
+    if not isinstance(chunk, AIMessage):
+        return ""
+    return _content_text(chunk.content)
+
+
+def _content_text(content: str | list) -> str:
+    """Return message content as a string."""
+    if isinstance(content, str):
+        return content
+    return "".join(str(item) for item in content)
+
+
+def new_thread_id() -> str:
+    """
+    Return a new, unique conversation thread id.
+
+    :return: The thread id.
+    """
+    return str(uuid.uuid4())
+
+
+def thread_config(thread_id: str) -> dict:
+    """
+    Return the per-request graph config for a conversation thread.
+
+    This is the only per-request state; everything else on a
+    `ChatHandler` is shared between requests.
+
+    :param thread_id: The conversation thread id.
+    :return: LangGraph runnable config.
+    """
+    return {"configurable": {"thread_id": thread_id}}
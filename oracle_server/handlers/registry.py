@@ -0,0 +1,165 @@
+"""
+Process-wide registry of warm chat handlers.
+
+Building a `ChatHandler` loads the embedding model, opens the vector
+store, creates the LLM client and compiles the LangGraph workflow. The
+registry does this once per handler name and shares the instance between
+all requests served by the process.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from flask import Flask, current_app
+
+from oracle_server.checkpoint import create_checkpointer
+from oracle_server.error import UnknownHandlerError
+from oracle_server.handlers.handler import BabylonChatHandler, ChatHandler
+from oracle_server.semantic_cache import create_semantic_cache
+from oracle_server.vectorstore import create_vector_store
+
+_LOGGER = logging.getLogger()
+
+# todo: move to config
+DEFAULT_GPT_MODEL = "llama3.2"
+DEFAULT_GPT_MODEL_URL = "http://localhost:11434/v1"
+
+DEFAULT_HANDLER_NAME = "babylon"
+
+# Key the registry is stored under in `Flask.extensions`.
+REGISTRY_EXTENSION_KEY = "chat_handler_registry"
+
+# A `HandlerFactory` builds a handler from the application config.
+HandlerFactory = Callable[[Mapping[str, Any]], ChatHandler]
+
+
+def _babylon_handler(cfg: Mapping[str, Any]) -> ChatHandler:
+    """Build the default Babylon handler."""
+    return BabylonChatHandler(
+        llm_model=DEFAULT_GPT_MODEL,
+        embedding_model=cfg["EMBEDDING_MODEL"],
+        model_url=cfg.get("LLM_BACKEND_URLS") or DEFAULT_GPT_MODEL_URL,
+        checkpointer=create_checkpointer(cfg),
+        hyper_parameters={
+            "retrieval_budget_ms": cfg["RETRIEVAL_BUDGET_MS"],
+            "embedding_batch_size": cfg["EMBEDDING_BATCH_SIZE"],
+            "embedding_batch_wait_ms": cfg["EMBEDDING_BATCH_WAIT_MS"],
+            "memory_turns": cfg["MEMORY_TURNS"],
+            "memory_token_budget": cfg["MEMORY_TOKEN_BUDGET"],
+        },
+        semantic_cache=create_semantic_cache(cfg),
+        vector_store_factory=functools.partial(create_vector_store, cfg),
+    )
+
+
+HANDLER_FACTORIES: dict[str, HandlerFactory] = {
+    DEFAULT_HANDLER_NAME: _babylon_handler,
+}
+
+
+class HandlerRegistry:
+    """
+    Lazily builds and caches one `ChatHandler` per handler name.
+    """
+
+    def __init__(
+        self,
+        config: Mapping[str, Any],
+        factories: Mapping[str, HandlerFactory] | None = None,
+    ):
+        """
+        Constructor.
+
+        :param config: Application config handed to each factory.
+        :param factories: Handler factories by name. Defaults to `HANDLER_FACTORIES`.
+        """
+        self._config = config
+        self._factories = dict(HANDLER_FACTORIES if factories is None else factories)
+        self._handlers: dict[str, ChatHandler] = {}
+        self._build_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def handler_names(self) -> list[str]:
+        """
+        Return the names of all known handlers.
+
+        :return: Handler names.
+        """
+        return list(self._factories)
+
+    def get(self, name: str | None = None) -> ChatHandler:
+        """
+        Return the shared handler for a name, building it on first use.
+
+        Concurrent first requests for the same name wait on a per-name
+        lock, so each handler is only ever built once.
+
+        :param name: Handler name. Defaults to `DEFAULT_HANDLER_NAME`.
+        :return: The shared handler.
+        :raise: UnknownHandlerError - If no factory is registered for the name.
+        """
+        name = name or DEFAULT_HANDLER_NAME
+        handler = self._handlers.get(name)
+        if handler is not None:
+            return handler
+        if name not in self._factories:
+            raise UnknownHandlerError(name)
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            handler = self._handlers.get(name)
+            if handler is None:
+                _LOGGER.info(f"Building chat handler '{name}'")
+                handler = self._factories[name](self._config)
+                self._handlers[name] = handler
+        return handler
+
+    def warm_up(self, names: list[str] | None = None) -> None:
+        """
+        Build handlers and warm them up, so the first requests they serve
+        do not pay for model loading and initialization.
+
+        :param names: Handlers to warm up. Defaults to the default handler.
+        """
+        for name in names or [DEFAULT_HANDLER_NAME]:
+            start = time.perf_counter()
+            self.get(name).warm_up()
+            _LOGGER.info(
+                f"Chat handler '{name}' ready in "
+                f"{(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+
+    def clear(self) -> None:
+        """Drop all built handlers. They are rebuilt on next use."""
+        with self._lock:
+            self._handlers.clear()
+
+
+def setup_handler_registry(flask_app: Flask) -> HandlerRegistry:
+    """
+    Attach a handler registry to the app, warming up the default handler
+    if `WARM_UP_HANDLERS` is set.
+
+    :param flask_app: The app.
+    :return: The new registry.
+    """
+    registry = HandlerRegistry(config=flask_app.config)
+    flask_app.extensions[REGISTRY_EXTENSION_KEY] = registry
+    if flask_app.config.get("WARM_UP_HANDLERS"):
+        registry.warm_up()
+    return registry
+
+
+def get_handler_registry() -> HandlerRegistry:
+    """
+    Return the registry attached to the current app.
+
+    :return: The handler registry.
+    """
+    return current_app.extensions[REGISTRY_EXTENSION_KEY]
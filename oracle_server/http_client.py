@@ -0,0 +1,221 @@
+"""
+Shared HTTP connection pool for LLM backends.
+
+Each `ChatOpenAI` client otherwise opens its own connections to the model
+server. `HttpClientPool` owns one sync and one async `httpx` client for the
+whole process, which every chat model is given, so connections are kept
+alive and reused across handlers and requests, up to the configured pool
+limits.
+
+The async client is only used from the shared chat loop (see
+`oracle_server.event_loop`), as its connections are bound to the loop that
+opened them.
+
+HTTP/2 needs the `http2` extra (`h2`).
+"""
+
+import importlib.util
+import logging
+import threading
+from dataclasses import dataclass
+
+import httpx
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+# Idle connections are closed after this many seconds.
+DEFAULT_KEEPALIVE_EXPIRY_SECONDS = 30.0
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 5.0
+# Models may take a while to produce the first token of a long answer.
+DEFAULT_READ_TIMEOUT_SECONDS = 120.0
+
+
+@dataclass(frozen=True)
+class HttpPoolSettings:
+    """
+    Limits and timeouts of the shared HTTP clients.
+    """
+
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY_SECONDS
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT_SECONDS
+    read_timeout: float = DEFAULT_READ_TIMEOUT_SECONDS
+    http2: bool = False
+
+    @property
+    def limits(self) -> httpx.Limits:
+        """
+        Return the pool limits.
+
+        :return: `httpx` limits.
+        """
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        """
+        Return the client timeouts. Writes and waiting for a free pooled
+        connection share the connect timeout.
+
+        :return: `httpx` timeouts.
+        """
+        return httpx.Timeout(self.connect_timeout, read=self.read_timeout)
+
+
+class _MeteredTransport(httpx.HTTPTransport):
+    """A pooled transport which counts the requests it sends."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return super().handle_request(request)
+
+    def connections(self) -> list:
+        """Return the pool's open connections."""
+        return list(self._pool.connections)
+
+
+class _MeteredAsyncTransport(httpx.AsyncHTTPTransport):
+    """A pooled async transport which counts the requests it sends."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return await super().handle_async_request(request)
+
+    def connections(self) -> list:
+        """Return the pool's open connections."""
+        return list(self._pool.connections)
+
+
+class HttpClientPool:
+    """
+    Process-wide sync and async HTTP clients sharing one configuration.
+    The clients are created on first use.
+    """
+
+    def __init__(self, settings: HttpPoolSettings | None = None):
+        """
+        Constructor.
+
+        :param settings: Pool limits and timeouts. Defaults to `HttpPoolSettings()`.
+        """
+        self._settings = settings or HttpPoolSettings()
+        self._client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._transport: _MeteredTransport | None = None
+        self._async_transport: _MeteredAsyncTransport | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self) -> HttpPoolSettings:
+        """
+        Return the pool settings.
+
+        :return: The settings.
+        """
+        return self._settings
+
+    @property
+    def client(self) -> httpx.Client:
+        """
+        Return the shared sync client.
+
+        :return: The client.
+        """
+        with self._lock:
+            if self._client is None:
+                self._transport = _MeteredTransport(**self.__transport_kwargs())
+                self._client = httpx.Client(
+                    transport=self._transport, timeout=self._settings.timeout
+                )
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """
+        Return the shared async client.
+
+        :return: The client.
+        """
+        with self._lock:
+            if self._async_client is None:
+                self._async_transport = _MeteredAsyncTransport(
+                    **self.__transport_kwargs()
+                )
+                self._async_client = httpx.AsyncClient(
+                    transport=self._async_transport, timeout=self._settings.timeout
+                )
+            return self._async_client
+
+    def configure(self, settings: HttpPoolSettings) -> None:
+        """
+        Replace the pool settings. Clients already handed out keep their
+        connections; later calls to `client` and `async_client` get clients
+        with the new settings.
+
+        :param settings: Pool limits and timeouts.
+        :raise: ValueError - If HTTP/2 is requested but `h2` is not installed.
+        """
+        if settings.http2 and importlib.util.find_spec("h2") is None:
+            raise ValueError("HTTP/2 needs the `http2` extra (the `h2` package)")
+        with self._lock:
+            self._settings = settings
+            self._client = self._async_client = None
+            self._transport = self._async_transport = None
+        _LOGGER.info(f"HTTP pool settings: {settings}")
+
+    def stats(self) -> dict[str, float]:
+        """
+        Return pool utilization: open, busy and idle connections, requests
+        sent, and the share of `max_connections` in use.
+
+        :return: Counters over both clients.
+        """
+        with self._lock:
+            transports = [
+                t for t in (self._transport, self._async_transport) if t is not None
+            ]
+        connections = [c for t in transports for c in t.connections()]
+        idle = sum(1 for connection in connections if connection.is_idle())
+        busy = len(connections) - idle
+        return {
+            "max_connections": self._settings.max_connections,
+            "connections": len(connections),
+            "busy": busy,
+            "idle": idle,
+            "requests": sum(t.requests for t in transports),
+            "utilization": busy / self._settings.max_connections,
+        }
+
+    def __transport_kwargs(self) -> dict:
+        """Return the arguments of the pooled transports."""
+        return {
+            "limits": self._settings.limits,
+            "http2": self._settings.http2,
+        }
+
+
+_SHARED_POOL = HttpClientPool()
+
+
+def shared_http_pool() -> HttpClientPool:
+    """
+    Return the HTTP client pool shared by all chat models in this process.
+
+    :return: The shared pool.
+    """
+    return _SHARED_POOL
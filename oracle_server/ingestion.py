@@ -0,0 +1,706 @@
+"""
+Bulk ingestion from the Mongo data lake into the vector store.
+
+Every data lake collection whose name starts with `DATALAKE_COLLECTION_PREFIX`
+is read through a cursor, and its records flow through a pipeline of
+generators: record -> document -> chunks -> write batches. Each write batch
+is embedded in one call and written to the vector store before the next is
+read, so memory is bounded by the cursor and write batch sizes no matter how
+large the data lake is:
+
+    python -m oracle_server.ingestion --write-batch-size 256
+
+Ingestion is incremental. Each record's document id is derived from its
+collection, its record id and a hash of its content, and a manifest records
+which document each record was embedded as, and by which model. A re-run
+only embeds records which are new or changed (or were embedded by another
+model), and deletes the documents of records which changed or vanished.
+
+With `--workers`, chunking and embedding fan out over a pool of processes,
+each with its own copy of the model, while this process streams records
+and remains the single writer to the vector store.
+"""
+
+import argparse
+import dataclasses
+import hashlib
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Iterable, Iterator, TypeVar
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from oracle_server.embedding_backends import (
+    configure_embedding_backend,
+    get_embedding_backend,
+)
+from oracle_server.vectorstore import (
+    DEFAULT_VECTOR_COLLECTION,
+    VectorStore,
+    create_vector_store,
+)
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_DATALAKE_COLLECTION_PREFIX = "chase-data-"
+# Records fetched from Mongo per round trip.
+DEFAULT_CURSOR_BATCH_SIZE = 500
+# Chunks embedded and written to the vector store per call.
+DEFAULT_WRITE_BATCH_SIZE = 256
+# Max characters per chunk, and characters shared by consecutive chunks.
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 100
+DEFAULT_MANIFEST_DIR = "./manifests"
+
+_MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    collection TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    PRIMARY KEY (collection, record_id)
+);
+"""
+
+T = TypeVar("T")
+
+# A worker's result: chunks, and the name and shape of the shared memory
+# block holding their embeddings (None if there are no chunks).
+_WorkerResult = tuple[list[Document], str | None, tuple[int, ...]]
+
+# The embedding model of a worker process.
+_WORKER_MODEL: Embeddings | None = None
+
+
+@dataclass
+class IngestionStats:
+    """Counts of what one ingestion run read and wrote."""
+
+    collections: int = 0
+    records: int = 0
+    # Records skipped because the manifest shows them already embedded.
+    unchanged: int = 0
+    chunks: int = 0
+    batches: int = 0
+    # Documents deleted because their record changed or vanished.
+    deleted: int = 0
+    seconds: float = 0.0
+
+
+class IngestionManifest:
+    """
+    What has been ingested into one vector store collection: for each data
+    lake record, the document it was embedded as, in how many chunks, and by
+    which model. Kept in a sqlite file, so its memory use does not grow with
+    the data lake.
+
+    Each ingestion is a run. Records seen during a run are stamped with it;
+    records not stamped by the end of a complete run have vanished.
+    """
+
+    def __init__(self, path: str, model: str):
+        """
+        Constructor.
+
+        :param path: Path to the sqlite file. Created if it does not exist.
+        :param model: Name of the embedding model this run uses.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._model = model
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_MANIFEST_SCHEMA)
+        (last_run,) = self._conn.execute("SELECT MAX(run) FROM records").fetchone()
+        self._run = (last_run or 0) + 1
+        self._seen: list[tuple[int, str, str]] = []
+
+    def close(self) -> None:
+        """Close the underlying sqlite connection."""
+        self._conn.close()
+
+    def is_current(self, document: Document) -> bool:
+        """
+        Return whether a record's document is already embedded by this
+        run's model, and if so mark the record as seen.
+
+        :param document: A record's document, from `record_documents`.
+        :return: True if the document need not be embedded again.
+        """
+        key = (document.metadata["source"], document.metadata["record_id"])
+        row = self._conn.execute(
+            "SELECT document_id, model FROM records "
+            "WHERE collection = ? AND record_id = ?",
+            key,
+        ).fetchone()
+        if row != (document.id, self._model):
+            return False
+        self._seen.append((self._run, *key))
+        if len(self._seen) >= DEFAULT_WRITE_BATCH_SIZE:
+            self.commit()
+        return True
+
+    def record(self, chunks: Sequence[Document]) -> list[str]:
+        """
+        Record the records whose last chunk has been written.
+
+        :param chunks: Chunks just written to the vector store.
+        :return: Ids of documents the records were embedded as before,
+                 which are now stale.
+        """
+        stale: list[str] = []
+        for chunk in chunks:
+            metadata = chunk.metadata
+            if metadata["chunk"] != metadata["chunks"] - 1:
+                continue
+            key = (metadata["source"], metadata["record_id"])
+            row = self._conn.execute(
+                "SELECT document_id, chunks FROM records "
+                "WHERE collection = ? AND record_id = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                stored_id, count = row
+                # An unchanged record keeps its chunk ids.
+                first = (
+                    metadata["chunks"] if stored_id == metadata["document_id"] else 0
+                )
+                stale.extend(chunk_id(stored_id, i) for i in range(first, count))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    metadata["document_id"],
+                    metadata["chunks"],
+                    self._model,
+                    self._run,
+                ),
+            )
+        self.commit()
+        return stale
+
+    def vanished(self) -> Iterator[str]:
+        """
+        Yield the ids of the documents of records not seen during this run.
+        Only meaningful once every record has been streamed.
+        """
+        self.commit()
+        rows = self._conn.execute(
+            "SELECT document_id, chunks FROM records WHERE run < ?", (self._run,)
+        )
+        for stored_id, count in rows:
+            yield from (chunk_id(stored_id, i) for i in range(count))
+
+    def forget_vanished(self) -> None:
+        """Drop the records not seen during this run."""
+        self._conn.execute("DELETE FROM records WHERE run < ?", (self._run,))
+        self._conn.commit()
+
+    def commit(self) -> None:
+        """Write pending changes to the manifest file."""
+        if self._seen:
+            self._conn.executemany(
+                "UPDATE records SET run = ? WHERE collection = ? AND record_id = ?",
+                self._seen,
+            )
+            self._seen.clear()
+        self._conn.commit()
+
+
+def mongo_database(cfg: dict[str, Any]) -> Any:
+    """
+    Connect to the data lake database.
+
+    :param cfg: App config, including the Mongo secrets.
+    :return: A pymongo `Database`.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pymongo import MongoClient  # type: ignore
+
+    client: Any = MongoClient(
+        host=cfg["MONGO_DB_HOST"],
+        port=int(cfg["MONGO_DB_PORT"]),
+        username=cfg["MONGO_DB_USER"],
+        password=cfg["MONGO_DB_PASSWORD"],
+        serverSelectionTimeoutMS=cfg["MONGO_CONNECTION_TIMEOUT_SECONDS"] * 1000,
+    )
+    return client[cfg["MONGO_DATA_LAKE_NAME"]]
+
+
+def data_lake_collections(database: Any, prefix: str) -> list[str]:
+    """
+    Return the names of the data lake collections to ingest.
+
+    :param database: A pymongo `Database`.
+    :param prefix: Collection name prefix.
+    :return: Matching collection names, sorted.
+    """
+    return sorted(
+        name for name in database.list_collection_names() if name.startswith(prefix)
+    )
+
+
+def stream_records(
+    database: Any,
+    collections: Iterable[str],
+    cursor_batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    """
+    Yield every record of the collections, fetching them lazily.
+
+    :param database: A pymongo `Database`.
+    :param collections: Collection names.
+    :param cursor_batch_size: Records fetched per round trip.
+    :return: (collection name, record) pairs.
+    """
+    for name in collections:
+        _LOGGER.info(f"Streaming records from data lake collection {name}")
+        cursor = database[name].find(
+            {}, sort=[("_id", 1)], batch_size=cursor_batch_size
+        )
+        try:
+            for record in cursor:
+                yield name, record
+        finally:
+            cursor.close()
+
+
+def record_documents(
+    records: Iterable[tuple[str, dict[str, Any]]],
+) -> Iterator[Document]:
+    """
+    Turn data lake records into documents.
+
+    The text lists the record's fields as `key: value` lines. The metadata
+    holds the source collection, the record id and the record's scalar
+    fields. The id is derived from the collection, the record id and the
+    text, so it changes exactly when the record does.
+
+    :param records: (collection name, record) pairs.
+    :return: One document per record.
+    """
+    for collection, record in records:
+        fields = {key: value for key, value in record.items() if key != "_id"}
+        metadata: dict[str, Any] = {
+            key: value
+            for key, value in fields.items()
+            if isinstance(value, (str, int, float, bool))
+        }
+        record_id = str(record.get("_id"))
+        metadata.update(source=collection, record_id=record_id)
+        text = "\n".join(f"{key}: {value}" for key, value in fields.items())
+        yield Document(
+            page_content=text,
+            metadata=metadata,
+            id=document_id(collection, record_id, text),
+        )
+
+
+def document_id(collection: str, record_id: str, text: str) -> str:
+    """
+    Return the deterministic id of a record's document.
+
+    :param collection: Source collection name.
+    :param record_id: Record id.
+    :param text: Document text.
+    :return: A hex digest.
+    """
+    content_hash = hashlib.sha256(text.encode()).hexdigest()
+    key = "\0".join([collection, record_id, content_hash])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def chunk_id(parent_id: str, position: int) -> str:
+    """
+    Return the id of a document's chunk.
+
+    :param parent_id: The document's id.
+    :param position: The chunk's position in the document.
+    :return: The chunk id.
+    """
+    return f"{parent_id}:{position}"
+
+
+def chunk_documents(
+    documents: Iterable[Document],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+) -> Iterator[Document]:
+    """
+    Split documents into chunks of at most `chunk_size` characters.
+
+    :param documents: Documents to split.
+    :param chunk_size: Max characters per chunk.
+    :param chunk_overlap: Characters shared by consecutive chunks.
+    :return: Chunks, with their document's metadata, the document's id and
+             chunk count, and their position. Chunks of a document with an
+             id have ids derived from it.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    for document in documents:
+        texts = splitter.split_text(document.page_content)
+        for position, text in enumerate(texts):
+            yield Document(
+                page_content=text,
+                metadata={
+                    **document.metadata,
+                    "document_id": document.id,
+                    "chunk": position,
+                    "chunks": len(texts),
+                },
+                id=None if document.id is None else chunk_id(document.id, position),
+            )
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """
+    Yield consecutive lists of `size` items; the last may be shorter.
+
+    :param items: Items to group.
+    :param size: Items per list.
+    """
+    if size < 1:
+        raise ValueError(f"Batch size must be positive: {size}")
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class EmbeddingPool:
+    """
+    Worker processes which chunk and embed documents, so that ingestion is
+    not limited to the one core a Python process can drive under the GIL.
+
+    Each worker loads its own copy of the embedding model. A worker writes
+    a batch's embeddings into a shared memory block which this process
+    copies out of and frees; only the chunks' text and metadata are pickled.
+    """
+
+    def __init__(self, load_model: Callable[[], Embeddings], workers: int):
+        """
+        Constructor.
+
+        :param load_model: Picklable callable which loads the model in a worker.
+        :param workers: Number of worker processes.
+        """
+        self._workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            # Forking a process which has loaded torch can deadlock.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(load_model,),
+        )
+
+    @property
+    def workers(self) -> int:
+        """
+        Return the number of worker processes.
+
+        :return: Worker count.
+        """
+        return self._workers
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown(cancel_futures=True)
+
+    def chunk_and_embed(
+        self,
+        batches: Iterable[list[Document]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    ) -> Iterator[tuple[list[Document], np.ndarray]]:
+        """
+        Chunk and embed batches of documents on the workers.
+
+        Results come back in order. At most two batches per worker are in
+        flight, so memory stays bounded however many batches there are.
+
+        :param batches: Batches of documents.
+        :param chunk_size: Max characters per chunk.
+        :param chunk_overlap: Characters shared by consecutive chunks.
+        :return: Each batch's chunks and their float32 embeddings.
+        """
+        pending: deque[Future] = deque()
+        try:
+            for batch in batches:
+                pending.append(
+                    self._executor.submit(
+                        _chunk_and_embed, batch, chunk_size, chunk_overlap
+                    )
+                )
+                if len(pending) >= 2 * self._workers:
+                    yield _collect(pending.popleft().result())
+            while pending:
+                yield _collect(pending.popleft().result())
+        finally:
+            # Free the shared memory of results nobody will read.
+            for future in pending:
+                if not future.cancel() and future.exception() is None:
+                    _collect(future.result())
+
+
+def create_embedding_pool(model: str, workers: int) -> EmbeddingPool:
+    """
+    Return a pool of workers running a registered embedding backend, with
+    the machine's cores split between them.
+
+    :param model: Name of a registered embedding backend.
+    :param workers: Number of worker processes.
+    :return: The pool.
+    """
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    backend = dataclasses.replace(get_embedding_backend(model), threads=threads)
+    _LOGGER.info(f"Starting {workers} embedding workers with {threads} threads each")
+    return EmbeddingPool(backend.load, workers)
+
+
+def _init_worker(load_model: Callable[[], Embeddings]) -> None:
+    """Load the embedding model of a worker process."""
+    global _WORKER_MODEL  # pylint: disable=global-statement
+    _WORKER_MODEL = load_model()
+
+
+def _chunk_and_embed(
+    documents: list[Document], chunk_size: int, chunk_overlap: int
+) -> _WorkerResult:
+    """Chunk and embed documents in a worker, sharing the embeddings."""
+    chunks = list(chunk_documents(documents, chunk_size, chunk_overlap))
+    if not chunks:
+        return chunks, None, (0, 0)
+    vectors = np.asarray(
+        _WORKER_MODEL.embed_documents(  # type: ignore[union-attr]
+            [chunk.page_content for chunk in chunks]
+        ),
+        dtype=np.float32,
+    )
+    block = SharedMemory(create=True, size=vectors.nbytes)
+    shared = np.ndarray(vectors.shape, dtype=np.float32, buffer=block.buf)
+    shared[:] = vectors
+    del shared
+    block.close()
+    return chunks, block.name, vectors.shape
+
+
+def _collect(result: _WorkerResult) -> tuple[list[Document], np.ndarray]:
+    """Copy a worker's embeddings out of shared memory, and free it."""
+    chunks, name, shape = result
+    if name is None:
+        return chunks, np.empty(shape, dtype=np.float32)
+    block = SharedMemory(name=name)
+    try:
+        shared = np.ndarray(shape, dtype=np.float32, buffer=block.buf)
+        vectors = shared.copy()
+        del shared
+    finally:
+        block.close()
+        block.unlink()
+    return chunks, vectors
+
+
+def ingest(  # pylint: disable=too-many-arguments,too-many-locals
+    database: Any,
+    store: VectorStore,
+    *,
+    prefix: str = DEFAULT_DATALAKE_COLLECTION_PREFIX,
+    cursor_batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+    write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    manifest: IngestionManifest | None = None,
+    pool: EmbeddingPool | None = None,
+) -> IngestionStats:
+    """
+    Stream the data lake into the vector store.
+
+    Chunks are upserted by id, so re-ingesting a record never duplicates
+    it. With a manifest, unchanged records are not embedded again, and the
+    documents of changed and vanished records are deleted.
+
+    :param database: A pymongo `Database`.
+    :param store: Vector store to write to.
+    :param prefix: Name prefix of the collections to ingest.
+    :param cursor_batch_size: Records fetched from Mongo per round trip.
+    :param write_batch_size: Chunks embedded and written per store call.
+    :param chunk_size: Max characters per chunk.
+    :param chunk_overlap: Characters shared by consecutive chunks.
+    :param manifest: What earlier runs ingested into the store.
+    :param pool: Workers to chunk and embed on. Without one, chunks are
+                 embedded in this process by the store's model.
+    :return: What was ingested.
+    :raise: VectorDBError - If a write fails. Earlier batches stay written.
+    """
+    start = time.perf_counter()
+    collections = data_lake_collections(database, prefix)
+    stats = IngestionStats(collections=len(collections))
+    _LOGGER.info(f"Ingesting {len(collections)} data lake collections")
+
+    def counted(records: Iterable[tuple[str, dict[str, Any]]]):
+        for record in records:
+            stats.records += 1
+            yield record
+
+    def changed(documents: Iterable[Document]):
+        for document in documents:
+            if manifest is not None and manifest.is_current(document):
+                stats.unchanged += 1
+            else:
+                yield document
+
+    documents = changed(
+        record_documents(
+            counted(stream_records(database, collections, cursor_batch_size))
+        )
+    )
+    writes: Iterable[tuple[list[Document], np.ndarray | None]]
+    if pool is None:
+        writes = (
+            (batch, None)
+            for batch in batched(
+                chunk_documents(documents, chunk_size, chunk_overlap),
+                write_batch_size,
+            )
+        )
+    else:
+        writes = pool.chunk_and_embed(
+            batched(documents, write_batch_size), chunk_size, chunk_overlap
+        )
+    for chunks, vectors in writes:
+        # A batch of documents can split into more chunks than one write takes.
+        for offset in range(0, len(chunks), write_batch_size):
+            _write(
+                store,
+                chunks[offset : offset + write_batch_size],
+                (
+                    None
+                    if vectors is None
+                    else vectors[offset : offset + write_batch_size]
+                ),
+                manifest,
+                stats,
+            )
+    if manifest is not None:
+        for stale in batched(manifest.vanished(), write_batch_size):
+            store.delete_documents(stale)
+            stats.deleted += len(stale)
+        manifest.forget_vanished()
+    stats.seconds = time.perf_counter() - start
+    _LOGGER.info(
+        f"Ingested {stats.records} records as {stats.chunks} chunks "
+        f"({stats.unchanged} records unchanged, {stats.deleted} chunks deleted) "
+        f"in {stats.seconds:.1f}s"
+    )
+    return stats
+
+
+def _write(
+    store: VectorStore,
+    chunks: list[Document],
+    vectors: np.ndarray | None,
+    manifest: IngestionManifest | None,
+    stats: IngestionStats,
+) -> None:
+    """Write one batch of chunks, embedding them first if `vectors` is None."""
+    if vectors is None:
+        store.upsert_documents(chunks)
+    else:
+        store.upsert_embeddings(chunks, vectors)
+    stats.chunks += len(chunks)
+    stats.batches += 1
+    if manifest is not None:
+        stale = manifest.record(chunks)
+        store.delete_documents(stale)
+        stats.deleted += len(stale)
+    _LOGGER.debug(f"Wrote batch {stats.batches} ({stats.chunks} chunks so far)")
+
+
+def main():
+    """Ingest the configured data lake into the configured vector store."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--collection", default=DEFAULT_VECTOR_COLLECTION)
+    parser.add_argument(
+        "--cursor-batch-size", type=int, default=DEFAULT_CURSOR_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--write-batch-size", type=int, default=DEFAULT_WRITE_BATCH_SIZE
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes to chunk and embed on. 1 embeds in this process.",
+    )
+    parser.add_argument(
+        "--manifest",
+        help=f"Manifest path. Defaults to {DEFAULT_MANIFEST_DIR}/<collection>.sqlite",
+    )
+    args = parser.parse_args()
+
+    # Loading the config module reads the secrets store.
+    # pylint: disable=import-outside-toplevel
+    from oracle_server.config.config import update_config
+
+    logging.basicConfig(level=logging.INFO)
+    cfg: dict[str, Any] = {}
+    update_config(cfg)
+    configure_embedding_backend(
+        cfg["EMBEDDING_MODEL"],
+        threads=cfg["EMBEDDING_THREADS"] or None,
+        batch_size=cfg["EMBEDDING_ENCODE_BATCH_SIZE"],
+    )
+    manifest = IngestionManifest(
+        args.manifest or f"{DEFAULT_MANIFEST_DIR}/{args.collection}.sqlite",
+        model=cfg["EMBEDDING_MODEL"],
+    )
+    pool = (
+        create_embedding_pool(cfg["EMBEDDING_MODEL"], args.workers)
+        if args.workers > 1
+        else None
+    )
+    try:
+        stats = ingest(
+            mongo_database(cfg),
+            create_vector_store(
+                cfg, cfg["EMBEDDING_MODEL"], collection=args.collection
+            ),
+            prefix=cfg["DATALAKE_COLLECTION_PREFIX"],
+            cursor_batch_size=args.cursor_batch_size,
+            write_batch_size=args.write_batch_size,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            manifest=manifest,
+            pool=pool,
+        )
+    finally:
+        manifest.close()
+        if pool is not None:
+            pool.close()
+    _LOGGER.info(f"Ingestion stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
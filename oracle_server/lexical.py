@@ -0,0 +1,389 @@
+"""
+Lexical retrieval.
+
+Dense embeddings retrieve exact tokens poorly: merchant names, account
+numbers, amounts. A `BM25Index` kept next to a vector store ranks documents
+by those tokens, and `reciprocal_rank_fusion` merges its ranking with the
+vector store's.
+
+The index is a list of immutable segments. A segment stores its postings
+as arrays in compressed sparse row form: for each term id, a slice of
+document numbers and term frequencies. Each array is a `.npy` file which is
+memory-mapped on load. Adding documents writes a new segment, and small
+segments are merged into larger ones, so the total merge work stays
+O(n log n). Deleted documents are masked out until their segment is next
+merged.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+_LOGGER = logging.getLogger()
+
+# BM25 term frequency saturation and document length normalization.
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+# Rank offset of reciprocal rank fusion, from Cormack et al. (2009).
+DEFAULT_RRF_K = 60
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+# Thousands separators, so that `1,234.50` is the token `1234.50`.
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_SEGMENT_ARRAYS = ("offsets", "docs", "freqs", "lengths", "live")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase word, number and decimal amount tokens.
+
+    :param text: Text to split.
+    :return: Tokens, in order.
+    """
+    return _TOKEN.findall(_THOUSANDS.sub("", text.lower()))
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[str]], k: int = DEFAULT_RRF_K
+) -> list[tuple[str, float]]:
+    """
+    Fuse rankings: each item scores `1 / (k + rank)` in each ranking it is in.
+
+    :param rankings: Item ids, best first, per ranking.
+    :param k: Rank offset. Larger values flatten the contribution of top ranks.
+    :return: (id, fused score) pairs, best first.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+@dataclass(frozen=True)
+class _Segment:
+    """An immutable batch of indexed documents."""
+
+    seq: int
+    # Start of each term's postings; term ids past the end have none.
+    offsets: np.ndarray
+    # Per posting, the document's number in the segment and the term's count.
+    docs: np.ndarray
+    freqs: np.ndarray
+    # Per document: its length in tokens, whether it is live, and its id.
+    lengths: np.ndarray
+    live: np.ndarray
+    ids: tuple[str, ...]
+
+    def postings(self, term: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the document numbers and frequencies of a term."""
+        if term + 1 >= len(self.offsets):
+            return self.docs[:0], self.freqs[:0]
+        start, stop = self.offsets[term], self.offsets[term + 1]
+        return self.docs[start:stop], self.freqs[start:stop]
+
+
+# pylint: disable=too-many-instance-attributes
+class BM25Index:
+    """
+    A BM25 index of documents by id, persisted under a path prefix.
+
+    Collection statistics (document count, average length, document
+    frequencies) include deleted documents until their segment is merged,
+    which slightly skews scores but keeps deletes cheap.
+    """
+
+    def __init__(self, prefix: Path, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        """
+        Constructor. Loads the index's files, if they exist.
+
+        :param prefix: Path prefix of the index's files.
+        :param k1: Term frequency saturation.
+        :param b: Document length normalization.
+        """
+        self._prefix = prefix
+        self._k1 = k1
+        self._b = b
+        self._lock = threading.Lock()
+        self._vocabulary: dict[str, int] = {}
+        self._segments: list[_Segment] = []
+        # Segment seq and document number of each live document id.
+        self._locations: dict[str, tuple[int, int]] = {}
+        self._next_seq = 0
+        self.__load()
+
+    def __len__(self) -> int:
+        """Return the number of live documents."""
+        return len(self._locations)
+
+    def add(self, documents: Sequence[Document]) -> None:
+        """
+        Index documents, replacing any indexed documents with the same ids.
+
+        :param documents: Documents to index. Documents without ids are skipped.
+        """
+        latest = {doc.id: doc for doc in documents if doc.id is not None}
+        if not latest:
+            return
+        counts = [Counter(tokenize(doc.page_content)) for doc in latest.values()]
+        with self._lock:
+            self.__delete(latest.keys())
+            terms: list[int] = []
+            docs: list[int] = []
+            freqs: list[int] = []
+            for number, count in enumerate(counts):
+                for token, freq in count.items():
+                    terms.append(
+                        self._vocabulary.setdefault(token, len(self._vocabulary))
+                    )
+                    docs.append(number)
+                    freqs.append(freq)
+            segment = self.__write_segment(
+                np.asarray(terms, dtype=np.int64),
+                np.asarray(docs, dtype=np.int32),
+                np.minimum(freqs, np.iinfo(np.uint16).max).astype(np.uint16),
+                np.asarray([sum(count.values()) for count in counts], dtype=np.int32),
+                tuple(latest),
+            )
+            self._segments.append(segment)
+            retired = self.__merge_small_segments()
+            self.__save_manifest()
+            for seq in retired:
+                self.__remove_files(seq)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """
+        Remove documents from the index. Unknown ids are ignored.
+
+        :param ids: Ids of the documents to remove.
+        """
+        with self._lock:
+            if self.__delete(ids):
+                self.__save_manifest()
+
+    def search(self, query: str, top_k: int) -> list[tuple[str, float]]:
+        """
+        Rank documents by BM25 score for the query.
+
+        :param query: Query text.
+        :param top_k: Max number of results.
+        :return: (document id, score) pairs with positive scores, best first.
+        """
+        with self._lock:
+            segments = list(self._segments)
+            terms = {
+                self._vocabulary[token]
+                for token in tokenize(query)
+                if token in self._vocabulary
+            }
+        total_docs = sum(len(segment.ids) for segment in segments)
+        if not terms or not total_docs or top_k <= 0:
+            return []
+        average_length = (
+            sum(int(segment.lengths.sum()) for segment in segments) / total_docs
+        )
+        weights = {
+            term: _idf(
+                total_docs,
+                sum(len(segment.postings(term)[0]) for segment in segments),
+            )
+            for term in terms
+        }
+        results = [
+            result
+            for segment in segments
+            for result in self.__search_segment(segment, weights, average_length, top_k)
+        ]
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:top_k]
+
+    def __search_segment(
+        self,
+        segment: _Segment,
+        weights: dict[int, float],
+        average_length: float,
+        top_k: int,
+    ) -> list[tuple[str, float]]:
+        """Return the top k live documents of a segment, in no particular order."""
+        norms = self._k1 * (1 - self._b + self._b * segment.lengths / average_length)
+        scores = np.zeros(len(segment.ids), dtype=np.float32)
+        for term, weight in weights.items():
+            docs, freqs = segment.postings(term)
+            freqs = freqs.astype(np.float32)
+            scores[docs] += weight * freqs * (self._k1 + 1) / (freqs + norms[docs])
+        scores[~segment.live] = 0
+        top = np.flatnonzero(scores > 0)
+        if len(top) > top_k:
+            top = top[np.argpartition(-scores[top], top_k - 1)[:top_k]]
+        return [(segment.ids[i], float(scores[i])) for i in top]
+
+    def __delete(self, ids: Iterable[str]) -> bool:
+        """Mask out documents. Call with the lock held."""
+        doomed: dict[int, list[int]] = {}
+        for doc_id in ids:
+            if doc_id in self._locations:
+                seq, number = self._locations.pop(doc_id)
+                doomed.setdefault(seq, []).append(number)
+        for i, segment in enumerate(self._segments):
+            if segment.seq in doomed:
+                live = np.array(segment.live)
+                live[doomed[segment.seq]] = False
+                _save_array(self.__path(segment.seq, "live"), live)
+                self._segments[i] = replace(segment, live=live)
+        return bool(doomed)
+
+    def __merge_small_segments(self) -> list[int]:
+        """
+        Merge the newest segment into the one before while that one is not
+        much bigger. Call with the lock held.
+
+        :return: Seqs of the merged segments, whose files can be removed
+                 once the manifest no longer lists them.
+        """
+        retired = []
+        while len(self._segments) > 1 and len(self._segments[-2].ids) <= 2 * len(
+            self._segments[-1].ids
+        ):
+            older, newer = self._segments[-2], self._segments.pop()
+            self._segments[-1] = self.__merge(older, newer)
+            retired.extend([older.seq, newer.seq])
+        return retired
+
+    def __merge(self, older: _Segment, newer: _Segment) -> _Segment:
+        """Write one segment holding the live documents of two."""
+        parts = [_live_postings(segment) for segment in (older, newer)]
+        offset = int(older.live.sum())
+        terms = np.concatenate([parts[0][0], parts[1][0]])
+        docs = np.concatenate([parts[0][1], parts[1][1] + offset])
+        freqs = np.concatenate([parts[0][2], parts[1][2]])
+        lengths = np.concatenate([older.lengths[older.live], newer.lengths[newer.live]])
+        ids = tuple(
+            doc_id
+            for segment in (older, newer)
+            for doc_id, live in zip(segment.ids, segment.live)
+            if live
+        )
+        return self.__write_segment(terms, docs, freqs, lengths, ids)
+
+    def __write_segment(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        terms: np.ndarray,
+        docs: np.ndarray,
+        freqs: np.ndarray,
+        lengths: np.ndarray,
+        ids: tuple[str, ...],
+    ) -> _Segment:
+        """Write postings as a new segment and return it, memory-mapped."""
+        seq = self._next_seq
+        self._next_seq += 1
+        order = np.lexsort((docs, terms))
+        arrays = {
+            "offsets": np.concatenate(
+                [[0], np.cumsum(np.bincount(terms, minlength=len(self._vocabulary)))]
+            ).astype(np.int64),
+            "docs": docs[order],
+            "freqs": freqs[order],
+            "lengths": lengths,
+            "live": np.ones(len(ids), dtype=bool),
+        }
+        for name, array in arrays.items():
+            _save_array(self.__path(seq, name), array)
+        self.__path(seq, "ids").with_suffix(".json").write_text(
+            json.dumps(ids), encoding="utf-8"
+        )
+        segment = self.__read_segment(seq)
+        for number, doc_id in enumerate(ids):
+            self._locations[doc_id] = (seq, number)
+        return segment
+
+    def __read_segment(self, seq: int) -> _Segment:
+        """Memory-map a segment's files."""
+        arrays = {
+            name: np.load(self.__path(seq, name), mmap_mode="r")
+            for name in _SEGMENT_ARRAYS
+        }
+        # The live mask is small and changed by deletes, so it is not mapped.
+        arrays["live"] = np.array(arrays["live"])
+        ids = json.loads(
+            self.__path(seq, "ids").with_suffix(".json").read_text(encoding="utf-8")
+        )
+        return _Segment(seq=seq, ids=tuple(ids), **arrays)
+
+    def __save_manifest(self) -> None:
+        """
+        Record the vocabulary and the current segments. The manifest is
+        replaced atomically, so a crash leaves the previous index intact.
+        """
+        manifest = {
+            "vocabulary": self._vocabulary,
+            "segments": [segment.seq for segment in self._segments],
+            "next_seq": self._next_seq,
+        }
+        path = self.__manifest_path()
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def __load(self) -> None:
+        """Open the index's files, if they exist."""
+        path = self.__manifest_path()
+        if not path.exists():
+            return
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        self._vocabulary = manifest["vocabulary"]
+        self._next_seq = manifest["next_seq"]
+        self._segments = [self.__read_segment(seq) for seq in manifest["segments"]]
+        for segment in self._segments:
+            for number in np.flatnonzero(segment.live):
+                self._locations[segment.ids[number]] = (segment.seq, int(number))
+        _LOGGER.info(
+            f"Loaded BM25 index of {len(self)} documents "
+            f"in {len(self._segments)} segments from {path}"
+        )
+
+    def __remove_files(self, seq: int) -> None:
+        """Delete a segment's files."""
+        for name in _SEGMENT_ARRAYS:
+            self.__path(seq, name).unlink(missing_ok=True)
+        self.__path(seq, "ids").with_suffix(".json").unlink(missing_ok=True)
+
+    def __manifest_path(self) -> Path:
+        """Return the path of the index's manifest."""
+        return self._prefix.with_name(f"{self._prefix.name}.bm25.json")
+
+    def __path(self, seq: int, name: str) -> Path:
+        """Return the path of one of a segment's arrays."""
+        return self._prefix.with_name(f"{self._prefix.name}.bm25.{seq}.{name}.npy")
+
+
+def _idf(total_docs: int, doc_freq: int) -> float:
+    """Return the BM25 inverse document frequency of a term."""
+    return math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def _live_postings(segment: _Segment) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the term ids, renumbered document numbers and frequencies of
+    a segment's live postings."""
+    terms = np.repeat(
+        np.arange(len(segment.offsets) - 1, dtype=np.int64), np.diff(segment.offsets)
+    )
+    keep = segment.live[segment.docs]
+    renumbered = np.cumsum(segment.live, dtype=np.int32) - 1
+    return terms[keep], renumbered[segment.docs[keep]], segment.freqs[keep]
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    """Write an array to a `.npy` file, replacing it atomically."""
+    tmp_path = path.with_suffix(".tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
@@ -1,43 +1,73 @@
 """MCP parsing and execution."""
 
 import re
-from oracle_server.tools import weather, calculator
+
+from oracle_server.event_loop import chat_loop
+from oracle_server.tools import weather, calculator  # pylint: disable=unused-import
+from oracle_server.tools.registry import TOOLS, ToolCall, ToolRegistry
+
+# Tool calls like [tool_name(param1=value1, param2=value2)]
+TOOL_CALL_PATTERN = re.compile(r"\[(\w+)\((.*?)\)\]")
 
 # todo: https://github.com/ajponte/babylon/issues/38
 # A simple in-memory conversation history
 # pylint: disable=global-variable-not-assigned
-conversation_history = []
+conversation_history: list[str] = []
+
+
+def parse_tool_calls(user_input: str) -> list[ToolCall]:
+    """
+    Find the tool calls in an input.
+
+    :param user_input: The user's input.
+    :return: The calls, in the order they appear.
+    :raise: ValueError - If a call's parameters cannot be parsed.
+    """
+    calls = []
+    for match in TOOL_CALL_PATTERN.finditer(user_input):
+        tool_params_str = match.group(2)
+        # Simple parsing of params
+        tool_params = (
+            dict(p.split("=", 1) for p in tool_params_str.split(", "))
+            if tool_params_str
+            else {}
+        )
+        calls.append(ToolCall(name=match.group(1), arguments=tool_params))
+    return calls
 
 
 def handle_mcp_request(data):
-    """Handle MCP request."""
+    """
+    Handle MCP request. The tool calls run on the shared chat loop, so this
+    may be called from any thread, including one running an event loop.
+    """
+    return chat_loop().submit(ahandle_mcp_request(data)).result()
+
+
+async def ahandle_mcp_request(data, registry: ToolRegistry = TOOLS):
+    """
+    Handle MCP request asynchronously. Every tool call in the input runs
+    concurrently, each within its timeout.
+
+    :param data: Request body with the `user_input`.
+    :param registry: Tools to call.
+    :return: The response: the tool results, one per line, in input order.
+    """
     global conversation_history
 
     user_input = data.get("user_input", "")
     conversation_history.append(f"User: {user_input}")
 
-    # Simple regex to find tool calls like [tool_name(param1=value1, param2=value2)]
-    tool_call_match = re.search(r"\[(\w+)\((.*)\)\]", user_input)
+    try:
+        calls = parse_tool_calls(user_input)
+    except ValueError:
+        return {"response": "Invalid tool parameters."}
 
-    if tool_call_match:
-        tool_name = tool_call_match.group(1)
-        tool_params_str = tool_call_match.group(2)
-
-        # Simple parsing of params
-        try:
-            tool_params = dict(p.split("=") for p in tool_params_str.split(", "))
-        except ValueError:
-            return {"response": "Invalid tool parameters."}
-
-        if tool_name == "get_weather":
-            result = weather.get_weather(**tool_params)
-        elif tool_name == "calculate":
-            result = calculator.calculate(**tool_params)
-        else:
-            result = "Unknown tool."
-
-        conversation_history.append(f"Tool: {result}")
-        return {"response": result}
+    if calls:
+        results = await registry.execute(calls)
+        response = "\n".join(str(r.output) if r.ok else str(r.error) for r in results)
+        conversation_history.append(f"Tool: {response}")
+        return {"response": response}
 
     conversation_history.append("Assistant: I can help with that.")
     return {"response": "I can help with that."}
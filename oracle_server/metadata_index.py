@@ -0,0 +1,235 @@
+"""
+Metadata filters and the secondary indexes which evaluate them.
+
+A filter maps metadata fields to conditions, all of which must hold. A
+condition is either a value, which the field must equal, or a mapping of
+operators to operands, in the subset of Chroma's `where` syntax every
+vector store supports:
+
+    {
+        "source": {"$in": ["chase-data-2024", "chase-data-2025"]},
+        "Account": "checking",
+        "UtcTimestamp": {"$gte": "2025-09-01", "$lt": "2025-10-01"},
+    }
+
+Range operators compare numbers with numbers and strings with strings, so
+ISO 8601 dates compare by date. Chroma only accepts numeric ranges.
+
+`MetadataIndex` evaluates filters over a list of documents without
+scanning them. Each field has a sorted column of its values, so a range or
+equality condition is two binary searches. Fields with few distinct
+values, such as accounts or source collections, also keep a bitmap per
+value. Conditions are combined by AND-ing bitmaps, and only the matching
+positions are scored against the query.
+"""
+
+import logging
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from operator import eq, ge, gt, le, lt
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+
+_LOGGER = logging.getLogger()
+
+# Fields with at most this many distinct values get a bitmap per value.
+DEFAULT_BITMAP_MAX_VALUES = 256
+
+MetadataFilter = Mapping[str, Any]
+
+_OPERATORS = ("$eq", "$in", "$gt", "$gte", "$lt", "$lte")
+_COMPARISONS = {
+    "$eq": eq,
+    "$gt": gt,
+    "$gte": ge,
+    "$lt": lt,
+    "$lte": le,
+}
+
+
+@dataclass(frozen=True)
+class Condition:
+    """One operator applied to one metadata field."""
+
+    field: str
+    operator: str
+    operand: Any
+
+
+def conditions(where: MetadataFilter) -> list[Condition]:
+    """
+    Parse a filter into conditions.
+
+    :param where: Metadata filter.
+    :return: The conditions, all of which must hold.
+    :raise: ValueError - If the filter uses an unknown operator or operand.
+    """
+    parsed = []
+    for field, condition in where.items():
+        if not isinstance(condition, Mapping):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator not in _OPERATORS:
+                raise ValueError(f"Unknown filter operator {operator} on {field}")
+            operands = operand if operator == "$in" else [operand]
+            if operator == "$in" and not isinstance(operand, (list, tuple)):
+                raise ValueError(f"$in on {field} needs a list of values")
+            if any(_kind(value) is None for value in operands):
+                raise ValueError(f"Unsupported filter value for {field}: {operand}")
+            parsed.append(Condition(field, operator, operand))
+    return parsed
+
+
+def matches(metadata: Mapping[str, Any], where: MetadataFilter) -> bool:
+    """
+    Return whether a document's metadata satisfies a filter.
+
+    :param metadata: Document metadata.
+    :param where: Metadata filter.
+    :return: True if every condition holds.
+    """
+    return all(_holds(metadata.get(c.field), c) for c in conditions(where))
+
+
+def chroma_where(where: MetadataFilter) -> dict[str, Any] | None:
+    """
+    Translate a filter to a Chroma `where` clause.
+
+    :param where: Metadata filter.
+    :return: The clause, or None for an empty filter.
+    """
+    clauses = [{c.field: {c.operator: c.operand}} for c in conditions(where)]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class _Column:  # pylint: disable=too-few-public-methods
+    """The values one field takes over the indexed documents, sorted."""
+
+    def __init__(self, values: list[Any], positions: list[int]):
+        order = np.argsort(np.asarray(values), kind="stable")
+        self.values = np.asarray(values)[order]
+        self.positions = np.asarray(positions, dtype=np.int64)[order]
+
+    def select(self, operator: str, operand: Any) -> np.ndarray:
+        """Return the positions of the documents whose value satisfies the operator."""
+        left = np.searchsorted(self.values, operand, side="left")
+        right = np.searchsorted(self.values, operand, side="right")
+        match operator:
+            case "$eq":
+                return self.positions[left:right]
+            case "$gt":
+                return self.positions[right:]
+            case "$gte":
+                return self.positions[left:]
+            case "$lt":
+                return self.positions[:left]
+            case _:
+                return self.positions[:right]
+
+
+class MetadataIndex:
+    """
+    Secondary indexes over the metadata of a list of documents, by position.
+    The index is immutable; build a new one when the documents change.
+    """
+
+    def __init__(
+        self,
+        documents: Sequence[Document],
+        bitmap_max_values: int = DEFAULT_BITMAP_MAX_VALUES,
+    ):
+        """
+        Constructor.
+
+        :param documents: Documents to index.
+        :param bitmap_max_values: Max distinct values of a field with bitmaps.
+        """
+        self._size = len(documents)
+        rows: dict[tuple[str, str], tuple[list[Any], list[int]]] = {}
+        for position, document in enumerate(documents):
+            for field, value in (document.metadata or {}).items():
+                kind = _kind(value)
+                if kind is None:
+                    continue
+                values, positions = rows.setdefault((field, kind), ([], []))
+                values.append(value)
+                positions.append(position)
+        self._columns = {
+            key: _Column(values, positions) for key, (values, positions) in rows.items()
+        }
+        self._bitmaps: dict[tuple[str, str], dict[Any, np.ndarray]] = {}
+        for key, column in self._columns.items():
+            distinct = np.unique(column.values)
+            if len(distinct) <= bitmap_max_values:
+                self._bitmaps[key] = {
+                    value.item(): self.__bitmap(column.select("$eq", value))
+                    for value in distinct
+                }
+        _LOGGER.debug(
+            f"Indexed {len(self._columns)} metadata fields of {self._size} documents"
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    def select(self, where: MetadataFilter) -> np.ndarray:
+        """
+        Return the positions of the documents which satisfy a filter.
+
+        :param where: Metadata filter.
+        :return: Sorted positions.
+        :raise: ValueError - If the filter is invalid.
+        """
+        mask = np.full((self._size + 7) // 8, 0xFF, dtype=np.uint8)
+        for condition in conditions(where):
+            mask &= self.__condition_bitmap(condition)
+        return np.flatnonzero(np.unpackbits(mask, count=self._size))
+
+    def __condition_bitmap(self, condition: Condition) -> np.ndarray:
+        """Return the packed bitmap of the documents a condition holds for."""
+        mask = np.zeros((self._size + 7) // 8, dtype=np.uint8)
+        if condition.operator == "$in":
+            for value in condition.operand:
+                mask |= self.__condition_bitmap(
+                    Condition(condition.field, "$eq", value)
+                )
+            return mask
+        key = (condition.field, _kind(condition.operand) or "")
+        bitmaps = self._bitmaps.get(key)
+        if bitmaps is not None and condition.operator == "$eq":
+            return bitmaps.get(condition.operand, mask)
+        column = self._columns.get(key)
+        if column is None:
+            return mask
+        return self.__bitmap(column.select(condition.operator, condition.operand))
+
+    def __bitmap(self, positions: np.ndarray) -> np.ndarray:
+        """Return a packed bitmap with the given positions set."""
+        mask = np.zeros(self._size, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+
+def _kind(value: Any) -> str | None:
+    """Return which values a value compares with, or None if it is not indexed."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "str"
+    return None
+
+
+def _holds(value: Any, condition: Condition) -> bool:
+    """Return whether a metadata value satisfies a condition."""
+    operand = condition.operand
+    if condition.operator == "$in":
+        return any(_holds(value, Condition("", "$eq", o)) for o in operand)
+    if value is None or _kind(value) != _kind(operand):
+        return False
+    return _COMPARISONS[condition.operator](value, operand)
@@ -0,0 +1,45 @@
+"""
+Custom /metrics route.
+"""
+
+from flask import Flask, jsonify
+
+from oracle_server.admission import admission_stats
+from oracle_server.backend_pool import backend_pool_stats
+from oracle_server.controllers.chat import chat_request_stats
+from oracle_server.http_client import shared_http_pool
+from oracle_server.tools.registry import TOOLS
+from oracle_server.vectorstore import shared_embedding_cache
+
+
+def metrics():
+    """
+    Report load and cache metrics: the queue depth and queue times of each
+    LLM backend, the load, health and latencies of each backend pool,
+    duplicate chat requests coalesced, MCP tool calls and their cache, the
+    shared HTTP connection pool and the embedding cache.
+
+    :return: Tuple of the metrics as JSON and HTTP 200 status.
+    """
+    return (
+        jsonify(
+            {
+                "admission": admission_stats(),
+                "llm_backends": backend_pool_stats(),
+                "chat_requests": chat_request_stats(),
+                "tools": TOOLS.stats(),
+                "http_pool": shared_http_pool().stats(),
+                "embedding_cache": shared_embedding_cache().stats(),
+            }
+        ),
+        200,
+    )
+
+
+def setup_metrics_route(flask_app: Flask):
+    """
+    Set up a /metrics route.
+
+    :param flask_app: The app.
+    """
+    flask_app.add_url_rule("/metrics", view_func=metrics)
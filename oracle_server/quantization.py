@@ -0,0 +1,262 @@
+"""
+Compact embedding codes.
+
+A compact index holds a lossy, much smaller copy of a collection's
+embeddings in memory. Searches rank every document on the compact codes to
+pick a small candidate set, which the vector store then re-scores exactly
+against the full-precision vectors kept on disk.
+
+- `int8`: each vector scaled by its largest component into int8, with one
+  float32 scale per vector. About 4x smaller than float32.
+- `binary`: one sign bit per dimension, ranked by Hamming distance. About
+  32x smaller than float32, with a coarser ranking.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+_LOGGER = logging.getLogger()
+
+# Rows scored at a time, bounding the float32 copy of int8 codes per query.
+DEFAULT_SCORE_CHUNK_ROWS = 16384
+
+
+class CompactIndex(ABC):
+    """
+    An in-memory index of compact embedding codes, persisted next to the
+    full vectors under a path prefix.
+    """
+
+    name: str = ""
+
+    def __init__(self, prefix: Path):
+        """
+        Constructor.
+
+        :param prefix: Path prefix of the index's files.
+        """
+        self._prefix = prefix
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """
+        Return the memory used by the codes.
+
+        :return: Size in bytes.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of indexed vectors."""
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray) -> None:
+        """
+        Encode unit-length vectors and append them to the index.
+
+        :param vectors: float32 rows.
+        """
+
+    @abstractmethod
+    def replace(self, positions: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Encode unit-length vectors over the codes at the given positions.
+        Searches running meanwhile may rank on a mix of old and new codes,
+        which only affects which candidates they re-score.
+
+        :param positions: Positions of the vectors to replace.
+        :param vectors: float32 rows, one per position.
+        """
+
+    @abstractmethod
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        Return an approximate similarity of the query to every vector.
+
+        :param query: A unit-length float32 vector.
+        :return: One score per indexed vector, higher is more similar.
+        """
+
+    @abstractmethod
+    def save(self) -> None:
+        """Write the index to its files."""
+
+    @abstractmethod
+    def load(self) -> bool:
+        """
+        Read the index from its files.
+
+        :return: False if there is no saved index.
+        """
+
+    def candidates(self, query: np.ndarray, count: int) -> np.ndarray:
+        """
+        Return the positions of the `count` vectors most similar to the query.
+
+        :param query: A unit-length float32 vector.
+        :param count: Number of candidates.
+        :return: Candidate positions, in no particular order.
+        """
+        scores = self.scores(query)
+        if count >= len(scores):
+            return np.arange(len(scores))
+        return np.argpartition(-scores, count - 1)[:count]
+
+
+class Int8Index(CompactIndex):
+    """Scalar quantization to int8, with one scale per vector."""
+
+    name = "int8"
+
+    def __init__(self, prefix: Path):
+        super().__init__(prefix)
+        # Codes and their scales, swapped together so readers never see a
+        # mix of old and new arrays.
+        self._data: tuple[np.ndarray, np.ndarray] | None = None
+
+    @property
+    def nbytes(self) -> int:
+        if self._data is None:
+            return 0
+        codes, scales = self._data
+        return codes.nbytes + scales.nbytes
+
+    def __len__(self) -> int:
+        return 0 if self._data is None else len(self._data[0])
+
+    def add(self, vectors: np.ndarray) -> None:
+        codes, scales = quantize_int8(vectors)
+        if self._data is not None:
+            codes = np.concatenate([self._data[0], codes])
+            scales = np.concatenate([self._data[1], scales])
+        self._data = (codes, scales)
+
+    def replace(self, positions: np.ndarray, vectors: np.ndarray) -> None:
+        if self._data is None:
+            raise ValueError("Cannot replace codes of an empty index")
+        codes, scales = quantize_int8(vectors)
+        self._data[0][positions] = codes
+        self._data[1][positions] = scales
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        if self._data is None:
+            return np.empty(0, dtype=np.float32)
+        codes, scales = self._data
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), DEFAULT_SCORE_CHUNK_ROWS):
+            stop = start + DEFAULT_SCORE_CHUNK_ROWS
+            scores[start:stop] = codes[start:stop].astype(np.float32) @ query
+        return scores * scales
+
+    def save(self) -> None:
+        if self._data is None:
+            return
+        np.save(self._path("codes"), self._data[0])
+        np.save(self._path("scales"), self._data[1])
+
+    def load(self) -> bool:
+        if not self._path("codes").exists():
+            return False
+        self._data = (np.load(self._path("codes")), np.load(self._path("scales")))
+        return True
+
+    def _path(self, part: str) -> Path:
+        """Return the path of one of the index's files."""
+        return self._prefix.with_name(f"{self._prefix.name}.int8.{part}.npy")
+
+
+class BinaryIndex(CompactIndex):
+    """Sign-bit codes ranked by Hamming distance."""
+
+    name = "binary"
+
+    def __init__(self, prefix: Path):
+        super().__init__(prefix)
+        self._codes: np.ndarray | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._codes is None else self._codes.nbytes
+
+    def __len__(self) -> int:
+        return 0 if self._codes is None else len(self._codes)
+
+    def add(self, vectors: np.ndarray) -> None:
+        codes = quantize_binary(vectors)
+        if self._codes is not None:
+            codes = np.concatenate([self._codes, codes])
+        self._codes = codes
+
+    def replace(self, positions: np.ndarray, vectors: np.ndarray) -> None:
+        if self._codes is None:
+            raise ValueError("Cannot replace codes of an empty index")
+        self._codes[positions] = quantize_binary(vectors)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        if self._codes is None:
+            return np.empty(0, dtype=np.float32)
+        distances = np.bitwise_count(self._codes ^ quantize_binary(query[None, :]))
+        return -distances.sum(axis=1, dtype=np.int32)
+
+    def save(self) -> None:
+        if self._codes is not None:
+            np.save(self._path(), self._codes)
+
+    def load(self) -> bool:
+        if not self._path().exists():
+            return False
+        self._codes = np.load(self._path())
+        return True
+
+    def _path(self) -> Path:
+        """Return the path of the index's file."""
+        return self._prefix.with_name(f"{self._prefix.name}.binary.npy")
+
+
+COMPACT_INDEXES: dict[str, type[CompactIndex]] = {
+    Int8Index.name: Int8Index,
+    BinaryIndex.name: BinaryIndex,
+}
+
+
+def create_compact_index(name: str, prefix: Path) -> CompactIndex:
+    """
+    Return an empty compact index of the named kind.
+
+    :param name: `int8` or `binary`.
+    :param prefix: Path prefix of the index's files.
+    :return: The index.
+    :raise: ValueError - If the kind is unknown.
+    """
+    if name not in COMPACT_INDEXES:
+        raise ValueError(f"Unknown quantization: {name}")
+    return COMPACT_INDEXES[name](prefix)
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize float rows to int8, scaling each by its largest magnitude.
+
+    :param vectors: float32 rows.
+    :return: The int8 codes and each row's scale, such that
+             `codes * scale[:, None]` approximates the rows.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    peaks = np.abs(vectors).max(axis=1)
+    peaks[peaks == 0] = 1
+    codes = np.round(vectors * (127 / peaks[:, None])).astype(np.int8)
+    return codes, (peaks / 127).astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """
+    Quantize float rows to packed sign bits.
+
+    :param vectors: float32 rows.
+    :return: uint8 rows of `ceil(dim / 8)` bytes.
+    """
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
@@ -0,0 +1,224 @@
+"""
+Semantic response cache.
+
+Users often ask the same question about their data in slightly different
+words. The cache keeps recent answers keyed by the embedding of the
+question, and serves a stored answer when a new question's embedding is
+close enough (by cosine similarity) to one it has seen, skipping the LLM.
+
+Answers are only valid for the corpus they were generated from: every
+lookup and store carries the vector store's corpus version, and a change
+of version drops all cached answers. The Chroma store keeps its version in
+a file next to the collection, so documents written by the ingestion CLI
+invalidate the server's answers on its next lookup. The NumPy store loads
+its files when it is created, so it serves, and caches answers from,
+documents written by another process only after a restart.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 3600
+
+
+@dataclass
+class _CachedAnswer:
+    """An answer and when it expires."""
+
+    answer: str
+    expires_at: float
+
+
+# pylint: disable=too-many-instance-attributes
+class SemanticCache:
+    """
+    A bounded, thread-safe cache of answers keyed by question embedding.
+
+    Entries expire `ttl_seconds` after they are stored, and the least
+    recently used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Constructor.
+
+        :param threshold: Minimum cosine similarity for a cached answer to be served.
+        :param max_entries: Max number of cached answers.
+        :param ttl_seconds: How long a cached answer may be served.
+        :param clock: Monotonic clock, in seconds.
+        """
+        self._threshold = threshold
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[int, _CachedAnswer] = OrderedDict()
+        # Unit-length question embeddings, by entry id.
+        self._vectors: dict[int, np.ndarray] = {}
+        # Stacked `_vectors`, rebuilt lazily after entries are added or removed.
+        self._matrix: np.ndarray | None = None
+        self._matrix_ids: list[int] = []
+        self._next_id = 0
+        self._corpus_version = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def threshold(self) -> float:
+        """
+        Return the minimum cosine similarity of a hit.
+
+        :return: The threshold.
+        """
+        return self._threshold
+
+    def lookup(self, embedding: list[float], corpus_version: int = 0) -> str | None:
+        """
+        Return the cached answer to the most similar question, if it is
+        similar enough.
+
+        :param embedding: Embedding of the question.
+        :param corpus_version: Current version of the corpus answers draw on.
+        :return: The cached answer, or None on a miss.
+        """
+        query = _unit(embedding)
+        with self._lock:
+            self._sync_corpus_version(corpus_version)
+            self._evict_expired()
+            matrix = self._stacked()
+            if matrix is not None and matrix.shape[1] == query.shape[0]:
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self._threshold:
+                    entry_id = self._matrix_ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self._hits += 1
+                    _LOGGER.debug(
+                        f"Semantic cache hit (similarity={similarities[best]:.3f})"
+                    )
+                    return self._entries[entry_id].answer
+            self._misses += 1
+            return None
+
+    def store(
+        self, embedding: list[float], answer: str, corpus_version: int = 0
+    ) -> None:
+        """
+        Cache the answer to a question.
+
+        :param embedding: Embedding of the question.
+        :param answer: The answer.
+        :param corpus_version: Version of the corpus the answer drew on.
+        """
+        vector = _unit(embedding)
+        with self._lock:
+            self._sync_corpus_version(corpus_version)
+            self._evict_expired()
+            while len(self._entries) >= self._max_entries:
+                self._remove(next(iter(self._entries)))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _CachedAnswer(
+                answer=answer, expires_at=self._clock() + self._ttl_seconds
+            )
+            self._vectors[entry_id] = vector
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        """Drop all cached answers."""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return cache counters.
+
+        :return: Hits, misses and entry count.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "entries": len(self._entries),
+            }
+
+    def _sync_corpus_version(self, corpus_version: int) -> None:
+        """Drop all answers if the corpus changed since they were stored."""
+        if corpus_version != self._corpus_version:
+            _LOGGER.info("Corpus changed, invalidating semantic cache")
+            self._clear()
+            self._corpus_version = corpus_version
+
+    def _evict_expired(self) -> None:
+        """Remove entries past their TTL."""
+        now = self._clock()
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if entry.expires_at <= now
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        """Remove an entry."""
+        del self._entries[entry_id]
+        del self._vectors[entry_id]
+        self._matrix = None
+
+    def _clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+        self._vectors.clear()
+        self._matrix = None
+
+    def _stacked(self) -> np.ndarray | None:
+        """Return all cached embeddings as the rows of one matrix."""
+        if not self._vectors:
+            return None
+        if self._matrix is None:
+            self._matrix_ids = list(self._vectors)
+            self._matrix = np.stack([self._vectors[i] for i in self._matrix_ids])
+        return self._matrix
+
+
+def _unit(embedding: list[float]) -> np.ndarray:
+    """Return an embedding scaled to unit length."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def create_semantic_cache(cfg: Mapping[str, Any]) -> SemanticCache | None:
+    """
+    Return a semantic cache if one is enabled.
+
+    :param cfg: App config. Reads `SEMANTIC_CACHE_ENABLED`, `SEMANTIC_CACHE_THRESHOLD`,
+                `SEMANTIC_CACHE_MAX_ENTRIES` and `SEMANTIC_CACHE_TTL_SECONDS`.
+    :return: The cache, or None if disabled.
+    """
+    if not cfg.get("SEMANTIC_CACHE_ENABLED", False):
+        return None
+    _LOGGER.info("Using semantic response cache")
+    return SemanticCache(
+        threshold=cfg.get("SEMANTIC_CACHE_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD),
+        max_entries=cfg.get("SEMANTIC_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+        ttl_seconds=cfg.get("SEMANTIC_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS),
+    )
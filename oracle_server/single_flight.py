@@ -0,0 +1,120 @@
+"""
+Single-flight deduplication of identical concurrent calls.
+
+A burst of identical requests, from a dashboard refreshing or a client
+retrying, otherwise runs the same embedding, search and generation once
+per copy. `SingleFlight` lets the first call for a key run and has calls
+for the same key which arrive while it is in flight wait for its result,
+or its error, instead of running again. Nothing is cached: once the call
+finishes, the next call for the key runs afresh.
+
+Calls may come from any thread or event loop.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+_LOGGER = logging.getLogger()
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one.
+    """
+
+    def __init__(self, name: str):
+        """
+        Constructor.
+
+        :param name: Name used in logs.
+        """
+        self._name = name
+        self._in_flight: dict[Hashable, Future[Any]] = {}
+        self._calls = 0
+        self._coalesced = 0
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Call fn, or wait for the call in flight for the same key.
+
+        :param key: Identifies calls with the same result.
+        :param fn: The call.
+        :return: The result.
+        """
+        future, leader = self.__join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.__finish(key, future, error=e)
+            raise
+        self.__finish(key, future, result=result)
+        return result
+
+    async def ado(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async version of `do`.
+
+        :param key: Identifies calls with the same result.
+        :param work: Returns the awaitable to run.
+        :return: The result.
+        """
+        future, leader = self.__join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await work()
+        except BaseException as e:
+            self.__finish(key, future, error=e)
+            raise
+        self.__finish(key, future, result=result)
+        return result
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return the calls made, the calls which waited for another instead,
+        and the calls in flight.
+
+        :return: Counters.
+        """
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+    def __join(self, key: Hashable) -> tuple[Future[Any], bool]:
+        """Return the future of the call for a key, and whether to make it."""
+        with self._lock:
+            self._calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                _LOGGER.debug(f"Coalesced {self._name} call into the one in flight")
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def __finish(
+        self,
+        key: Hashable,
+        future: Future[Any],
+        result: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Hand the leader's outcome to the waiting calls."""
+        with self._lock:
+            del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
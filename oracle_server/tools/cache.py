@@ -0,0 +1,192 @@
+"""
+Cache of tool results.
+
+Tools which fetch external data, such as the weather, answer the same
+arguments the same way for a while. A tool declared with a
+`ToolCachePolicy` has its results kept for `ttl_seconds`, and its failures
+for `negative_ttl_seconds`, so an upstream which rejects an argument is
+not asked again on every call.
+
+For `stale_seconds` after a result expires it is still served, while a
+fresh one is fetched in the background (stale-while-revalidate), so
+callers do not wait on the upstream for data which changes slowly.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_TOOL_CACHE_ENTRIES = 4096
+
+
+@dataclass(frozen=True)
+class ToolCachePolicy:
+    """
+    How long a tool's results are kept.
+    """
+
+    ttl_seconds: float
+    # Failures are kept for this long. 0 does not keep them.
+    negative_ttl_seconds: float = 0.0
+    # Expired results are served for this long while they are refreshed.
+    stale_seconds: float = 0.0
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """A tool's output or error, and whether it is due for a refresh."""
+
+    output: Any = None
+    error: str | None = None
+    stale: bool = False
+
+
+@dataclass(frozen=True)
+class _Entry:
+    """A cached output or error and when it expires."""
+
+    output: Any
+    error: str | None
+    expires_at: float
+    stale_until: float
+
+
+def cache_key(tool: str, arguments: Mapping[str, Any]) -> Hashable:
+    """
+    Return the cache key of a tool call.
+
+    :param tool: Tool name.
+    :param arguments: Keyword arguments.
+    :return: The key.
+    """
+    return tool, json.dumps(arguments, sort_keys=True, default=str)
+
+
+# pylint: disable=too-many-instance-attributes
+class ToolResultCache:
+    """
+    A bounded LRU cache of tool results with per-entry expiry.
+    Safe to use from any thread.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_TOOL_CACHE_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Constructor.
+
+        :param max_entries: Max results kept.
+        :param clock: Monotonic clock, in seconds.
+        """
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._refreshing: set[Hashable] = set()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> CachedResult | None:
+        """
+        Return a cached result, unless it is missing or past its stale window.
+
+        :param key: Cache key.
+        :return: The result, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self._clock()
+            if entry is None or now >= entry.stale_until:
+                self._entries.pop(key, None)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            stale = now >= entry.expires_at
+            if stale:
+                self._stale_hits += 1
+            else:
+                self._hits += 1
+            return CachedResult(output=entry.output, error=entry.error, stale=stale)
+
+    def put(
+        self,
+        key: Hashable,
+        policy: ToolCachePolicy,
+        output: Any = None,
+        error: str | None = None,
+    ) -> None:
+        """
+        Store a tool's output, or its error if the policy keeps failures.
+
+        :param key: Cache key.
+        :param policy: The tool's cache policy.
+        :param output: The output.
+        :param error: The error, if the call failed.
+        """
+        ttl = policy.ttl_seconds if error is None else policy.negative_ttl_seconds
+        if ttl <= 0:
+            return
+        now = self._clock()
+        entry = _Entry(
+            output=output,
+            error=error,
+            expires_at=now + ttl,
+            stale_until=now + ttl + (policy.stale_seconds if error is None else 0),
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def start_refresh(self, key: Hashable) -> bool:
+        """
+        Claim the refresh of a stale entry.
+
+        :param key: Cache key.
+        :return: False if a refresh is already in progress.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable) -> None:
+        """
+        Release the refresh of an entry.
+
+        :param key: Cache key.
+        """
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return the cache's counters.
+
+        :return: Fresh and stale hits, misses and entries.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "entries": len(self._entries),
+                "refreshing": len(self._refreshing),
+            }
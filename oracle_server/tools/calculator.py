@@ -1,12 +1,26 @@
 """
-Calculator tool for demonstration purposes.
+Calculator tool.
+
+Expressions are evaluated by the safe expression engine in
+`oracle_server.tools.expression`, which compiles each expression once.
 """
 
+from oracle_server.tools.expression import evaluate
+from oracle_server.tools.registry import TOOLS
+
 
+@TOOLS.tool(
+    name="calculate",
+    description="Calculate a mathematical expression.",
+    parameters={
+        "type": "object",
+        "properties": {"expression": {"type": "string"}},
+        "required": ["expression"],
+    },
+)
 def calculate(expression):
     """Calculate a mathematical expression."""
     try:
-        # WARNING: eval is not safe and should not be used in production
-        return f"The result of {expression} is {eval(expression)}."  # pylint: disable=eval-used
-    except Exception as e:
+        return f"The result of {expression} is {evaluate(expression)}."
+    except Exception as e:  # pylint: disable=broad-exception-caught
         return f"Error calculating expression: {e}"
@@ -0,0 +1,309 @@
+"""
+Safe arithmetic expression engine for the calculator tool.
+
+Expressions are parsed into a Python AST, checked against a whitelist of
+numbers, variables, arithmetic, comparisons and a few math functions, and
+compiled once into a tree of closures. Compiled expressions are cached by
+their text, so a formula applied again skips parsing.
+
+Operators and functions are NumPy's, so a variable bound to a series,
+such as transaction amounts or dates, evaluates the formula element-wise:
+
+    >>> compile_expression("round(amount * (1 + rate), 2)").evaluate(
+    ...     amount=[10.0, 25.5], rate=0.2
+    ... )
+    array([12. , 30.6])
+
+Lists of ISO 8601 date strings become `datetime64` arrays, and `days`
+turns their differences into numbers.
+"""
+
+import ast
+import functools
+import logging
+import math
+import operator
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import numpy as np
+
+_LOGGER = logging.getLogger()
+
+# Compiled expressions kept by text.
+DEFAULT_EXPRESSION_CACHE_SIZE = 256
+DEFAULT_MAX_EXPRESSION_LENGTH = 1000
+# Larger exponents of scalars are refused, as `9 ** 9 ** 9` would not finish.
+DEFAULT_MAX_EXPONENT = 10000
+# Integer powers with more digits are refused, as `(10 ** 10000) ** 1000`
+# would not finish either.
+DEFAULT_MAX_POWER_DIGITS = 10000
+
+# An evaluator of a compiled node, given the variables.
+_Evaluator = Callable[[Mapping[str, Any]], Any]
+
+_BINARY_OPERATORS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPERATORS: dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Not: np.logical_not,
+}
+_COMPARISONS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+
+def _minimum(*values: Any) -> Any:
+    """Return the smallest element of one series, or the element-wise minimum."""
+    return (
+        np.min(values[0]) if len(values) == 1 else functools.reduce(np.minimum, values)
+    )
+
+
+def _maximum(*values: Any) -> Any:
+    """Return the largest element of one series, or the element-wise maximum."""
+    return (
+        np.max(values[0]) if len(values) == 1 else functools.reduce(np.maximum, values)
+    )
+
+
+def _days(delta: Any) -> Any:
+    """Return a time difference in days."""
+    return delta / np.timedelta64(1, "D")
+
+
+_FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "abs": np.abs,
+    "round": np.round,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "min": _minimum,
+    "max": _maximum,
+    "sum": np.sum,
+    "mean": np.mean,
+    "cumsum": np.cumsum,
+    "where": np.where,
+    "days": _days,
+}
+
+
+class CompiledExpression:
+    """
+    A parsed and checked expression, ready to evaluate repeatedly.
+    """
+
+    def __init__(self, text: str, evaluator: _Evaluator, variables: frozenset[str]):
+        """
+        Constructor. Use `compile_expression`.
+
+        :param text: The expression.
+        :param evaluator: Evaluates the expression given its variables.
+        :param variables: Names of the variables it uses.
+        """
+        self._text = text
+        self._evaluator = evaluator
+        self._variables = variables
+
+    @property
+    def text(self) -> str:
+        """
+        Return the expression.
+
+        :return: Its text.
+        """
+        return self._text
+
+    @property
+    def variables(self) -> frozenset[str]:
+        """
+        Return the names of the variables the expression uses.
+
+        :return: Variable names.
+        """
+        return self._variables
+
+    def evaluate(self, **variables: Any) -> Any:
+        """
+        Evaluate the expression. Sequences are evaluated element-wise.
+
+        :param variables: Values of the variables: numbers, sequences of
+                          numbers, or sequences of ISO 8601 dates.
+        :return: A number, or an array if any variable is a sequence.
+        :raise: ValueError - If a variable is missing or a value is refused.
+        """
+        missing = self._variables - variables.keys()
+        if missing:
+            raise ValueError(f"Missing values for {sorted(missing)} in {self._text}")
+        result = self._evaluator(
+            {name: _value(value) for name, value in variables.items()}
+        )
+        if isinstance(result, np.ndarray) and result.ndim == 0:
+            result = result[()]
+        return result.item() if isinstance(result, np.generic) else result
+
+
+@functools.lru_cache(maxsize=DEFAULT_EXPRESSION_CACHE_SIZE)
+def compile_expression(text: str) -> CompiledExpression:
+    """
+    Parse, check and compile an expression, or return it from the cache.
+
+    :param text: The expression, e.g. `amount * 1.2`.
+    :return: The compiled expression.
+    :raise: ValueError - If the expression is invalid or uses anything but
+            numbers, variables, arithmetic, comparisons and known functions.
+    """
+    if len(text) > DEFAULT_MAX_EXPRESSION_LENGTH:
+        raise ValueError(
+            f"Expression longer than {DEFAULT_MAX_EXPRESSION_LENGTH} characters"
+        )
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression {text!r}: {e.msg}") from e
+    variables: set[str] = set()
+    evaluator = _compile(tree.body, variables)
+    _LOGGER.debug(f"Compiled expression {text!r}")
+    return CompiledExpression(text, evaluator, frozenset(variables))
+
+
+def evaluate(text: str, **variables: Any) -> Any:
+    """
+    Evaluate an expression, compiling it on first use.
+
+    :param text: The expression.
+    :param variables: Values of its variables.
+    :return: The result.
+    :raise: ValueError - If the expression or a value is refused.
+    """
+    return compile_expression(text).evaluate(**variables)
+
+
+# pylint: disable=too-many-return-statements,too-many-locals
+def _compile(node: ast.AST, variables: set[str]) -> _Evaluator:
+    """Compile a whitelisted AST node, collecting the variables it uses."""
+    match node:
+        case ast.Constant(value=value) if isinstance(value, (int, float)) and not (
+            isinstance(value, bool)
+        ):
+            return lambda env: value
+        case ast.Name(id=name) if name in _CONSTANTS:
+            constant = _CONSTANTS[name]
+            return lambda env: constant
+        case ast.Name(id=name) if name not in _FUNCTIONS:
+            variables.add(name)
+            return lambda env: env[name]
+        case ast.BinOp(left=left, op=ast.Pow(), right=right):
+            return _power(_compile(left, variables), _compile(right, variables))
+        case ast.BinOp(left=left, op=op, right=right) if type(op) in _BINARY_OPERATORS:
+            return _binary(
+                _BINARY_OPERATORS[type(op)],
+                _compile(left, variables),
+                _compile(right, variables),
+            )
+        case ast.UnaryOp(op=op, operand=operand) if type(op) in _UNARY_OPERATORS:
+            unary = _UNARY_OPERATORS[type(op)]
+            argument = _compile(operand, variables)
+            return lambda env: unary(argument(env))
+        case ast.Compare(left=left, ops=ops, comparators=comparators) if all(
+            type(op) in _COMPARISONS for op in ops
+        ):
+            return _comparison(
+                [_compile(left, variables)]
+                + [_compile(c, variables) for c in comparators],
+                [_COMPARISONS[type(op)] for op in ops],
+            )
+        case ast.BoolOp(op=op, values=values):
+            combine = np.logical_and if isinstance(op, ast.And) else np.logical_or
+            operands = [_compile(value, variables) for value in values]
+            return lambda env: functools.reduce(
+                combine, [operand(env) for operand in operands]
+            )
+        case ast.Call(func=ast.Name(id=name), args=args, keywords=[]) if (
+            name in _FUNCTIONS
+        ):
+            function = _FUNCTIONS[name]
+            arguments = [_compile(arg, variables) for arg in args]
+            return lambda env: function(*(argument(env) for argument in arguments))
+    raise ValueError(f"Unsupported expression: {ast.unparse(node)!r}")
+
+
+def _binary(
+    apply: Callable[[Any, Any], Any], left: _Evaluator, right: _Evaluator
+) -> _Evaluator:
+    """Return the evaluator of a binary operation."""
+    return lambda env: apply(left(env), right(env))
+
+
+def _power(base: _Evaluator, exponent: _Evaluator) -> _Evaluator:
+    """Return the evaluator of a power, refusing huge scalar exponents and results."""
+
+    def power(env: Mapping[str, Any]) -> Any:
+        value = exponent(env)
+        if np.ndim(value) == 0 and abs(value) > DEFAULT_MAX_EXPONENT:
+            raise ValueError(f"Exponent {value} is larger than {DEFAULT_MAX_EXPONENT}")
+        base_value = base(env)
+        if (
+            isinstance(base_value, int)
+            and np.ndim(value) == 0
+            and value > 0
+            and abs(base_value) > 1
+            and math.log10(abs(base_value)) * value > DEFAULT_MAX_POWER_DIGITS
+        ):
+            raise ValueError(f"Power has more than {DEFAULT_MAX_POWER_DIGITS} digits")
+        return operator.pow(base_value, value)
+
+    return power
+
+
+def _comparison(
+    operands: list[_Evaluator], comparisons: list[Callable[[Any, Any], Any]]
+) -> _Evaluator:
+    """Return the evaluator of a chain of comparisons, e.g. `0 < x <= 10`."""
+
+    def compare(env: Mapping[str, Any]) -> Any:
+        values = [operand(env) for operand in operands]
+        return functools.reduce(
+            np.logical_and,
+            [
+                comparison(values[i], values[i + 1])
+                for i, comparison in enumerate(comparisons)
+            ],
+        )
+
+    return compare
+
+
+def _value(value: Any) -> Any:
+    """Return a variable's value as a number or a NumPy array."""
+    if isinstance(value, (int, float, np.generic, np.ndarray)) and not isinstance(
+        value, bool
+    ):
+        return value
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, str) for item in value):
+            try:
+                return np.asarray(value, dtype="datetime64[D]")
+            except ValueError as e:
+                raise ValueError(f"Invalid dates: {e}") from e
+        array = np.asarray(value)
+        if array.dtype.kind not in "iuf":
+            raise ValueError("Sequences must hold numbers or ISO 8601 dates")
+        return array
+    raise ValueError(f"Unsupported value {value!r}")
@@ -0,0 +1,449 @@
+"""
+Registry of the tools the MCP handler can call.
+
+A tool is a sync or async function declared with a name, a description
+and a JSON schema of its parameters:
+
+    @TOOLS.tool(
+        name="get_weather",
+        description="Get the weather for a location.",
+        parameters={
+            "type": "object",
+            "properties": {"location": {"type": "string"}},
+            "required": ["location"],
+        },
+    )
+    def get_weather(location): ...
+
+`ToolRegistry.execute` runs a batch of calls concurrently. Async tools run
+on the caller's event loop; sync tools run on a bounded thread pool so
+they do not block it. Each call has a timeout, after which it is
+cancelled and reported as failed without holding up the other calls. A
+sync tool which has already started keeps its thread until it returns,
+but nobody waits for it.
+
+A tool may also declare a `ToolCachePolicy`, to have its results cached
+(see `oracle_server.tools.cache`), and a batch function, which fetches
+the results of several calls at once, e.g. the weather of N locations in
+one upstream request. Calls to a tool with a batch function which are
+executed together and are not cached are made through it.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+from collections.abc import Callable, Hashable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from oracle_server.error import ToolError
+from oracle_server.event_loop import BackgroundLoop
+from oracle_server.single_flight import SingleFlight
+from oracle_server.tools.cache import ToolCachePolicy, ToolResultCache, cache_key
+
+_LOGGER = logging.getLogger()
+
+DEFAULT_TOOL_WORKERS = 8
+# Seconds a tool call may take.
+DEFAULT_TOOL_TIMEOUT_SECONDS = 5.0
+
+# Sync tools run here, so slow ones cannot take every thread of the caller.
+_TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=DEFAULT_TOOL_WORKERS, thread_name_prefix="tool"
+)
+# Stale cached results are refreshed here, after the request that found
+# them has been answered.
+_REFRESH_LOOP = BackgroundLoop("tool-refresh")
+
+# Fetches the outputs of several calls from their arguments, in order. An
+# item may be an exception, for a call which failed.
+BatchFunction = Callable[[list[dict[str, Any]]], Any]
+
+
+@dataclass(frozen=True)
+class Tool:
+    """
+    A callable tool and its declaration.
+    """
+
+    name: str
+    description: str
+    func: Callable[..., Any]
+    # JSON schema of the keyword arguments.
+    parameters: Mapping[str, Any] = field(
+        default_factory=lambda: {"type": "object", "properties": {}}
+    )
+    # Overrides the registry's timeout.
+    timeout_seconds: float | None = None
+    # Caches the tool's results. None does not cache them.
+    cache: ToolCachePolicy | None = None
+    # Makes several calls at once.
+    batch: BatchFunction | None = None
+
+    @property
+    def is_async(self) -> bool:
+        """
+        Return whether the tool is a coroutine function.
+
+        :return: True for async tools.
+        """
+        return inspect.iscoroutinefunction(self.func)
+
+    def schema(self) -> dict[str, Any]:
+        """
+        Return the tool's declaration, as listed to MCP clients.
+
+        :return: Name, description and input schema.
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputSchema": dict(self.parameters),
+        }
+
+    def validate(self, arguments: Mapping[str, Any]) -> None:
+        """
+        Check arguments against the parameter schema: required parameters
+        must be given, and unknown ones must not.
+
+        :param arguments: Keyword arguments.
+        :raise: ToolError - If the arguments do not match.
+        """
+        properties = self.parameters.get("properties", {})
+        missing = [p for p in self.parameters.get("required", []) if p not in arguments]
+        unknown = [a for a in arguments if a not in properties]
+        if missing or unknown:
+            raise ToolError(
+                f"Invalid parameters for {self.name}: "
+                f"missing {missing}, unknown {unknown}"
+            )
+
+
+@dataclass(frozen=True)
+class ToolCall:
+    """A request to call a tool with keyword arguments."""
+
+    name: str
+    arguments: Mapping[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ToolResult:
+    """The output of a tool call, or why it failed."""
+
+    call: ToolCall
+    output: Any = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """
+        Return whether the call succeeded.
+
+        :return: True if there is no error.
+        """
+        return self.error is None
+
+
+# pylint: disable=too-many-instance-attributes
+class ToolRegistry:
+    """
+    Tools by name, and a concurrent executor for calls to them.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = DEFAULT_TOOL_TIMEOUT_SECONDS,
+        executor: ThreadPoolExecutor | None = None,
+        cache: ToolResultCache | None = None,
+    ):
+        """
+        Constructor.
+
+        :param timeout_seconds: Default seconds a call may take.
+        :param executor: Runs sync tools. Defaults to a shared bounded pool.
+        :param cache: Results of tools with a cache policy. Defaults to a
+                      cache of this registry's own.
+        """
+        self._tools: dict[str, Tool] = {}
+        self._timeout_seconds = timeout_seconds
+        self._executor = executor or _TOOL_EXECUTOR
+        self._cache = cache or ToolResultCache()
+        self._in_flight = SingleFlight("tool")
+        self._batches = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self) -> ToolResultCache:
+        """
+        Return the cache of tool results.
+
+        :return: The cache.
+        """
+        return self._cache
+
+    def register(self, tool: Tool) -> Tool:
+        """
+        Add a tool, replacing any tool with the same name.
+
+        :param tool: The tool.
+        :return: The same tool.
+        """
+        with self._lock:
+            self._tools[tool.name] = tool
+        _LOGGER.debug(f"Registered tool {tool.name}")
+        return tool
+
+    def tool(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        name: str,
+        description: str,
+        parameters: Mapping[str, Any] | None = None,
+        timeout_seconds: float | None = None,
+        cache: ToolCachePolicy | None = None,
+        batch: BatchFunction | None = None,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        Decorator which registers a function as a tool and leaves it unchanged.
+
+        :param name: Tool name.
+        :param description: What the tool does.
+        :param parameters: JSON schema of its keyword arguments.
+        :param timeout_seconds: Seconds a call may take, if not the default.
+        :param cache: How long its results are cached. Not cached if None.
+        :param batch: Makes several calls at once, sync or async.
+        :return: The decorator.
+        """
+
+        def register(func: Callable[..., Any]) -> Callable[..., Any]:
+            self.register(
+                Tool(
+                    name=name,
+                    description=description,
+                    func=func,
+                    parameters=parameters or {"type": "object", "properties": {}},
+                    timeout_seconds=timeout_seconds,
+                    cache=cache,
+                    batch=batch,
+                )
+            )
+            return func
+
+        return register
+
+    def get(self, name: str) -> Tool:
+        """
+        Return a tool by name.
+
+        :param name: Tool name.
+        :return: The tool.
+        :raise: ToolError - If there is no such tool.
+        """
+        with self._lock:
+            tool = self._tools.get(name)
+        if tool is None:
+            raise ToolError(f"Unknown tool: {name}")
+        return tool
+
+    def schemas(self) -> list[dict[str, Any]]:
+        """
+        Return the declarations of all tools.
+
+        :return: Tool schemas, by name.
+        """
+        with self._lock:
+            tools = sorted(self._tools.values(), key=lambda t: t.name)
+        return [tool.schema() for tool in tools]
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return the calls made, calls which shared a call in flight, batches
+        made, and the cache's counters.
+
+        :return: Counters.
+        """
+        with self._lock:
+            batches = self._batches
+        return {
+            **self._in_flight.stats(),
+            "batches": batches,
+            **{f"cache_{name}": value for name, value in self._cache.stats().items()},
+        }
+
+    async def call(self, call: ToolCall) -> Any:
+        """
+        Call a tool within its timeout, or answer from the cache.
+
+        :param call: The call.
+        :return: The tool's output.
+        :raise: ToolError - If the tool is unknown, the arguments are
+                invalid, or the call times out or fails.
+        """
+        tool = self.get(call.name)
+        tool.validate(call.arguments)
+        (outcome,) = await self.__load(tool, [call])
+        if isinstance(outcome, ToolError):
+            raise outcome
+        return outcome
+
+    async def execute(self, calls: Sequence[ToolCall]) -> list[ToolResult]:
+        """
+        Run calls concurrently. A call which fails or times out does not
+        affect the others. Uncached calls to a tool with a batch function
+        are made in one batch.
+
+        :param calls: The calls.
+        :return: Their results, in the order of the calls.
+        """
+        outcomes: list[Any] = [None] * len(calls)
+        groups: dict[str, tuple[Tool, list[int]]] = {}
+        for i, call in enumerate(calls):
+            try:
+                tool = self.get(call.name)
+                tool.validate(call.arguments)
+            except ToolError as e:
+                outcomes[i] = e
+                continue
+            groups.setdefault(tool.name, (tool, []))[1].append(i)
+        loaded = await asyncio.gather(
+            *(
+                self.__load(tool, [calls[i] for i in positions])
+                for tool, positions in groups.values()
+            )
+        )
+        for (_, positions), group_outcomes in zip(groups.values(), loaded):
+            for i, outcome in zip(positions, group_outcomes):
+                outcomes[i] = outcome
+        return [_result(call, outcome) for call, outcome in zip(calls, outcomes)]
+
+    async def __load(self, tool: Tool, calls: list[ToolCall]) -> list[Any]:
+        """
+        Return the outputs of calls to a tool, or ToolErrors, from the cache
+        where possible, and fetch the rest.
+        """
+        if tool.cache is None:
+            return await self.__fetch(tool, calls)
+        outcomes: list[Any] = [None] * len(calls)
+        missing: dict[Hashable, list[int]] = {}
+        for i, call in enumerate(calls):
+            key = cache_key(tool.name, call.arguments)
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(i)
+                continue
+            outcomes[i] = (
+                cached.output if cached.error is None else ToolError(cached.error)
+            )
+            if cached.stale:
+                self.__refresh_in_background(tool, call, key)
+        if missing:
+            first_calls = [calls[positions[0]] for positions in missing.values()]
+            fetched = await self.__fetch(tool, first_calls)
+            for call, positions, outcome in zip(first_calls, missing.values(), fetched):
+                self.__store(tool, call, outcome)
+                for i in positions:
+                    outcomes[i] = outcome
+        return outcomes
+
+    async def __fetch(self, tool: Tool, calls: list[ToolCall]) -> list[Any]:
+        """Make calls to a tool, in one batch if it has a batch function."""
+        if tool.batch is not None and len(calls) > 1:
+            return await self.__fetch_batch(tool, tool.batch, calls)
+        return list(
+            await asyncio.gather(*(self.__fetch_one(tool, call) for call in calls))
+        )
+
+    async def __fetch_one(self, tool: Tool, call: ToolCall) -> Any:
+        """Make a call, sharing an identical call in flight."""
+        try:
+            return await self._in_flight.ado(
+                cache_key(tool.name, call.arguments),
+                lambda: self.__run(tool, tool.func, **call.arguments),
+            )
+        except ToolError as e:
+            return e
+
+    async def __fetch_batch(
+        self, tool: Tool, batch: BatchFunction, calls: list[ToolCall]
+    ) -> list[Any]:
+        """Make calls through the tool's batch function."""
+        with self._lock:
+            self._batches += 1
+        try:
+            outputs = list(
+                await self.__run(tool, batch, [dict(call.arguments) for call in calls])
+            )
+        except ToolError as e:
+            return [e] * len(calls)
+        if len(outputs) != len(calls):
+            error = ToolError(
+                f"{tool.name} returned {len(outputs)} results for {len(calls)} calls"
+            )
+            return [error] * len(calls)
+        return [
+            (
+                ToolError(f"{tool.name} failed: {output}", output)
+                if isinstance(output, Exception)
+                else output
+            )
+            for output in outputs
+        ]
+
+    async def __run(self, tool: Tool, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a tool function within the tool's timeout."""
+        timeout = tool.timeout_seconds or self._timeout_seconds
+        try:
+            if inspect.iscoroutinefunction(func):
+                work = func(*args, **kwargs)
+            else:
+                work = asyncio.get_running_loop().run_in_executor(
+                    self._executor, functools.partial(func, *args, **kwargs)
+                )
+            return await asyncio.wait_for(work, timeout=timeout)
+        except asyncio.TimeoutError as e:
+            raise ToolError(f"{tool.name} timed out after {timeout}s", e) from e
+        except ToolError:
+            raise
+        except Exception as e:
+            raise ToolError(f"{tool.name} failed: {e}", e) from e
+
+    def __store(self, tool: Tool, call: ToolCall, outcome: Any) -> None:
+        """Cache an outcome. Timeouts say nothing about the arguments."""
+        if tool.cache is None:
+            return
+        key = cache_key(tool.name, call.arguments)
+        if not isinstance(outcome, ToolError):
+            self._cache.put(key, tool.cache, output=outcome)
+        elif not isinstance(outcome.cause, asyncio.TimeoutError):
+            self._cache.put(key, tool.cache, error=outcome.message)
+
+    def __refresh_in_background(
+        self, tool: Tool, call: ToolCall, key: Hashable
+    ) -> None:
+        """Fetch a fresh result for a stale entry, unless one is on its way."""
+        if self._cache.start_refresh(key):
+            _REFRESH_LOOP.submit(self.__refresh(tool, call, key))
+
+    async def __refresh(self, tool: Tool, call: ToolCall, key: Hashable) -> None:
+        """Replace a stale entry."""
+        try:
+            (outcome,) = await self.__fetch(tool, [call])
+            self.__store(tool, call, outcome)
+            _LOGGER.debug(f"Refreshed cached result of {tool.name}")
+        finally:
+            self._cache.end_refresh(key)
+
+
+def _result(call: ToolCall, outcome: Any) -> ToolResult:
+    """Return the result of a call from its output or ToolError."""
+    if isinstance(outcome, ToolError):
+        _LOGGER.warning(outcome.message)
+        return ToolResult(call=call, error=outcome.message)
+    return ToolResult(call=call, output=outcome)
+
+
+# Tools available to the MCP handler; tool modules register themselves here.
+TOOLS = ToolRegistry()
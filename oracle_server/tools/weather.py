@@ -1,7 +1,42 @@
 """Weather API tool."""
 
+from oracle_server.tools.cache import ToolCachePolicy
+from oracle_server.tools.registry import TOOLS
 
+# The weather changes slowly: results are kept for 10 minutes, and served
+# for 5 more while they are refreshed. Unknown locations are kept for a minute.
+WEATHER_CACHE_POLICY = ToolCachePolicy(
+    ttl_seconds=600, negative_ttl_seconds=60, stale_seconds=300
+)
+
+
+def fetch_weather(locations: list[str]) -> list[str]:
+    """
+    Get the weather for several locations.
+
+    :param locations: Location names.
+    :return: The weather of each location, in order.
+    """
+    # In a real implementation, this would be one call to a weather API
+    return [f"The weather in {location} is sunny." for location in locations]
+
+
+def get_weather_batch(arguments: list[dict]) -> list[str]:
+    """Get the weather for the locations of several tool calls at once."""
+    return fetch_weather([call["location"] for call in arguments])
+
+
+@TOOLS.tool(
+    name="get_weather",
+    description="Get the weather for a location.",
+    parameters={
+        "type": "object",
+        "properties": {"location": {"type": "string"}},
+        "required": ["location"],
+    },
+    cache=WEATHER_CACHE_POLICY,
+    batch=get_weather_batch,
+)
 def get_weather(location):
     """Get the weather for a location."""
-    # In a real implementation, this would call a weather API
-    return f"The weather in {location} is sunny."
+    return fetch_weather([location])[0]
@@ -6,16 +6,62 @@ of high dimensionality.
 
 """
 
+# pylint: disable=too-many-lines
+
+import fcntl
+import io
+import json
 import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
 
 from abc import ABC, abstractmethod
+import numpy as np
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from oracle_server.embedding_backends import get_embedding_backend, warm_up
 from oracle_server.error import VectorDBError
+from oracle_server.lexical import BM25Index, reciprocal_rank_fusion
+from oracle_server.metadata_index import (
+    MetadataFilter,
+    MetadataIndex,
+    chroma_where,
+    matches,
+)
+from oracle_server.quantization import CompactIndex, create_compact_index
+from oracle_server.single_flight import SingleFlight
 
 DEFAULT_TOP_K = 5
+DEFAULT_VECTOR_STORE_BACKEND = "chroma"
+DEFAULT_SQLITE_DIR = "./chromadb"
+DEFAULT_NUMPY_VECTOR_DIR = "./vectors"
+DEFAULT_VECTOR_COLLECTION = "babylon_vectors"
+# With a compact index, `top_k * DEFAULT_RESCORE_FACTOR` candidates are
+# re-scored against the full vectors.
+DEFAULT_RESCORE_FACTOR = 4
+# Candidates per result that hybrid search takes from each ranking.
+DEFAULT_HYBRID_CANDIDATES = 4
+# Documents read at a time when building a lexical index for a collection.
+DEFAULT_LEXICAL_BUILD_ROWS = 5000
+# Rows encoded at a time when building a compact index from stored vectors.
+DEFAULT_COMPACT_BUILD_ROWS = 65536
+DEFAULT_EMBEDDING_CACHE_BYTES = 64 * 1024 * 1024
+# Rough per-entry bookkeeping cost (dict slot, key tuple, array header).
+_CACHE_ENTRY_OVERHEAD_BYTES = 200
+DEFAULT_EMBEDDING_BATCH_SIZE = 32
+DEFAULT_EMBEDDING_BATCH_WAIT_MS = 5
 
 _LOGGER = logging.getLogger()
 
@@ -29,14 +75,373 @@ _LOGGER = logging.getLogger()
 SimilarEmbeddingRecord = tuple[Document, float]
 
 
+@dataclass
+class BatchSearchResult:
+    """
+    The result of one query of a batched similarity search. A failed
+    query carries its error instead of records.
+    """
+
+    query: str
+    records: list[SimilarEmbeddingRecord] = field(default_factory=list)
+    error: VectorDBError | None = None
+
+    @property
+    def ok(self) -> bool:
+        """
+        Return whether the query succeeded.
+
+        :return: True if the query succeeded.
+        """
+        return self.error is None
+
+
+class EmbeddingCache:
+    """
+    A bounded, thread-safe LRU cache of query embeddings.
+
+    Entries are keyed by model name and normalized query text, so one cache
+    can be shared by every store in the process. Embeddings are held as
+    packed float32 arrays and the cache evicts least recently used entries
+    once their total size passes `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_EMBEDDING_CACHE_BYTES):
+        """
+        Constructor.
+
+        :param max_bytes: Memory budget for cached entries.
+        """
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], array] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        """
+        Return the number of lookups served from the cache.
+
+        :return: Hit count.
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Return the number of lookups not found in the cache.
+
+        :return: Miss count.
+        """
+        return self._misses
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        """
+        Return the cached embedding of a text, if any.
+
+        :param model: Embedding model name.
+        :param text: Query text.
+        :return: The embedding, or None on a miss.
+        """
+        key = (model, normalize_query(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return embedding.tolist()
+
+    def put(self, model: str, text: str, embedding: list[float]) -> None:
+        """
+        Cache the embedding of a text, evicting old entries if over budget.
+
+        :param model: Embedding model name.
+        :param text: Query text.
+        :param embedding: The text's embedding.
+        """
+        key = (model, normalize_query(text))
+        packed = array("f", embedding)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= _entry_bytes(key, self._entries.pop(key))
+            self._entries[key] = packed
+            self._bytes += _entry_bytes(key, packed)
+            while self._bytes > self._max_bytes and self._entries:
+                old_key, old = self._entries.popitem(last=False)
+                self._bytes -= _entry_bytes(old_key, old)
+
+    def resize(self, max_bytes: int) -> None:
+        """
+        Change the memory budget, evicting entries if now over it.
+
+        :param max_bytes: New memory budget.
+        """
+        with self._lock:
+            self._max_bytes = max_bytes
+            while self._bytes > self._max_bytes and self._entries:
+                old_key, old = self._entries.popitem(last=False)
+                self._bytes -= _entry_bytes(old_key, old)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return cache counters.
+
+        :return: Hits, misses, entry count and memory use.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize query text for caching: case-folded, with runs of
+    whitespace collapsed.
+
+    :param text: Query text.
+    :return: Normalized text.
+    """
+    return " ".join(text.casefold().split())
+
+
+def _entry_bytes(key: tuple[str, str], embedding: array) -> int:
+    """Return the approximate memory used by a cache entry."""
+    return (
+        len(key[1]) + embedding.itemsize * len(embedding) + _CACHE_ENTRY_OVERHEAD_BYTES
+    )
+
+
+# Process-wide cache shared by all vector stores.
+_SHARED_EMBEDDING_CACHE = EmbeddingCache()
+
+
+def shared_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide query embedding cache.
+
+    :return: The shared cache.
+    """
+    return _SHARED_EMBEDDING_CACHE
+
+
+# Embeds a batch of texts in one forward pass.
+BatchEmbedder = Callable[[list[str]], list[list[float]]]
+
+
+# pylint: disable=too-many-instance-attributes
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched forward passes.
+
+    Callers submit single texts from any thread. A worker thread waits up
+    to `max_wait_ms` after the first pending text for others to arrive,
+    embeds up to `max_batch` texts in one call, and resolves each caller's
+    future with its own embedding.
+    """
+
+    def __init__(
+        self,
+        embed_batch: BatchEmbedder,
+        max_batch: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_EMBEDDING_BATCH_WAIT_MS,
+        name: str = "embedding-batcher",
+    ):
+        """
+        Constructor. The worker thread is started on first use.
+
+        :param embed_batch: Embeds a list of texts, e.g. `embed_documents`.
+        :param max_batch: Max texts per forward pass.
+        :param max_wait_ms: Max time the first text of a batch waits for others.
+        :param name: Name of the worker thread.
+        """
+        self._embed_batch = embed_batch
+        self._max_batch = max_batch
+        self._max_wait_seconds = max_wait_ms / 1000
+        self._name = name
+        self._pending: queue.SimpleQueue[tuple[str, Future]] = queue.SimpleQueue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "largest_batch": 0,
+            "max_queue_depth": 0,
+        }
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text to be embedded in the next batch.
+
+        :param text: Text to embed.
+        :return: A future for the text's embedding.
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._pending.put((text, future))
+        with self._lock:
+            self._stats["max_queue_depth"] = max(
+                self._stats["max_queue_depth"], self._pending.qsize()
+            )
+        return future
+
+    def embed(self, text: str) -> list[float]:
+        """
+        Embed a text as part of a batch, blocking until it is done.
+
+        :param text: Text to embed.
+        :return: The text's embedding.
+        """
+        return self.submit(text).result()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return batching counters.
+
+        :return: Batches run, texts embedded, largest batch, and the current
+                 and max observed number of queued texts.
+        """
+        with self._lock:
+            return {**self._stats, "queue_depth": self._pending.qsize()}
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread if it is not running."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name=self._name, daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self) -> None:
+        """Worker loop: collect a batch, embed it, repeat."""
+        while True:
+            self._embed(self._next_batch())
+
+    def _next_batch(self) -> list[tuple[str, Future]]:
+        """Block for a first text, then collect more until the batch is full or due."""
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self._max_wait_seconds
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _embed(self, batch: list[tuple[str, Future]]) -> None:
+        """Embed a batch and resolve its futures."""
+        batch = [
+            (text, future)
+            for text, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            embedded = dict(zip(texts, self._embed_batch(texts)))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning(f"Batched embedding of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for text, future in batch:
+            future.set_result(embedded[text])
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["items"] += len(batch)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+
+class _CorpusVersionFile:
+    """
+    A corpus version kept in a file, so that every process writing a
+    store, such as the ingestion CLI, changes the version every other
+    process reads.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Constructor.
+
+        :param path: The file. It is created on the first change.
+        """
+        self._path = path
+        self._version = 0
+
+    def read(self) -> int:
+        """
+        Return the version.
+
+        :return: The number of changes recorded, 0 if there are none.
+        """
+        try:
+            self._version = int(self._path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            # Caught mid-write; the next read sees the new version.
+            pass
+        return self._version
+
+    def bump(self) -> None:
+        """
+        Record a change. Safe against concurrent changes by other processes.
+        """
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.open("a+", encoding="utf-8") as version_file:
+            fcntl.flock(version_file, fcntl.LOCK_EX)
+            version_file.seek(0)
+            version = int(version_file.read() or 0) + 1
+            version_file.seek(0)
+            version_file.truncate()
+            version_file.write(str(version))
+
+
 class VectorStore(ABC):
     """
     A Generic Vector Store. A `VectorStore` uses an embedding model
     to encode unstructured text from the data lake.
     """
 
-    def __init__(self, model: str):
+    def __init__(self, model: str, embedding_cache: EmbeddingCache | None = None):
+        """
+        Constructor.
+
+        :param model: Embedding model name.
+        :param embedding_cache: Query embedding cache. Defaults to the
+                                process-wide shared cache.
+        """
+        self._model_name = model
         self._model = embeddings(model)
+        self._embedding_cache = embedding_cache or shared_embedding_cache()
+        self._corpus_version = 0
+        # Shares the corpus version with other processes, if set.
+        self._corpus_version_file: _CorpusVersionFile | None = None
+        self._embedding_batcher: EmbeddingBatcher | None = None
+        self._lexical_index: BM25Index | None = None
+        self._searches = SingleFlight("search")
 
     @property
     def model(self):
@@ -47,9 +452,261 @@ class VectorStore(ABC):
         """
         return self._model
 
+    @property
+    def model_name(self) -> str:
+        """
+        Return the name of this VectorStore's embedding model.
+
+        :return: Embedding model name.
+        """
+        return self._model_name
+
+    @property
+    def embedding_cache(self) -> EmbeddingCache:
+        """
+        Return this VectorStore's query embedding cache.
+
+        :return: The embedding cache.
+        """
+        return self._embedding_cache
+
+    @property
+    def corpus_version(self) -> int:
+        """
+        Return a counter which changes whenever documents are added or removed.
+
+        Anything derived from search results, such as cached answers, is
+        stale once this changes. Stores persisted in a shared location also
+        count changes made by other processes.
+
+        :return: The corpus version.
+        """
+        if self._corpus_version_file is not None:
+            return self._corpus_version_file.read()
+        return self._corpus_version
+
+    def _bump_corpus_version(self) -> None:
+        """Record that documents were added or removed."""
+        if self._corpus_version_file is not None:
+            self._corpus_version_file.bump()
+        else:
+            self._corpus_version += 1
+
+    @property
+    def lexical_index(self) -> BM25Index | None:
+        """
+        Return the BM25 index kept alongside the vectors, if hybrid search
+        is enabled.
+
+        :return: The lexical index, or None.
+        """
+        return self._lexical_index
+
+    @property
+    def embedding_batcher(self) -> EmbeddingBatcher | None:
+        """
+        Return the batcher query embeddings go through, if batching is enabled.
+
+        :return: The embedding batcher, or None.
+        """
+        return self._embedding_batcher
+
+    def enable_batching(
+        self,
+        max_batch: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_EMBEDDING_BATCH_WAIT_MS,
+    ) -> None:
+        """
+        Embed uncached queries from concurrent callers in shared batches.
+
+        :param max_batch: Max queries per forward pass.
+        :param max_wait_ms: Max time a query waits for others to batch with.
+        """
+        _LOGGER.info(
+            f"Batching query embeddings (max_batch={max_batch}, max_wait_ms={max_wait_ms})"
+        )
+        self._embedding_batcher = EmbeddingBatcher(
+            self.model.embed_documents, max_batch=max_batch, max_wait_ms=max_wait_ms
+        )
+
+    def embed_query(self, query_text: str) -> list[float]:
+        """
+        Embed query text, reusing the cached embedding of an equivalent query.
+
+        :param query_text: Query text.
+        :return: The query embedding.
+        """
+        embedding = self._embedding_cache.get(self._model_name, query_text)
+        if embedding is None:
+            if self._embedding_batcher is not None:
+                embedding = self._embedding_batcher.embed(query_text)
+            else:
+                embedding = self.model.embed_query(query_text)
+            self._embedding_cache.put(self._model_name, query_text, embedding)
+        return embedding
+
+    def warm_up(self) -> float:
+        """
+        Run the embedding model once so the first query does not pay for
+        its lazy initialization.
+
+        :return: Time taken, in seconds.
+        """
+        return warm_up(
+            self.model, batch_size=get_embedding_backend(self._model_name).batch_size
+        )
+
+    def embed_queries(self, query_texts: Sequence[str]) -> list[list[float]]:
+        """
+        Embed several queries, running a single batched forward pass for
+        those not already cached.
+
+        :param query_texts: Query texts.
+        :return: The query embeddings, in order.
+        """
+        found = [
+            self._embedding_cache.get(self._model_name, text) for text in query_texts
+        ]
+        missing = list(
+            dict.fromkeys(
+                normalize_query(text)
+                for text, embedding in zip(query_texts, found)
+                if embedding is None
+            )
+        )
+        if missing:
+            computed = dict(zip(missing, self.model.embed_documents(missing)))
+            for text, embedding in computed.items():
+                self._embedding_cache.put(self._model_name, text, embedding)
+            found = [
+                computed[normalize_query(text)] if embedding is None else embedding
+                for text, embedding in zip(query_texts, found)
+            ]
+        return found  # type: ignore[return-value]
+
+    def similarity_search_batch(
+        self, queries: Sequence[str], top_k: int = DEFAULT_TOP_K
+    ) -> list[BatchSearchResult]:
+        """
+        Run a similarity search for each of several queries.
+
+        A failing query does not fail the batch; its result carries the error.
+        This default searches one query at a time; stores which can search
+        in bulk override it.
+
+        :param queries: Unstructured texts to search.
+        :param top_k: Top K.
+        :return: One result per query, in order.
+        """
+        results = []
+        for query in queries:
+            try:
+                results.append(
+                    BatchSearchResult(
+                        query=query, records=self.similarity_search(query, top_k)
+                    )
+                )
+            except VectorDBError as e:
+                results.append(BatchSearchResult(query=query, error=e))
+        return results
+
+    def search(
+        self,
+        query_text: str,
+        top_k: int = DEFAULT_TOP_K,
+        where: MetadataFilter | None = None,
+    ) -> list[SimilarEmbeddingRecord]:
+        """
+        Retrieve the documents most relevant to a query.
+
+        Without a lexical index this is `similarity_search`. With one, the
+        top `top_k * DEFAULT_HYBRID_CANDIDATES` documents by vector
+        similarity and by BM25 are fused with reciprocal rank fusion, which
+        finds exact tokens such as merchant names and amounts that
+        embeddings miss.
+
+        Searches for the same normalized query, top k and filter which
+        arrive while one is running wait for its result instead of
+        searching again.
+
+        :param query_text: Unstructured text to search.
+        :param top_k: Top K.
+        :param where: Optional metadata filter the documents must satisfy.
+        :return: The top k documents. Hybrid results are scored by fused
+                 rank, higher is better.
+        """
+        key = (normalize_query(query_text), top_k, _filter_key(where))
+        records = self._searches.do(
+            key, lambda: self.__fused_search(query_text, top_k, where)
+        )
+        return list(records)
+
+    @property
+    def search_stats(self) -> dict[str, int]:
+        """
+        Return how many searches were made and how many shared the result
+        of an identical search in flight.
+
+        :return: Counters.
+        """
+        return self._searches.stats()
+
+    def __fused_search(
+        self,
+        query_text: str,
+        top_k: int,
+        where: MetadataFilter | None,
+    ) -> list[SimilarEmbeddingRecord]:
+        """Run a search, fusing vector and lexical results with a lexical index."""
+        if self._lexical_index is None:
+            return self.similarity_search(query_text, top_k, where=where)
+        candidates = top_k * DEFAULT_HYBRID_CANDIDATES
+        dense = self.similarity_search(query_text, candidates, where=where)
+        lexical = [
+            doc_id for doc_id, _ in self._lexical_index.search(query_text, candidates)
+        ]
+        documents = {
+            document.id or f"#{rank}": document
+            for rank, (document, _) in enumerate(dense)
+        }
+        dense_ids = list(documents)
+        missing = [doc_id for doc_id in lexical if doc_id not in documents]
+        if missing and where:
+            # The lexical index is not filtered: check its documents here.
+            found = self.get_documents(missing)
+            documents.update(
+                (document.id, document)
+                for document in found
+                if document.id is not None and matches(document.metadata, where)
+            )
+            lexical = [doc_id for doc_id in lexical if doc_id in documents]
+        fused = reciprocal_rank_fusion([dense_ids, lexical])[:top_k]
+        missing = [doc_id for doc_id, _ in fused if doc_id not in documents]
+        if missing:
+            documents.update(
+                (document.id, document)
+                for document in self.get_documents(missing)
+                if document.id is not None
+            )
+        return [
+            (documents[doc_id], score) for doc_id, score in fused if doc_id in documents
+        ]
+
+    @abstractmethod
+    def get_documents(self, ids: Sequence[str]) -> list[Document]:
+        """
+        Return stored documents by id. Unknown ids are skipped.
+
+        :param ids: Document ids.
+        :return: The documents found.
+        """
+
     @abstractmethod
     def similarity_search(
-        self, query_text, top_k: int = DEFAULT_TOP_K
+        self,
+        query_text,
+        top_k: int = DEFAULT_TOP_K,
+        where: MetadataFilter | None = None,
     ) -> list[SimilarEmbeddingRecord]:
         """
         Perform a similarity search using the top-k method, which selects the
@@ -57,6 +714,8 @@ class VectorStore(ABC):
 
         :param query_text: Unstructured text to search.
         :param top_k: Top K.
+        :param where: Optional metadata filter, see `oracle_server.metadata_index`.
+                      Only documents which satisfy it are scored.
         :return: Top k similar embeddings.
         """
 
@@ -68,6 +727,46 @@ class VectorStore(ABC):
         :param: Documents to add.
         """
 
+    def upsert_documents(self, documents: list[Document]) -> None:
+        """
+        Embed documents and write them, replacing any stored documents with
+        the same ids.
+
+        :param documents: Documents to write. Each must have an id.
+        :raise: ValueError - If a document has no id.
+        """
+        if not documents:
+            return
+        _document_ids(documents)
+        try:
+            vectors = self.model.embed_documents(
+                [document.page_content for document in documents]
+            )
+        except Exception as e:
+            message = "Error while embedding documents"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        self.upsert_embeddings(documents, vectors)
+
+    @abstractmethod
+    def upsert_embeddings(self, documents: list[Document], vectors: Any) -> None:
+        """
+        Write documents with precomputed embeddings, replacing any stored
+        documents with the same ids.
+
+        :param documents: Documents to write. Each must have an id.
+        :param vectors: One embedding per document, from this store's model.
+        :raise: ValueError - If a document has no id.
+        """
+
+    @abstractmethod
+    def delete_documents(self, ids: Sequence[str]) -> None:
+        """
+        Remove documents. Unknown ids are ignored.
+
+        :param ids: Ids of the documents to remove.
+        """
+
 
 class ChromaVectorStore(VectorStore):
     """
@@ -75,16 +774,35 @@ class ChromaVectorStore(VectorStore):
     as its persistence layer.
     """
 
-    def __init__(self, model: str, sqlite_dir: str, collection: str):
+    def __init__(
+        self,
+        model: str,
+        sqlite_dir: str,
+        collection: str,
+        embedding_cache: EmbeddingCache | None = None,
+        hybrid: bool = False,
+    ):  # pylint: disable=too-many-arguments,too-many-positional-arguments
         """
         Constructor.
 
         :param model: Target model.
+        :param sqlite_dir: Chroma persistence directory.
+        :param collection: Chroma collection name.
+        :param embedding_cache: Optional query embedding cache.
+        :param hybrid: Keep a BM25 index next to the collection, for `search`.
         """
-        super().__init__(model)
+        super().__init__(model, embedding_cache=embedding_cache)
         self._chroma_api_client: Chroma = self.__configure_chroma(
             sqlite_dir=sqlite_dir, collection_name=collection
         )
+        # Chroma sees documents written by other processes, e.g. the
+        # ingestion CLI, so their writes must change the version too.
+        self._corpus_version_file = _CorpusVersionFile(
+            Path(sqlite_dir) / f"{collection}.corpus_version"
+        )
+        if hybrid:
+            self._lexical_index = BM25Index(Path(sqlite_dir) / collection)
+            self.__build_lexical_index()
 
     @property
     def db_client(self) -> Chroma:
@@ -99,28 +817,93 @@ class ChromaVectorStore(VectorStore):
         """Add langchain documents to chroma."""
         _LOGGER.info("Adding documents to vector DB")
         try:
-            self._chroma_api_client.add_documents(documents)
+            ids = self._chroma_api_client.add_documents(documents)
+            self._bump_corpus_version()
         except Exception as e:
             message = "Error while adding documents to Chroma"
             _LOGGER.info(message)
             raise VectorDBError(message=message, cause=e) from e
+        if self._lexical_index is not None:
+            self._lexical_index.add(
+                [
+                    document.model_copy(update={"id": doc_id})
+                    for document, doc_id in zip(documents, ids)
+                ]
+            )
+
+    def upsert_embeddings(self, documents: list[Document], vectors: Any) -> None:
+        """Write embedded documents to chroma, replacing those with the same ids."""
+        if not documents:
+            return
+        documents, vectors = _unique_by_id(documents, vectors)
+        _LOGGER.info(f"Upserting {len(documents)} documents to vector DB")
+        try:
+            # Chroma rejects empty metadata, but not missing metadata.
+            metadatas: Any = [document.metadata or None for document in documents]
+            # pylint: disable=protected-access
+            self._chroma_api_client._collection.upsert(
+                ids=_document_ids(documents),
+                embeddings=vectors,
+                metadatas=metadatas,
+                documents=[document.page_content for document in documents],
+            )
+            self._bump_corpus_version()
+        except Exception as e:
+            message = "Error while upserting documents to Chroma"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        if self._lexical_index is not None:
+            self._lexical_index.add(documents)
+
+    def delete_documents(self, ids: Sequence[str]) -> None:
+        """Delete documents from chroma by id."""
+        if not ids:
+            return
+        _LOGGER.info(f"Deleting {len(ids)} documents from vector DB")
+        try:
+            self._chroma_api_client.delete(ids=list(ids))
+            self._bump_corpus_version()
+        except Exception as e:
+            message = "Error while deleting documents from Chroma"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        if self._lexical_index is not None:
+            self._lexical_index.delete(ids)
+
+    def get_documents(self, ids: Sequence[str]) -> list[Document]:
+        """Fetch documents from chroma by id."""
+        if not ids:
+            return []
+        try:
+            return self._chroma_api_client.get_by_ids(list(ids))
+        except Exception as e:
+            message = "Error while fetching documents from Chroma"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
 
     def similarity_search(
-        self, query_text, top_k: int = DEFAULT_TOP_K
+        self,
+        query_text,
+        top_k: int = DEFAULT_TOP_K,
+        where: MetadataFilter | None = None,
     ) -> list[SimilarEmbeddingRecord]:
         """
-        Perform similarity search on Chroma.
+        Perform similarity search on Chroma. A filter is passed to Chroma as
+        a `where` clause; Chroma only accepts numeric range operands.
 
         :param query_text: Query text.
         :param top_k: Top-k.
+        :param where: Optional metadata filter.
         :return: List of langchain `Document` results from Chroma.
         """
         _LOGGER.info(
             f"Running similarity search for query: '{query_text}', (k={top_k})"
         )
         try:
-            results = self._chroma_api_client.similarity_search_with_score(
-                query_text, k=top_k
+            results = self._chroma_api_client.similarity_search_by_vector_with_relevance_scores(
+                self.embed_query(query_text),
+                k=top_k,
+                filter=chroma_where(where) if where else None,
             )
             _LOGGER.info("Successfully searched vector db embeddings for query.")
             _LOGGER.debug(f"results: {len(results)}")
@@ -131,6 +914,61 @@ class ChromaVectorStore(VectorStore):
             _LOGGER.debug(f"Failed query: {query_text}")
             raise VectorDBError(message=message, cause=e) from e
 
+    def similarity_search_batch(
+        self, queries: Sequence[str], top_k: int = DEFAULT_TOP_K
+    ) -> list[BatchSearchResult]:
+        """
+        Perform similarity search on Chroma for several queries at once.
+
+        All queries are embedded in one forward pass and sent to Chroma in a
+        single query. If that fails, the queries are retried one at a time so
+        that one bad query only fails its own result.
+
+        :param queries: Query texts.
+        :param top_k: Top-k.
+        :return: One result per query, in order.
+        """
+        if not queries:
+            return []
+        _LOGGER.info(f"Running batched similarity search for {len(queries)} queries")
+        try:
+            # pylint: disable=protected-access
+            response = self._chroma_api_client._collection.query(
+                query_embeddings=self.embed_queries(queries),  # type: ignore[arg-type]
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"],  # type: ignore[list-item]
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning(
+                f"Batched similarity search failed, searching queries one at a time: {e}"
+            )
+            return super().similarity_search_batch(queries, top_k)
+        return [
+            BatchSearchResult(query=query, records=_chroma_records(response, i))
+            for i, query in enumerate(queries)
+        ]
+
+    def __build_lexical_index(self) -> None:
+        """Index an existing collection which has no lexical index yet."""
+        # pylint: disable=protected-access
+        collection = self._chroma_api_client._collection
+        total = collection.count()
+        if self._lexical_index is None or len(self._lexical_index) or not total:
+            return
+        _LOGGER.info(f"Building BM25 index for {total} documents")
+        for offset in range(0, total, DEFAULT_LEXICAL_BUILD_ROWS):
+            rows = collection.get(
+                limit=DEFAULT_LEXICAL_BUILD_ROWS,
+                offset=offset,
+                include=["documents"],  # type: ignore[list-item]
+            )
+            self._lexical_index.add(
+                [
+                    Document(page_content=text or "", id=doc_id)
+                    for doc_id, text in zip(rows["ids"], rows["documents"] or [])
+                ]
+            )
+
     def __configure_chroma(self, sqlite_dir: str, collection_name: str) -> Chroma:
         """
         Return a newly configured Chroma.
@@ -150,22 +988,630 @@ class ChromaVectorStore(VectorStore):
             raise VectorDBError(message, cause=e) from e
 
 
+class NumpyVectorStore(VectorStore):
+    """
+    In-process, brute-force vector store.
+
+    Embeddings are kept unit-length in a float32 `.npy` file which is
+    memory-mapped rather than read into the heap; document text and metadata
+    live in a JSON lines side file. A query is scored against every document
+    with one matrix-vector product, which for up to a few hundred thousand
+    documents is faster than an ANN index and exact.
+
+    Adds and upserts append to both files and overwrite replaced rows
+    through the memory map, so a write costs in proportion to its batch,
+    not to the collection. Deletes rewrite the files.
+
+    With `quantization`, a compact copy of the embeddings (see
+    `oracle_server.quantization`) is held in memory instead. Queries rank
+    every document on it, and only the best `top_k * rescore_factor`
+    candidates are read from the full vectors on disk and scored exactly.
+
+    Scores are cosine distances, so lower is more similar, as with Chroma.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        data_dir: str,
+        collection: str,
+        embedding_cache: EmbeddingCache | None = None,
+        quantization: str | None = None,
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+        hybrid: bool = False,
+    ):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        Constructor.
+
+        :param model: Target model.
+        :param data_dir: Directory holding the collection's files.
+        :param collection: Collection name.
+        :param embedding_cache: Optional query embedding cache.
+        :param quantization: Compact index to search on: `int8` or `binary`.
+                             Searches scan the full vectors if None.
+        :param rescore_factor: Candidates re-scored per result with a compact index.
+        :param hybrid: Keep a BM25 index next to the collection, for `search`.
+                       Documents added without ids are given random ids.
+        """
+        super().__init__(model, embedding_cache=embedding_cache)
+        directory = Path(data_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = directory / f"{collection}.npy"
+        self._documents_path = directory / f"{collection}.jsonl"
+        self._lock = threading.Lock()
+        self._vectors: np.ndarray | None = None
+        self._documents: list[Document] = []
+        # Position of each document with an id.
+        self._positions: dict[str, int] = {}
+        self._compact: CompactIndex | None = (
+            create_compact_index(quantization, directory / collection)
+            if quantization
+            else None
+        )
+        self._rescore_factor = rescore_factor
+        # The corpus version the metadata index was built at, and the index.
+        self._metadata_index: tuple[int, MetadataIndex] | None = None
+        if hybrid:
+            self._lexical_index = BM25Index(directory / collection)
+        self.__load()
+
+    def __len__(self) -> int:
+        """Return the number of documents."""
+        return len(self._documents)
+
+    @property
+    def index_bytes(self) -> int:
+        """
+        Return the memory a search scans: the compact codes if there are
+        any, else the full vectors.
+
+        :return: Size in bytes.
+        """
+        if self._compact is not None:
+            return self._compact.nbytes
+        return 0 if self._vectors is None else self._vectors.nbytes
+
+    def add_documents(self, documents: list[Document]) -> None:
+        """
+        Embed documents and append them to the collection.
+
+        :param documents: Documents to add.
+        """
+        if not documents:
+            return
+        _LOGGER.info(f"Adding {len(documents)} documents to numpy vector store")
+        if self._lexical_index is not None:
+            documents = [
+                (
+                    document
+                    if document.id is not None
+                    else document.model_copy(update={"id": uuid.uuid4().hex})
+                )
+                for document in documents
+            ]
+        try:
+            new_vectors = self.__embed(documents)
+            with self._lock:
+                self.__append(new_vectors, documents)
+        except Exception as e:
+            message = "Error while adding documents to numpy vector store"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        if self._lexical_index is not None:
+            self._lexical_index.add(documents)
+
+    def upsert_embeddings(self, documents: list[Document], vectors: Any) -> None:
+        """
+        Overwrite the rows of stored documents with the same ids and append
+        the others.
+
+        :param documents: Documents to write. Each must have an id.
+        :param vectors: One embedding per document.
+        :raise: ValueError - If a document has no id.
+        """
+        if not documents:
+            return
+        documents, vectors = _unique_by_id(documents, vectors)
+        _LOGGER.info(f"Upserting {len(documents)} documents to numpy vector store")
+        try:
+            new_vectors = _unit_rows(vectors)
+            with self._lock:
+                replaced = [
+                    (self._positions[doc.id], i)
+                    for i, doc in enumerate(documents)
+                    if doc.id in self._positions
+                ]
+                if replaced:
+                    self.__replace(new_vectors, documents, replaced)
+                else:
+                    self.__append(new_vectors, documents)
+        except Exception as e:
+            message = "Error while upserting documents to numpy vector store"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        if self._lexical_index is not None:
+            self._lexical_index.add(documents)
+
+    def delete_documents(self, ids: Sequence[str]) -> None:
+        """
+        Remove documents and rewrite the collection's files without them.
+
+        :param ids: Ids of the documents to remove.
+        """
+        with self._lock:
+            doomed = {self._positions[i] for i in ids if i in self._positions}
+            if not doomed:
+                return
+            _LOGGER.info(f"Deleting {len(doomed)} documents from numpy vector store")
+            try:
+                kept = [i for i in range(len(self._documents)) if i not in doomed]
+                self.__rewrite(
+                    np.asarray(self._vectors[kept]),  # type: ignore[index]
+                    [self._documents[i] for i in kept],
+                )
+            except Exception as e:
+                message = "Error while deleting documents from numpy vector store"
+                _LOGGER.info(message)
+                raise VectorDBError(message=message, cause=e) from e
+        if self._lexical_index is not None:
+            self._lexical_index.delete(ids)
+
+    def get_documents(self, ids: Sequence[str]) -> list[Document]:
+        """Return stored documents by id."""
+        with self._lock:
+            documents, positions = self._documents, self._positions
+            return [documents[positions[i]] for i in ids if i in positions]
+
+    def __replace(
+        self,
+        new_vectors: np.ndarray,
+        documents: list[Document],
+        replaced: list[tuple[int, int]],
+    ) -> None:
+        """
+        Overwrite the rows at the `(position, index)` pairs of `replaced` and
+        append the other documents. Call with the lock held.
+        """
+        positions = [position for position, _ in replaced]
+        rows = new_vectors[[i for _, i in replaced]]
+        _write_rows(self._vectors_path, positions, rows)
+        if self._compact is not None:
+            self._compact.replace(np.asarray(positions), rows)
+        # The side file is only appended to: a row with a position replaces
+        # the document at that position when the collection is loaded.
+        with self._documents_path.open("a", encoding="utf-8") as side_file:
+            for position, i in replaced:
+                row = _document_row(documents[i], position=position)
+                side_file.write(json.dumps(row) + "\n")
+        for position, i in replaced:
+            self._documents[position] = documents[i]
+        added = sorted(set(range(len(documents))) - {i for _, i in replaced})
+        if added:
+            self.__append(new_vectors[added], [documents[i] for i in added])
+            return
+        if self._compact is not None:
+            self._compact.save()
+        self._bump_corpus_version()
+
+    def __embed(self, documents: list[Document]) -> np.ndarray:
+        """Return the unit-length embeddings of documents."""
+        return _unit_rows(
+            self.model.embed_documents([doc.page_content for doc in documents])
+        )
+
+    def __append(self, new_vectors: np.ndarray, documents: list[Document]) -> None:
+        """
+        Append embedded documents to the collection. Call with the lock held.
+        The stored vectors are neither read nor rewritten.
+        """
+        _append_rows(self._vectors_path, new_vectors)
+        if self._compact is not None:
+            self._compact.add(new_vectors)
+            self._compact.save()
+        with self._documents_path.open("a", encoding="utf-8") as side_file:
+            for document in documents:
+                side_file.write(json.dumps(_document_row(document)) + "\n")
+        self._vectors = np.load(self._vectors_path, mmap_mode="r")
+        for document in documents:
+            if document.id is not None:
+                self._positions[document.id] = len(self._documents)
+            self._documents.append(document)
+        self._bump_corpus_version()
+
+    def __rewrite(self, vectors: np.ndarray, documents: list[Document]) -> None:
+        """
+        Replace the collection with the given vectors and documents. Call
+        with the lock held. Searches already running keep their snapshot.
+        """
+        _save_array(self._vectors_path, vectors)
+        tmp_path = self._documents_path.with_suffix(".tmp.jsonl")
+        with tmp_path.open("w", encoding="utf-8") as side_file:
+            for document in documents:
+                side_file.write(json.dumps(_document_row(document)) + "\n")
+        os.replace(tmp_path, self._documents_path)
+        if self._compact is not None:
+            self._compact = self.__build_compact(vectors, self._compact.name)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r")
+        self._documents = documents
+        self._positions = _positions(documents)
+        self._bump_corpus_version()
+
+    def similarity_search(
+        self,
+        query_text,
+        top_k: int = DEFAULT_TOP_K,
+        where: MetadataFilter | None = None,
+    ) -> list[SimilarEmbeddingRecord]:
+        """
+        Score every document against the query and return the top k.
+
+        With a filter, the metadata index selects the documents which
+        satisfy it and only those are scored, exactly.
+
+        :param query_text: Query text.
+        :param top_k: Top-k.
+        :param where: Optional metadata filter.
+        :return: The top k documents and their cosine distances.
+        """
+        _LOGGER.info(
+            f"Running similarity search for query: '{query_text}', (k={top_k})"
+        )
+        query_vectors = np.asarray([self.embed_query(query_text)])
+        if where:
+            return self.__filtered_search(query_vectors[0], top_k, where)
+        return self.__search(query_vectors, top_k)[0]
+
+    def similarity_search_batch(
+        self, queries: Sequence[str], top_k: int = DEFAULT_TOP_K
+    ) -> list[BatchSearchResult]:
+        """
+        Score every document against all queries with one matrix product.
+
+        :param queries: Query texts.
+        :param top_k: Top-k.
+        :return: One result per query, in order.
+        """
+        if not queries:
+            return []
+        query_vectors = np.asarray(self.embed_queries(queries))
+        return [
+            BatchSearchResult(query=query, records=records)
+            for query, records in zip(queries, self.__search(query_vectors, top_k))
+        ]
+
+    def __search(
+        self, query_vectors: np.ndarray, top_k: int
+    ) -> list[list[SimilarEmbeddingRecord]]:
+        """Return the top k documents of each query."""
+        with self._lock:
+            vectors, documents, compact = self._vectors, self._documents, self._compact
+        if vectors is None or not documents or top_k <= 0:
+            return [[] for _ in query_vectors]
+        k = min(top_k, len(documents))
+        try:
+            query_vectors = _unit_rows(query_vectors)
+            if compact is not None:
+                return [
+                    self.__rescored(compact, vectors, documents, query, k)
+                    for query in query_vectors
+                ]
+            similarities = query_vectors @ vectors.T
+        except Exception as e:
+            message = "failed to score query against numpy vector store"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        return [
+            _top_records(documents, np.arange(len(row)), row, k) for row in similarities
+        ]
+
+    def __filtered_search(
+        self, query: np.ndarray, top_k: int, where: MetadataFilter
+    ) -> list[SimilarEmbeddingRecord]:
+        """Score the documents which satisfy a filter and return the top k."""
+        with self._lock:
+            vectors, documents = self._vectors, self._documents
+            metadata_index = self.__metadata_index()
+        if vectors is None or top_k <= 0:
+            return []
+        try:
+            positions = metadata_index.select(where)
+        except ValueError as e:
+            raise VectorDBError(message=f"Invalid filter: {where}", cause=e) from e
+        positions = positions[positions < len(vectors)]
+        if not len(positions):  # pylint: disable=use-implicit-booleaness-not-len
+            return []
+        try:
+            similarities = vectors[positions] @ _unit_rows([query])[0]
+        except Exception as e:
+            message = "failed to score query against numpy vector store"
+            _LOGGER.info(message)
+            raise VectorDBError(message=message, cause=e) from e
+        return _top_records(documents, positions, similarities, top_k)
+
+    def __metadata_index(self) -> MetadataIndex:
+        """
+        Return the metadata index of the current documents, building it if
+        they changed since it was last built. Call with the lock held.
+        """
+        if (
+            self._metadata_index is None
+            or self._metadata_index[0] != self._corpus_version
+        ):
+            self._metadata_index = (
+                self._corpus_version,
+                MetadataIndex(self._documents),
+            )
+        return self._metadata_index[1]
+
+    def __rescored(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        compact: CompactIndex,
+        vectors: np.ndarray,
+        documents: list[Document],
+        query: np.ndarray,
+        k: int,
+    ) -> list[
+        SimilarEmbeddingRecord
+    ]:  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """Pick candidates on the compact index, then score them exactly."""
+        candidates = np.sort(compact.candidates(query, k * self._rescore_factor))
+        # Documents added since the search started are not in its snapshot.
+        candidates = candidates[candidates < len(vectors)]
+        return _top_records(documents, candidates, vectors[candidates] @ query, k)
+
+    def __load(self) -> None:
+        """Open the collection's files, if they exist."""
+        if not self._vectors_path.exists():
+            return
+        try:
+            self._vectors = np.load(self._vectors_path, mmap_mode="r")
+            with self._documents_path.open(encoding="utf-8") as side_file:
+                for row in map(json.loads, side_file):
+                    document = Document(
+                        page_content=row["text"],
+                        metadata=row["metadata"],
+                        id=row["id"],
+                    )
+                    if "position" in row:
+                        self._documents[row["position"]] = document
+                    else:
+                        self._documents.append(document)
+        except Exception as e:
+            message = f"Failed to load numpy vector store from {self._vectors_path}"
+            _LOGGER.exception(message)
+            raise VectorDBError(message=message, cause=e) from e
+        if len(self._documents) != len(self._vectors):
+            message = (
+                f"Numpy vector store is corrupt: {len(self._vectors)} vectors "
+                f"but {len(self._documents)} documents"
+            )
+            raise VectorDBError(message=message)
+        self._positions = _positions(self._documents)
+        if self._compact is not None and (
+            not self._compact.load() or len(self._compact) != len(self._vectors)
+        ):
+            self._compact = self.__build_compact(self._vectors, self._compact.name)
+        if self._lexical_index is not None and len(self._lexical_index) == 0:
+            _LOGGER.info(f"Building BM25 index for {self._vectors_path}")
+            self._lexical_index.add(
+                [document for document in self._documents if document.id is not None]
+            )
+        _LOGGER.info(
+            f"Loaded {len(self._documents)} documents from {self._vectors_path}"
+        )
+
+    def __build_compact(self, vectors: np.ndarray, name: str) -> CompactIndex:
+        """Build and save a compact index of all vectors."""
+        _LOGGER.info(f"Building {name} index for {self._vectors_path}")
+        compact = create_compact_index(name, self._vectors_path.with_suffix(""))
+        for start in range(0, len(vectors), DEFAULT_COMPACT_BUILD_ROWS):
+            compact.add(vectors[start : start + DEFAULT_COMPACT_BUILD_ROWS])
+        compact.save()
+        return compact
+
+
+def _top_records(
+    documents: list[Document], positions: np.ndarray, similarities: np.ndarray, k: int
+) -> list[SimilarEmbeddingRecord]:
+    """Return the k most similar of the scored documents, best first."""
+    k = min(k, len(positions))
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top])]
+    return [(documents[positions[i]], float(1 - similarities[i])) for i in top]
+
+
+def _unit_rows(vectors: Any) -> np.ndarray:
+    """Return vectors as float32 rows scaled to unit length."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _save_array(path: Path, array_: np.ndarray) -> None:
+    """Write an array to a `.npy` file, replacing it atomically."""
+    tmp_path = path.with_suffix(".tmp.npy")
+    np.save(tmp_path, array_)
+    os.replace(tmp_path, path)
+
+
+def _append_rows(path: Path, rows: np.ndarray) -> None:
+    """
+    Append rows to a 2-d `.npy` file in place, creating it if needed.
+
+    The rows are written at the end of the file, then the row count in the
+    header is updated; NumPy pads headers so the count can grow without
+    moving the data. Should the write be interrupted, the file still holds
+    its previous rows.
+
+    :raise: ValueError - If the rows do not match the file's dtype and width.
+    """
+    if not path.exists():
+        _save_array(path, rows)
+        return
+    with path.open("r+b") as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        if version == (1, 0):
+            read_header, write_header = (
+                np.lib.format.read_array_header_1_0,
+                np.lib.format.write_array_header_1_0,
+            )
+        else:
+            read_header, write_header = (
+                np.lib.format.read_array_header_2_0,
+                np.lib.format.write_array_header_2_0,
+            )
+        shape, fortran_order, dtype = read_header(npy_file)
+        data_offset = npy_file.tell()
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            raise ValueError(
+                f"Cannot append {rows.dtype} rows of shape {rows.shape[1:]} "
+                f"to {path}, which holds {dtype} rows of shape {shape[1:]}"
+            )
+        header = io.BytesIO()
+        write_header(
+            header,
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (shape[0] + len(rows), *shape[1:]),
+            },
+        )
+        if header.tell() != data_offset:
+            raise ValueError(f"The header of {path} has no room for more rows")
+        # Drops anything past the rows, left by an interrupted append.
+        npy_file.seek(data_offset + shape[0] * rows[0].nbytes)
+        npy_file.write(np.ascontiguousarray(rows).tobytes())
+        npy_file.truncate()
+        npy_file.flush()
+        npy_file.seek(0)
+        npy_file.write(header.getvalue())
+
+
+def _write_rows(path: Path, positions: Sequence[int], rows: np.ndarray) -> None:
+    """Overwrite rows of a `.npy` file in place, through a memory map."""
+    stored = np.load(path, mmap_mode="r+")
+    stored[positions] = rows
+    stored.flush()
+
+
+def _positions(documents: list[Document]) -> dict[str, int]:
+    """Return the position of each document with an id."""
+    return {doc.id: i for i, doc in enumerate(documents) if doc.id is not None}
+
+
+def _unique_by_id(
+    documents: list[Document], vectors: Any
+) -> tuple[list[Document], np.ndarray]:
+    """
+    Return documents to upsert and their embeddings, keeping the last of
+    several documents with one id.
+
+    :raise: ValueError - If a document has no id.
+    """
+    last = {document_id: i for i, document_id in enumerate(_document_ids(documents))}
+    positions = sorted(last.values())
+    return [documents[i] for i in positions], np.asarray(vectors, dtype=np.float32)[
+        positions
+    ]
+
+
+def _document_ids(documents: list[Document]) -> list[str]:
+    """
+    Return the ids of documents to upsert.
+
+    :raise: ValueError - If a document has no id.
+    """
+    ids = [document.id for document in documents]
+    if None in ids:
+        raise ValueError("Documents to upsert must have ids")
+    return ids  # type: ignore[return-value]
+
+
+def _filter_key(where: MetadataFilter | None) -> str | None:
+    """Return a hashable form of a metadata filter."""
+    return json.dumps(where, sort_keys=True, default=str) if where else None
+
+
+def _document_row(document: Document, position: int | None = None) -> dict[str, Any]:
+    """
+    Return a document as a side file row, with the position of the document
+    it replaces, if any.
+    """
+    row: dict[str, Any] = {
+        "id": document.id,
+        "text": document.page_content,
+        "metadata": document.metadata,
+    }
+    if position is not None:
+        row["position"] = position
+    return row
+
+
+# Builds a vector store for an embedding model.
+VectorStoreFactory = Callable[[str], VectorStore]
+
+
+def create_vector_store(
+    cfg: Mapping[str, Any], model: str, collection: str = DEFAULT_VECTOR_COLLECTION
+) -> VectorStore:
+    """
+    Return a vector store for the configured backend.
+
+    :param cfg: App config. Reads `VECTOR_STORE_BACKEND`, `CHROMA_SQLITE_DIR`,
+                `NUMPY_VECTOR_DIR`, `NUMPY_QUANTIZATION`, `NUMPY_RESCORE_FACTOR`
+                and `HYBRID_RETRIEVAL`.
+    :param model: Embedding model name.
+    :param collection: Collection name.
+    :return: The vector store.
+    """
+    backend = cfg.get("VECTOR_STORE_BACKEND", DEFAULT_VECTOR_STORE_BACKEND)
+    hybrid = cfg.get("HYBRID_RETRIEVAL", False)
+    match backend:
+        case "chroma":
+            return ChromaVectorStore(
+                model=model,
+                sqlite_dir=cfg.get("CHROMA_SQLITE_DIR", DEFAULT_SQLITE_DIR),
+                collection=collection,
+                hybrid=hybrid,
+            )
+        case "numpy":
+            return NumpyVectorStore(
+                model=model,
+                data_dir=cfg.get("NUMPY_VECTOR_DIR", DEFAULT_NUMPY_VECTOR_DIR),
+                collection=collection,
+                quantization=cfg.get("NUMPY_QUANTIZATION") or None,
+                rescore_factor=cfg.get("NUMPY_RESCORE_FACTOR", DEFAULT_RESCORE_FACTOR),
+                hybrid=hybrid,
+            )
+        case _:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def _chroma_records(response: Any, index: int) -> list[SimilarEmbeddingRecord]:
+    """Return the records of one query of a Chroma query response."""
+    return [
+        (
+            Document(page_content=text, metadata=metadata or {}, id=doc_id),
+            distance,
+        )
+        for text, metadata, doc_id, distance in zip(
+            response["documents"][index],
+            response["metadatas"][index],
+            response["ids"][index],
+            response["distances"][index],
+        )
+    ]
+
+
 def embeddings(model: str, device: str = "cpu") -> HuggingFaceEmbeddings:
     """
     Return an instantiated model.
 
-    :param model: Model name.
+    :param model: Name of a registered embedding backend, see
+                  `oracle_server.embedding_backends`.
     :param device: (Optional) Target device type.
     :return: Instantiated `HuggingFaceEmbeddings` object with given model.
+    :raise: ValueError - If no backend has the name.
     """
-    match model:
-        case "BAAI/bge-small-en-v1.5":
-            _LOGGER.info(f"Instantiating HuggingFaceEmbeddings with model {model}")
-            embedding_model = HuggingFaceEmbeddings(
-                model_name=model,
-                model_kwargs={"device": device},
-                encode_kwargs={"normalize_embeddings": True},
-            )
-            return embedding_model
-        case _:
-            raise ValueError(f"Unknown model: {model}")
+    return get_embedding_backend(model).load(device=device)
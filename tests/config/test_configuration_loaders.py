@@ -1,6 +1,6 @@
 import pytest
 
-from oracle_server.config.configuration_loaders import to_bool, to_int
+from oracle_server.config.configuration_loaders import to_bool, to_float, to_int, to_list
 
 
 @pytest.mark.parametrize(
@@ -39,3 +39,32 @@ def test_to_int(input_val, expected):
 def test_to_int_invalid():
     with pytest.raises(ValueError) as e:
         to_int("1.5")
+
+
+@pytest.mark.parametrize(
+    "input_val, expected",
+    [
+        ("0.95", 0.95),
+        ("1", 1.0),
+        (2, 2.0)
+    ]
+)
+def test_to_float(input_val, expected):
+    assert to_float(input_val) == expected
+
+def test_to_float_invalid():
+    with pytest.raises(ValueError) as e:
+        to_float("high")
+
+
+@pytest.mark.parametrize(
+    "input_val, expected",
+    [
+        ("http://a/v1", ["http://a/v1"]),
+        ("http://a/v1, http://b/v1,", ["http://a/v1", "http://b/v1"]),
+        ("", []),
+        (["x"], ["x"])
+    ]
+)
+def test_to_list(input_val, expected):
+    assert to_list(input_val) == expected
@@ -24,7 +24,9 @@ def mock_env_vars():
         'SQLALCHEMY_DB_ENGINE': 'sqlite',
         'SQLALCHEMY_DATABASE_NAME': 'babylon',
         'MONGO_DATA_LAKE_NAME': 'mock-babylon-datalake',
-        'EMBEDDINGS_COLLECTION_CHROMA': 'mock-babylon-embeddings'
+        'EMBEDDINGS_COLLECTION_CHROMA': 'mock-babylon-embeddings',
+        'CHECKPOINT_BACKEND': 'memory',
+        'WARM_UP_HANDLERS': 'false'
     }
     with patch.dict(os.environ, mock_vars):
         yield
@@ -1,10 +1,36 @@
-import uuid
-from unittest.mock import patch, MagicMock
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from oracle_server.admission import (
+    AdmissionSettings,
+    admission_controller,
+    configure_admission,
+)
+from oracle_server.controllers.chat import chat_request_stats
+from oracle_server.handlers.registry import REGISTRY_EXTENSION_KEY
 
 BASE_URI = '/api'
 
 
-def test_chat(app_client):
+async def _async_iter(items):
+    for item in items:
+        yield item
+
+
+@pytest.fixture
+def handler_registry(flask_app):
+    registry = flask_app.app.extensions[REGISTRY_EXTENSION_KEY]
+    registry.clear()
+    yield registry
+    registry.clear()
+
+
+def test_chat(app_client, handler_registry):
     uri = f'{BASE_URI}/message'
     body = {
         'user_input': 'hello'
@@ -15,13 +41,140 @@ def test_chat(app_client):
         {"messages": [MagicMock(content="I am a dumb server")]}
     ]
 
-    with patch('oracle_server.controllers.chat.BabylonChatHandler') as mock_handler:
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
         # Configure the instance's method to return the mock response
-        mock_handler.return_value.handle_input_message.return_value = mock_chat_response
-        mock_handler.return_value.thread_id = uuid.uuid4().hex
+        mock_handler.return_value.ahandle_input_message.return_value = _async_iter(mock_chat_response)
 
         resp = app_client.post(uri, json=body)
 
         assert resp.status_code == 200
         json_data = resp.json()
         assert json_data is not None
+        assert json_data['thread_id']
+
+
+def test_chat_reuses_handler_and_thread(app_client, handler_registry):
+    uri = f'{BASE_URI}/message'
+
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
+        mock_handler.return_value.ahandle_input_message.side_effect = lambda **kwargs: _async_iter([])
+
+        app_client.post(uri, json={'user_input': 'hello', 'thread_id': 'abc'})
+        resp = app_client.post(uri, json={'user_input': 'again', 'thread_id': 'abc'})
+
+        assert resp.status_code == 200
+        assert resp.json()['thread_id'] == 'abc'
+        # The handler is built once and shared between requests.
+        mock_handler.assert_called_once()
+        _, kwargs = mock_handler.return_value.ahandle_input_message.call_args
+        assert kwargs['thread_id'] == 'abc'
+
+
+def test_chat_coalesces_identical_stateless_requests(app_client, handler_registry):
+    uri = f'{BASE_URI}/message'
+    release = threading.Event()
+
+    async def slow_answer(**kwargs):
+        await asyncio.to_thread(release.wait, 5)
+        yield {"messages": [AIMessage(content="shared answer")]}
+
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
+        mock_handler.return_value.ahandle_input_message.side_effect = slow_answer
+        mock_handler.return_value.acopy_thread = AsyncMock()
+        calls = chat_request_stats()['calls']
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(app_client.post, uri, json={'user_input': text})
+                for text in ('How much did I spend?', 'how much did I  spend?')
+            ]
+            while chat_request_stats()['calls'] < calls + 2:
+                threading.Event().wait(0.01)
+            release.set()
+            first, second = [future.result(timeout=5).json() for future in futures]
+
+        assert first['text'] == second['text'] == 'shared answer'
+        mock_handler.return_value.ahandle_input_message.assert_called_once()
+        # Each client continues in its own thread, seeded with the shared turn.
+        assert first['thread_id'] != second['thread_id']
+        _, kwargs = mock_handler.return_value.ahandle_input_message.call_args
+        mock_handler.return_value.acopy_thread.assert_awaited_once_with(
+            kwargs['thread_id'],
+            ({first['thread_id'], second['thread_id']} - {kwargs['thread_id']}).pop(),
+        )
+
+
+def test_chat_unknown_handler(app_client, handler_registry):
+    resp = app_client.post(f'{BASE_URI}/message?handler=nope', json={'user_input': 'hello'})
+
+    assert resp.status_code == 400
+
+
+def test_chat_stream(app_client, handler_registry):
+    uri = f'{BASE_URI}/message/stream'
+
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
+        mock_handler.return_value.astream_input_message.return_value = _async_iter(["I am ", "a dumb server"])
+
+        resp = app_client.post(uri, json={'user_input': 'hello', 'thread_id': 'abc'})
+
+        assert resp.status_code == 200
+        assert resp.headers['content-type'].startswith('text/event-stream')
+        events = [e for e in resp.text.split('\n\n') if e]
+        assert events == [
+            'event: token\ndata: {"text": "I am "}',
+            'event: token\ndata: {"text": "a dumb server"}',
+            'event: done\ndata: {"thread_id": "abc"}',
+        ]
+
+
+def test_chat_stream_error_event(app_client, handler_registry):
+    uri = f'{BASE_URI}/message/stream'
+
+    async def failing_stream():
+        yield "partial"
+        raise RuntimeError("model went away")
+
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
+        mock_handler.return_value.astream_input_message.return_value = failing_stream()
+
+        resp = app_client.post(uri, json={'user_input': 'hello'})
+
+        events = [e for e in resp.text.split('\n\n') if e]
+        assert events[0] == 'event: token\ndata: {"text": "partial"}'
+        assert events[-1].startswith('event: error')
+
+
+@pytest.fixture
+def busy_backend():
+    """A backend which is serving its only request and can queue no more."""
+    configure_admission(AdmissionSettings(max_concurrent=1, max_queue=0))
+    admission_controller('http://busy').admit()
+    yield 'http://busy'
+    configure_admission(AdmissionSettings())
+
+
+@pytest.mark.parametrize('path', ['/message', '/message/stream'])
+def test_chat_overloaded(app_client, handler_registry, busy_backend, path):
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
+        mock_handler.return_value.backend = busy_backend
+
+        resp = app_client.post(f'{BASE_URI}{path}', json={'user_input': 'hello'})
+
+        assert resp.status_code == 429
+        assert int(resp.headers['retry-after']) >= 1
+        mock_handler.return_value.ahandle_input_message.assert_not_called()
+        mock_handler.return_value.astream_input_message.assert_not_called()
+
+
+def test_metrics_report_admission(app_client, handler_registry):
+    with patch('oracle_server.handlers.registry.BabylonChatHandler') as mock_handler:
+        mock_handler.return_value.backend = 'http://model'
+        mock_handler.return_value.ahandle_input_message.side_effect = lambda **kwargs: _async_iter([])
+        app_client.post(f'{BASE_URI}/message', json={'user_input': 'hello'})
+
+    metrics = app_client.get('/metrics').json()
+
+    backend = metrics['admission']['http://model']
+    assert (backend['active'], backend['queued'], backend['admitted']) == (0, 0, 1)
+    assert 'utilization' in metrics['http_pool']
+    assert 'hits' in metrics['embedding_cache']
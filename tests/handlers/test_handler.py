@@ -1,7 +1,18 @@
+import asyncio
+import threading
+import time
 import unittest
 from unittest.mock import patch, Mock
 
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
 from oracle_server.handlers.handler import BabylonChatHandler
+from oracle_server.http_client import shared_http_pool
+from oracle_server.semantic_cache import SemanticCache
 
 
 class TestBabylonChatHandler(unittest.TestCase):
@@ -45,3 +56,312 @@ class TestBabylonChatHandler(unittest.TestCase):
         self.assertEqual(len(input_messages), 1)
         self.assertEqual(input_messages[0].content, message)
         self.assertEqual(kwargs.get("stream_mode"), "values")
+
+    def test_chatbot_uses_shared_http_pool(self):
+        _, kwargs = self.mock_chat_openai.call_args
+
+        self.assertIs(kwargs["http_client"], shared_http_pool().client)
+        self.assertIs(kwargs["http_async_client"], shared_http_pool().async_client)
+
+    def test_stream_input_message(self):
+        # Arrange
+        model_metadata = {"langgraph_node": "model"}
+        self.mock_app.stream.return_value = [
+            (HumanMessage(content="Hello"), {"langgraph_node": "__start__"}),
+            (AIMessageChunk(content="Hi"), model_metadata),
+            (AIMessageChunk(content=""), model_metadata),
+            (AIMessageChunk(content=" there"), model_metadata),
+        ]
+
+        # Act
+        tokens = list(self.handler.stream_input_message("Hello", thread_id="t1"))
+
+        # Assert
+        self.assertEqual(tokens, ["Hi", " there"])
+        args, kwargs = self.mock_app.stream.call_args
+        self.assertEqual(args[1], {"configurable": {"thread_id": "t1"}})
+        self.assertEqual(kwargs.get("stream_mode"), "messages")
+
+
+class SlowChatModel(BaseChatModel):
+    """Fake LLM backend which takes `delay` seconds to answer."""
+
+    delay: float = 0.1
+    prompts: list = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages)
+        time.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="done"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages)
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="done"))])
+
+
+class TestAsyncChatHandler(unittest.TestCase):
+
+    CONCURRENT_CHATS = 10
+
+    @patch('oracle_server.handlers.handler.ChromaVectorStore')
+    @patch('oracle_server.handlers.handler.ChatOpenAI')
+    def setUp(self, mock_chat_openai, mock_vector_store):
+        self.model = SlowChatModel(delay=0.1)
+        mock_chat_openai.return_value = self.model
+        self.vector_store = mock_vector_store.return_value
+        self.vector_store.search.return_value = []
+        self.handler = BabylonChatHandler(
+            embedding_model="test_embedding_model",
+            llm_model="test_llm_model",
+            model_url="http://test.url",
+            hyper_parameters={"retrieval_budget_ms": 50},
+        )
+
+    async def _chat(self, thread_id):
+        events = [e async for e in self.handler.ahandle_input_message("hi", thread_id=thread_id)]
+        return events[-1]["messages"][-1].content
+
+    async def _chat_concurrently(self):
+        return await asyncio.gather(
+            *(self._chat(f"t{i}") for i in range(self.CONCURRENT_CHATS))
+        )
+
+    def test_ahandle_input_message_keeps_history(self):
+        async def two_turns():
+            await self._chat("t1")
+            events = [e async for e in self.handler.ahandle_input_message("again", thread_id="t1")]
+            return events[-1]["messages"]
+
+        messages = asyncio.run(two_turns())
+
+        self.assertEqual(len(messages), 4)
+
+    def test_copied_thread_continues_independently(self):
+        async def copy_and_continue():
+            await self._chat("t1")
+            await self.handler.acopy_thread("t1", "t2")
+            copy = [e async for e in self.handler.ahandle_input_message("again", thread_id="t2")]
+            source = [e async for e in self.handler.ahandle_input_message("other", thread_id="t1")]
+            return copy[-1]["messages"], source[-1]["messages"]
+
+        copy, source = asyncio.run(copy_and_continue())
+
+        self.assertEqual([m.content for m in copy], ["hi", "done", "again", "done"])
+        self.assertEqual([m.content for m in source], ["hi", "done", "other", "done"])
+
+    def test_astream_input_message(self):
+        async def collect():
+            return [t async for t in self.handler.astream_input_message("hi", thread_id="t1")]
+
+        self.assertEqual(asyncio.run(collect()), ["done"])
+
+    def test_concurrent_chats_overlap(self):
+        start = time.perf_counter()
+        for i in range(self.CONCURRENT_CHATS):
+            list(self.handler.handle_input_message("hi", thread_id=f"s{i}"))
+        sync_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = asyncio.run(self._chat_concurrently())
+        async_elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, ["done"] * self.CONCURRENT_CHATS)
+        # Serial calls pay the backend latency once per chat, concurrent
+        # async chats pay it roughly once in total.
+        self.assertGreaterEqual(sync_elapsed, self.model.delay * self.CONCURRENT_CHATS)
+        self.assertLess(async_elapsed * 3, sync_elapsed)
+
+    def test_retrieved_context_is_injected(self):
+        self.vector_store.search.return_value = [
+            (Document(page_content="Groceries: $120"), 0.1)
+        ]
+
+        events = list(self.handler.handle_input_message("what did I spend?", thread_id="t1"))
+
+        self.vector_store.search.assert_called_once_with("what did I spend?", 5)
+        prompt = self.model.prompts[-1]
+        self.assertIsInstance(prompt[0], SystemMessage)
+        self.assertIn("Groceries: $120", prompt[0].content)
+        self.assertEqual(prompt[1].content, "what did I spend?")
+        # The context is only part of the prompt, not the stored conversation.
+        self.assertEqual(len(events[-1]["messages"]), 2)
+        self.assertEqual(set(events[-1]["timings"]), {"retrieve", "model"})
+
+    def test_slow_retrieval_falls_back_to_no_context(self):
+        def slow_search(query, top_k):
+            time.sleep(0.5)
+            return [(Document(page_content="too late"), 0.1)]
+
+        self.vector_store.search.side_effect = slow_search
+
+        for events in (
+            list(self.handler.handle_input_message("hi", thread_id="t1")),
+            asyncio.run(self._collect("hi", "t2")),
+        ):
+            state = events[-1]
+            self.assertEqual(state["context"], [])
+            self.assertLess(state["timings"]["retrieve"], 0.4)
+            self.assertEqual(state["messages"][-1].content, "done")
+        self.assertNotIsInstance(self.model.prompts[-1][0], SystemMessage)
+
+    async def _collect(self, message, thread_id):
+        return [e async for e in self.handler.ahandle_input_message(message, thread_id=thread_id)]
+
+
+class TestConversationMemory(unittest.TestCase):
+
+    @patch('oracle_server.handlers.handler.ChromaVectorStore')
+    @patch('oracle_server.handlers.handler.ChatOpenAI')
+    def setUp(self, mock_chat_openai, mock_vector_store):
+        self.model = SlowChatModel(delay=0)
+        mock_chat_openai.return_value = self.model
+        mock_vector_store.return_value.search.return_value = []
+        self.handler = BabylonChatHandler(
+            embedding_model="test_embedding_model",
+            llm_model="test_llm_model",
+            model_url="http://test.url",
+            hyper_parameters={"memory_turns": 1, "memory_token_budget": 10},
+        )
+
+    def _turn(self, message):
+        state = list(self.handler.handle_input_message(message, thread_id="t1"))[-1]
+        self.handler.memory.wait("t1")
+        return state
+
+    def test_long_thread_prompt_is_summary_and_recent_turns(self):
+        self._turn("how much did I spend on rent in May?")
+        self._turn("and in June?")
+        state = self._turn("what about groceries in July?")
+
+        # Each turn's prompt, without the summaries written in between.
+        prompt = self.model.prompts[-2]
+        self.assertIsInstance(prompt[0], SystemMessage)
+        self.assertIn("done", prompt[0].content)
+        self.assertEqual(
+            [m.content for m in prompt[1:]], ["what about groceries in July?"]
+        )
+        self.assertEqual((state["summary"], state["summarized"]), ("done", 2))
+        # The conversation itself is kept whole.
+        self.assertEqual(len(state["messages"]), 6)
+
+    def test_short_thread_is_not_summarized(self):
+        self.handler.memory._token_budget = 1000
+
+        self._turn("hi")
+        state = self._turn("hello again")
+
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertEqual(len(self.model.prompts[-1]), 3)
+        self.assertNotIn("summary", state)
+
+
+# Fake question embeddings: the first two questions are near-duplicates.
+QUESTION_EMBEDDINGS = {
+    "how much did I spend on rent?": [1.0, 0.0, 0.0],
+    "what did I pay for rent?": [0.99, 0.1, 0.0],
+    "what about groceries?": [0.0, 1.0, 0.0],
+}
+
+
+class TestSemanticCacheHandler(unittest.TestCase):
+
+    @patch('oracle_server.handlers.handler.ChromaVectorStore')
+    @patch('oracle_server.handlers.handler.ChatOpenAI')
+    def setUp(self, mock_chat_openai, mock_vector_store):
+        self.model = SlowChatModel(delay=0)
+        mock_chat_openai.return_value = self.model
+        self.vector_store = mock_vector_store.return_value
+        self.vector_store.search.return_value = []
+        self.vector_store.embed_query.side_effect = QUESTION_EMBEDDINGS.get
+        self.vector_store.corpus_version = 0
+        self.cache = SemanticCache(threshold=0.95)
+        self.handler = BabylonChatHandler(
+            embedding_model="test_embedding_model",
+            llm_model="test_llm_model",
+            model_url="http://test.url",
+            semantic_cache=self.cache,
+        )
+
+    def _answer(self, message, thread_id, **kwargs):
+        events = list(self.handler.handle_input_message(message, thread_id=thread_id, **kwargs))
+        return events[-1]
+
+    def test_near_duplicate_question_skips_model(self):
+        self._answer("how much did I spend on rent?", "t1")
+        state = self._answer("what did I pay for rent?", "t2")
+
+        self.assertTrue(state["cached"])
+        self.assertEqual(state["messages"][-1].content, "done")
+        self.assertEqual(len(self.model.prompts), 1)
+        self.vector_store.search.assert_called_once()
+
+    def test_different_question_calls_model(self):
+        self._answer("how much did I spend on rent?", "t1")
+        state = self._answer("what about groceries?", "t2")
+
+        self.assertFalse(state["cached"])
+        self.assertEqual(len(self.model.prompts), 2)
+
+    def test_follow_up_questions_are_not_cached(self):
+        self._answer("what about groceries?", "t1")
+        self._answer("how much did I spend on rent?", "t1")
+        state = self._answer("what did I pay for rent?", "t2")
+
+        self.assertFalse(state["cached"])
+        self.assertEqual(len(self.model.prompts), 3)
+
+    def test_corpus_change_invalidates_answers(self):
+        self._answer("how much did I spend on rent?", "t1")
+        self.vector_store.corpus_version = 1
+        state = self._answer("what did I pay for rent?", "t2")
+
+        self.assertFalse(state["cached"])
+        self.assertEqual(len(self.model.prompts), 2)
+
+    def test_thread_opt_out(self):
+        self._answer("how much did I spend on rent?", "t1")
+        state = self._answer("what did I pay for rent?", "t2", use_semantic_cache=False)
+
+        self.assertFalse(state["cached"])
+        self.assertFalse(state["use_semantic_cache"])
+        self.assertEqual(len(self.model.prompts), 2)
+
+    def test_async_turn_embeds_off_the_event_loop(self):
+        threads = []
+
+        def embed_query(text):
+            threads.append(threading.current_thread())
+            return QUESTION_EMBEDDINGS[text]
+
+        self.vector_store.embed_query.side_effect = embed_query
+
+        async def chat():
+            return [
+                e async for e in self.handler.ahandle_input_message(
+                    "how much did I spend on rent?", thread_id="t1"
+                )
+            ]
+
+        asyncio.run(chat())
+
+        # The cache lookup and the store of the answer both embed the question.
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_cached_answer_is_streamed(self):
+        self._answer("how much did I spend on rent?", "t1")
+
+        async def collect():
+            return [
+                t async for t in self.handler.astream_input_message(
+                    "what did I pay for rent?", thread_id="t2"
+                )
+            ]
+
+        self.assertEqual(asyncio.run(collect()), ["done"])
+        self.assertEqual(len(self.model.prompts), 1)
@@ -0,0 +1,68 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from oracle_server.error import UnknownHandlerError
+from oracle_server.handlers.registry import DEFAULT_HANDLER_NAME, HandlerRegistry
+
+
+def test_get_builds_handler_once():
+    factory = Mock(return_value=Mock())
+    registry = HandlerRegistry(config={}, factories={"babylon": factory})
+
+    first = registry.get("babylon")
+    second = registry.get(None)
+
+    assert first is second
+    factory.assert_called_once_with({})
+
+
+def test_get_concurrent_first_use_builds_once():
+    calls = []
+
+    def slow_factory(cfg):
+        calls.append(cfg)
+        time.sleep(0.05)
+        return Mock()
+
+    registry = HandlerRegistry(config={}, factories={DEFAULT_HANDLER_NAME: slow_factory})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_get_unknown_handler():
+    registry = HandlerRegistry(config={}, factories={})
+
+    with pytest.raises(UnknownHandlerError):
+        registry.get("unknown")
+
+
+def test_clear_rebuilds():
+    factory = Mock(side_effect=lambda cfg: Mock())
+    registry = HandlerRegistry(config={}, factories={"babylon": factory})
+
+    first = registry.get("babylon")
+    registry.clear()
+
+    assert registry.get("babylon") is not first
+    assert factory.call_count == 2
+
+
+def test_warm_up_builds_and_warms_handlers():
+    factory = Mock(return_value=Mock())
+    registry = HandlerRegistry(config={}, factories={DEFAULT_HANDLER_NAME: factory})
+
+    registry.warm_up()
+
+    factory.assert_called_once()
+    factory.return_value.warm_up.assert_called_once()
+    assert registry.get() is factory.return_value
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from oracle_server.admission import (
+    AdmissionController,
+    AdmissionSettings,
+    admission_controller,
+    configure_admission,
+)
+from oracle_server.error import OverloadedError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(max_concurrent=2, max_queue=4, max_queue_seconds=10.0, clock=None):
+    return AdmissionController(
+        AdmissionSettings(max_concurrent, max_queue, max_queue_seconds),
+        clock=clock or FakeClock(),
+    )
+
+
+def test_concurrency_is_limited_and_queue_is_fifo():
+    controller = _controller(max_concurrent=2)
+    running = 0
+    peak = 0
+    order = []
+
+    async def request(i):
+        nonlocal running, peak
+        admission = controller.admit()
+        async with admission:
+            running += 1
+            peak = max(peak, running)
+            order.append(i)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(request(i) for i in range(6)))
+
+    asyncio.run(main())
+
+    assert peak == 2
+    assert order == list(range(6))
+    stats = controller.stats()
+    assert (stats["active"], stats["queued"], stats["admitted"]) == (0, 0, 6)
+
+
+def test_full_queue_is_rejected():
+    controller = _controller(max_concurrent=1, max_queue=1)
+    controller.admit()
+    controller.admit()
+
+    with pytest.raises(OverloadedError) as e:
+        controller.admit()
+
+    assert e.value.retry_after >= 1
+    assert controller.stats()["rejected"] == 1
+
+
+def test_long_expected_wait_is_rejected():
+    clock = FakeClock()
+    controller = _controller(max_concurrent=1, max_queue=100, clock=clock)
+
+    async def timed_request(seconds):
+        async with controller.admit():
+            clock.now += seconds
+
+    # Requests take 20s on average from now on.
+    for _ in range(20):
+        asyncio.run(timed_request(20.0))
+    controller.admit()
+
+    with pytest.raises(OverloadedError) as e:
+        controller.admit()
+
+    assert e.value.retry_after == pytest.approx(20, abs=1)
+    assert controller.stats()["expected_wait_seconds"] > 10
+
+
+def test_cancelled_wait_leaves_the_queue():
+    controller = _controller(max_concurrent=1)
+
+    async def main():
+        holder = controller.admit()
+        await holder.wait()
+        waiter = asyncio.ensure_future(controller.admit().wait())
+        await asyncio.sleep(0)
+        assert controller.stats()["queued"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.stats()["queued"] == 0
+        holder.release()
+        holder.release()
+        async with controller.admit():
+            assert controller.stats()["active"] == 1
+
+    asyncio.run(main())
+
+    assert controller.stats()["active"] == 0
+
+
+def test_wait_time_is_recorded():
+    clock = FakeClock()
+    controller = _controller(max_concurrent=1, clock=clock)
+
+    async def main():
+        first = controller.admit()
+        await first.wait()
+        second = controller.admit()
+        clock.now = 3.0
+        first.release()
+        await second.wait()
+        second.release()
+
+    asyncio.run(main())
+
+    assert controller.stats()["max_wait_seconds"] == 3.0
+    assert controller.stats()["avg_wait_seconds"] > 0
+
+
+def test_iterate_holds_slot_while_streaming():
+    controller = _controller(max_concurrent=1)
+
+    async def tokens():
+        for token in ["a", "b"]:
+            assert controller.stats()["active"] == 1
+            yield token
+
+    async def main():
+        return [t async for t in controller.admit().iterate(tokens())]
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert controller.stats()["active"] == 0
+
+
+def test_iterate_closes_stream_and_frees_slot_when_closed_early():
+    controller = _controller(max_concurrent=1)
+    closed = []
+
+    async def tokens():
+        try:
+            for token in ["a", "b", "c"]:
+                yield token
+        finally:
+            closed.append(True)
+
+    async def main():
+        stream = controller.admit().iterate(tokens())
+        assert await anext(stream) == "a"
+        await stream.aclose()
+
+    asyncio.run(main())
+
+    assert closed == [True]
+    assert controller.stats()["active"] == 0
+
+
+def test_limits_scale_with_replicas():
+    configure_admission(AdmissionSettings(max_concurrent=2, max_queue=5))
+    try:
+        settings = admission_controller("a,b,c", replicas=3).settings
+    finally:
+        configure_admission(AdmissionSettings())
+
+    assert (settings.max_concurrent, settings.max_queue) == (6, 15)
@@ -0,0 +1,10 @@
+from a2wsgi import WSGIMiddleware
+
+
+def test_wsgi_thread_pool_is_sized_from_config(flask_app):
+    # Fails if connexion stops serving Flask through the middleware that
+    # `_setup_wsgi_threads` replaces.
+    middleware = flask_app._middleware_app.asgi_app
+
+    assert isinstance(middleware, WSGIMiddleware)
+    assert middleware.executor._max_workers == flask_app.app.config["WSGI_THREADS"]
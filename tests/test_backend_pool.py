@@ -0,0 +1,183 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from oracle_server.backend_pool import (
+    BackendPool,
+    BackendPoolSettings,
+    LatencyHistogram,
+    backend_pool,
+    configure_backend_pools,
+)
+from oracle_server.handlers.handler import BabylonChatHandler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_routes_to_least_outstanding_backend():
+    pool = BackendPool(["a", "b", "c"])
+
+    first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+    pool.release(second, 0.1)
+
+    assert {first, second, third} == {"a", "b", "c"}
+    assert pool.acquire() == second
+
+
+def test_spreads_sequential_requests():
+    pool = BackendPool(["a", "b"])
+    names = []
+    for _ in range(4):
+        with pool.request() as name:
+            names.append(name)
+
+    assert names == ["a", "b", "a", "b"]
+
+
+def test_failing_backend_is_ejected_and_readmitted():
+    clock = FakeClock()
+    pool = BackendPool(
+        ["a", "b"], BackendPoolSettings(eject_failures=2, eject_seconds=10), clock
+    )
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with pool.request() as name:
+                assert name == "a"
+                raise RuntimeError("backend down")
+        pool.release(pool.acquire(), 0.1)
+
+    assert pool.stats()["a"]["ejected"]
+    assert [pool.acquire() for _ in range(3)] == ["b", "b", "b"]
+
+    clock.now = 11
+    assert pool.acquire() == "a"
+    assert pool.stats()["a"]["ejections"] == 1
+
+
+def test_slow_backend_is_ejected():
+    pool = BackendPool(["a", "b"], BackendPoolSettings(eject_failures=1, slow_seconds=5))
+
+    pool.release(pool.acquire(), 30)
+
+    assert pool.stats()["a"]["ejected"]
+    assert pool.stats()["a"]["failures"] == 1
+
+
+def test_cancelled_request_does_not_count_against_backend():
+    pool = BackendPool(["a"], BackendPoolSettings(eject_failures=1))
+
+    with pytest.raises(KeyboardInterrupt):
+        with pool.request():
+            raise KeyboardInterrupt
+
+    stats = pool.stats()["a"]
+    assert (stats["outstanding"], stats["failures"], stats["latency"]["count"]) == (0, 0, 0)
+
+
+def test_all_ejected_routes_to_first_due_back():
+    clock = FakeClock()
+    pool = BackendPool(["a", "b"], BackendPoolSettings(eject_failures=1), clock)
+    pool.release(pool.acquire(), 0.1, ok=False)
+    clock.now = 1
+    pool.release(pool.acquire(), 0.1, ok=False)
+
+    assert pool.acquire() == "a"
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.2, 0.3, 5.0):
+        histogram.observe(seconds)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"0.1": 1, "1.0": 3, "+Inf": 4}
+    assert snapshot["count"] == 4
+    assert snapshot["p50"] == 1.0
+    assert snapshot["p95"] == 5.0
+    assert LatencyHistogram().quantile(0.5) == 0
+
+
+def _completion(content):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "test_llm_model",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+def _fake_backend(name, status=200):
+    """Start a fake OpenAI-compatible server answering with its name."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = json.dumps(
+                _completion(name) if status == 200 else {"error": {"message": "down"}}
+            ).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+@pytest.fixture
+def backends():
+    servers = [_fake_backend("down", status=400), _fake_backend("up")]
+    configure_backend_pools(BackendPoolSettings(eject_failures=1))
+    yield [url for _, url in servers]
+    configure_backend_pools(BackendPoolSettings())
+    for server, _ in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@patch("oracle_server.handlers.handler.ChromaVectorStore")
+def test_handler_balances_between_backends(mock_vector_store, backends):
+    mock_vector_store.return_value.search.return_value = []
+    handler = BabylonChatHandler(
+        embedding_model="test_embedding_model",
+        llm_model="test_llm_model",
+        model_url=backends,
+    )
+
+    with pytest.raises(Exception):
+        list(handler.handle_input_message("hi", thread_id="t0"))
+    answers = [
+        list(handler.handle_input_message("hi", thread_id=f"t{i}"))[-1]["messages"][-1].content
+        for i in range(1, 4)
+    ]
+
+    assert answers == ["up"] * 3
+    stats = backend_pool(handler.backends).stats()
+    assert stats[backends[0]]["ejected"]
+    assert (stats[backends[0]]["requests"], stats[backends[1]]["requests"]) == (1, 3)
+    assert stats[backends[1]]["latency"]["count"] == 3
+    assert handler.backend == ",".join(backends)
@@ -0,0 +1,78 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import START, MessagesState, StateGraph
+
+from oracle_server.checkpoint import SqliteCheckpointSaver, create_checkpointer
+
+
+def _echo_graph(checkpointer):
+    """A graph whose model node replies with the number of messages it has seen."""
+    def model(state: MessagesState):
+        return {"messages": [AIMessage(content=str(len(state["messages"])))]}
+
+    workflow = StateGraph(state_schema=MessagesState)
+    workflow.add_node("model", model)
+    workflow.add_edge(START, "model")
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def _send(graph, thread_id, text):
+    config = {"configurable": {"thread_id": thread_id}}
+    result = graph.invoke({"messages": [HumanMessage(content=text)]}, config)
+    return result["messages"][-1].content
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite")
+
+
+def test_history_survives_across_savers(db_path):
+    # Two savers on the same file stand in for two worker processes.
+    first_worker = _echo_graph(SqliteCheckpointSaver(path=db_path))
+    second_worker = _echo_graph(SqliteCheckpointSaver(path=db_path))
+
+    assert _send(first_worker, "t1", "hello") == "1"
+    assert _send(second_worker, "t1", "again") == "3"
+    assert _send(first_worker, "t1", "and again") == "5"
+
+
+def test_hot_tier_is_bounded(db_path):
+    saver = SqliteCheckpointSaver(path=db_path, hot_threads=2)
+    graph = _echo_graph(saver)
+
+    for thread_id in ("a", "b", "c", "d"):
+        _send(graph, thread_id, "hello")
+
+    assert saver.hot_thread_count == 2
+    # Evicted threads are read back from disk.
+    assert _send(graph, "a", "again") == "3"
+
+
+def test_list_and_delete_thread(db_path):
+    saver = SqliteCheckpointSaver(path=db_path)
+    graph = _echo_graph(saver)
+    _send(graph, "t1", "hello")
+    _send(graph, "t2", "hello")
+
+    config = {"configurable": {"thread_id": "t1"}}
+    checkpoints = list(saver.list(config))
+    assert checkpoints
+    assert list(saver.list(config, limit=1)) == checkpoints[:1]
+
+    saver.delete_thread("t1")
+
+    assert saver.get_tuple(config) is None
+    assert list(saver.list(config)) == []
+    assert saver.get_tuple({"configurable": {"thread_id": "t2"}}) is not None
+
+
+def test_create_checkpointer(db_path):
+    assert isinstance(create_checkpointer({"CHECKPOINT_BACKEND": "memory"}), MemorySaver)
+    saver = create_checkpointer(
+        {"CHECKPOINT_BACKEND": "sqlite", "CHECKPOINT_SQLITE_PATH": db_path}
+    )
+    assert isinstance(saver, SqliteCheckpointSaver)
+    with pytest.raises(ValueError):
+        create_checkpointer({"CHECKPOINT_BACKEND": "redis"})
@@ -0,0 +1,121 @@
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from oracle_server.conversation_memory import (
+    RollingSummaryMemory,
+    Summary,
+    recent_start,
+)
+
+
+def _conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages += [HumanMessage(content=f"question {i}"), AIMessage(content=f"answer {i}")]
+    return messages
+
+
+def _count_messages(messages):
+    """Counts each message as one token."""
+    return len(messages)
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.prompts = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, prompt):
+        self.release.wait()
+        self.prompts.append(prompt)
+        return f"summary of {len(self.prompts)} calls"
+
+
+def _memory(summarize, max_turns=2, token_budget=6):
+    return RollingSummaryMemory(
+        summarize, max_turns=max_turns, token_budget=token_budget, count_tokens=_count_messages
+    )
+
+
+def test_recent_start():
+    messages = _conversation(5)
+
+    assert recent_start(messages, 2) == 6
+    assert recent_start(messages, 5) == 0
+    assert recent_start(messages, 0) == 10
+
+
+def test_prompt_within_budget_is_the_conversation():
+    memory = _memory(RecordingSummarizer())
+    messages = _conversation(3)
+
+    assert memory.prompt_messages(messages, Summary()) == messages
+    assert not memory.schedule("t1", messages, Summary())
+
+
+def test_prompt_over_budget_keeps_recent_turns():
+    memory = _memory(RecordingSummarizer())
+    messages = _conversation(5)
+
+    assert memory.prompt_messages(messages, Summary()) == messages[6:]
+
+
+def test_prompt_with_summary():
+    memory = _memory(RecordingSummarizer())
+    messages = _conversation(3)
+
+    prompt = memory.prompt_messages(messages, Summary("earlier", covered=2))
+
+    assert isinstance(prompt[0], SystemMessage)
+    assert "earlier" in prompt[0].content
+    assert prompt[1:] == messages[2:]
+
+
+def test_summary_is_written_in_background():
+    summarizer = RecordingSummarizer()
+    summarizer.release.clear()
+    memory = _memory(summarizer)
+    messages = _conversation(4)
+
+    assert memory.schedule("t1", messages, Summary())
+    # One summary at a time per thread.
+    assert not memory.schedule("t1", messages, Summary())
+    # Not ready yet: the turn goes on without it.
+    assert memory.latest_summary("t1", Summary()) == Summary()
+
+    summarizer.release.set()
+    memory.wait("t1")
+    summary = memory.latest_summary("t1", Summary())
+
+    assert summary == Summary("summary of 1 calls", covered=4)
+    (prompt,) = summarizer.prompts
+    assert "question 0" in prompt[1].content and "answer 1" in prompt[1].content
+    assert "question 2" not in prompt[1].content
+    # Picked up once.
+    assert memory.latest_summary("t1", summary) == summary
+
+
+def test_summary_folds_in_previous_summary():
+    summarizer = RecordingSummarizer()
+    memory = _memory(summarizer)
+    messages = _conversation(6)
+
+    memory.schedule("t1", messages, Summary("earlier", covered=4))
+    memory.wait("t1")
+
+    assert memory.latest_summary("t1", Summary("earlier", covered=4)).covered == 8
+    assert "Summary so far: earlier" in summarizer.prompts[0][1].content
+    assert "question 1" not in summarizer.prompts[0][1].content
+
+
+def test_failed_summary_keeps_the_old_one():
+    def fail(prompt):
+        raise RuntimeError("model down")
+
+    memory = _memory(fail)
+    memory.schedule("t1", _conversation(4), Summary())
+    memory.wait("t1")
+
+    assert memory.latest_summary("t1", Summary()) == Summary()
@@ -0,0 +1,90 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from oracle_server.embedding_backends import (
+    DEFAULT_EMBEDDING_MODEL,
+    EMBEDDING_BACKENDS,
+    EmbeddingBackend,
+    configure_embedding_backend,
+    get_embedding_backend,
+    register_embedding_backend,
+    warm_up,
+)
+from oracle_server.vectorstore import embeddings
+
+
+@pytest.fixture(autouse=True)
+def backends():
+    with patch.dict(EMBEDDING_BACKENDS):
+        yield
+
+
+@pytest.fixture
+def hf_embeddings():
+    with patch("oracle_server.embedding_backends.HuggingFaceEmbeddings") as mock:
+        yield mock
+
+
+def test_default_backend(hf_embeddings):
+    embeddings(DEFAULT_EMBEDDING_MODEL)
+
+    hf_embeddings.assert_called_once_with(
+        model_name=DEFAULT_EMBEDDING_MODEL,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True, "batch_size": 32},
+    )
+
+
+def test_onnx_backend(hf_embeddings):
+    configure_embedding_backend(f"{DEFAULT_EMBEDDING_MODEL}:onnx-int8", threads=2)
+
+    embeddings(f"{DEFAULT_EMBEDDING_MODEL}:onnx-int8")
+
+    model_kwargs = hf_embeddings.call_args.kwargs["model_kwargs"]
+    assert model_kwargs["backend"] == "onnx"
+    assert model_kwargs["model_kwargs"]["file_name"] == "onnx/model_qint8_avx512_vnni.onnx"
+    assert model_kwargs["model_kwargs"]["session_options"].intra_op_num_threads == 2
+
+
+def test_torch_threads(hf_embeddings):
+    configure_embedding_backend(DEFAULT_EMBEDDING_MODEL, threads=3)
+
+    with patch("oracle_server.embedding_backends._set_torch_threads") as set_threads:
+        embeddings(DEFAULT_EMBEDDING_MODEL)
+
+    set_threads.assert_called_once_with(3)
+
+
+def test_configure_keeps_unset_settings():
+    backend = configure_embedding_backend(
+        DEFAULT_EMBEDDING_MODEL, threads=None, batch_size=64
+    )
+
+    assert backend.batch_size == 64
+    assert backend.threads is None
+    assert get_embedding_backend(DEFAULT_EMBEDDING_MODEL) is backend
+
+
+def test_register_backend(hf_embeddings):
+    register_embedding_backend("local", EmbeddingBackend(model_name="/models/bge"))
+
+    embeddings("local")
+
+    assert hf_embeddings.call_args.kwargs["model_name"] == "/models/bge"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        embeddings("not-a-model")
+    with pytest.raises(ValueError):
+        EmbeddingBackend(model_name="m", runtime="tpu").load()
+
+
+def test_warm_up():
+    model = MagicMock()
+
+    warm_up(model, batch_size=4)
+
+    model.embed_query.assert_called_once()
+    assert len(model.embed_documents.call_args.args[0]) == 4
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from oracle_server.event_loop import BackgroundLoop
+
+
+async def _thread_name():
+    await asyncio.sleep(0)
+    return threading.current_thread().name
+
+
+async def _count(n):
+    for i in range(n):
+        await asyncio.sleep(0)
+        yield i
+
+
+def test_run_from_separate_loops():
+    background = BackgroundLoop("test-loop")
+
+    # Each `asyncio.run` is a separate, short-lived loop, like a request.
+    first = asyncio.run(background.run(_thread_name()))
+    second = asyncio.run(background.run(_thread_name()))
+
+    assert first == second == "test-loop"
+
+
+def test_iterate():
+    background = BackgroundLoop("test-loop")
+
+    assert list(background.iterate(_count(3))) == [0, 1, 2]
+
+
+def test_iterate_closes_iterator_when_stopped_early():
+    background = BackgroundLoop("test-loop")
+    closed = threading.Event()
+
+    async def tokens():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0)
+                yield i
+        finally:
+            closed.set()
+
+    items = background.iterate(tokens())
+    assert next(items) == 0
+    # As when an SSE client disconnects mid-stream.
+    items.close()
+
+    assert closed.wait(timeout=5)
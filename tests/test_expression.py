@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from oracle_server.tools.calculator import calculate
+from oracle_server.tools.expression import compile_expression, evaluate
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2+2", 4),
+        ("10 / 4", 2.5),
+        ("7 // 2 + 7 % 2", 4),
+        ("-(3 - 5) ** 2", -4),
+        ("2 ** 100", 2**100),
+        ("round(2 * pi, 2)", 6.28),
+        ("max(1, 3, 2) + min(4, 5)", 7),
+        ("1 < 2 <= 2", True),
+        ("not 0 and 1", True),
+    ],
+)
+def test_scalar_expressions_match_python(text, expected):
+    assert evaluate(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "__import__('os').system('true')",
+        "().__class__.__bases__",
+        "open('secrets')",
+        "x.real",
+        "lambda: 1",
+        "[1, 2]",
+        "'a' * 3",
+        "abs(x=1)",
+        "2 +",
+    ],
+)
+def test_unsafe_or_invalid_expressions_are_refused(text):
+    with pytest.raises(ValueError):
+        compile_expression(text)
+
+
+def test_huge_exponent_is_refused():
+    with pytest.raises(ValueError, match="Exponent"):
+        evaluate("9 ** 9 ** 9")
+
+
+def test_huge_nested_power_is_refused():
+    with pytest.raises(ValueError, match="digits"):
+        evaluate("(10 ** 10000) ** 1000")
+
+    assert evaluate("(10 ** 100) ** 2") == 10**200
+
+
+def test_series_are_evaluated_element_wise():
+    result = evaluate("round(amount * (1 + rate), 2)", amount=[10.0, 25.5], rate=0.2)
+
+    np.testing.assert_allclose(result, [12.0, 30.6])
+
+
+def test_series_aggregates_and_masks():
+    amounts = [50.0, 150.0, 200.0]
+
+    assert evaluate("sum(where(amount > 100, amount, 0))", amount=amounts) == 350
+    assert evaluate("mean(amount)", amount=amounts) == pytest.approx(133.33, 0.01)
+    assert evaluate("max(amount)", amount=amounts) == 200
+    assert list(evaluate("cumsum(amount)", amount=amounts)) == [50, 200, 400]
+
+
+def test_dates_are_compared_in_days():
+    late = evaluate(
+        "days(paid - due)",
+        paid=["2025-01-10", "2025-02-01"],
+        due=["2025-01-01", "2025-02-03"],
+    )
+
+    assert list(late) == [9.0, -2.0]
+
+
+def test_compiled_expressions_are_cached():
+    expression = compile_expression("a * b + 1")
+
+    assert compile_expression("a * b + 1") is expression
+    assert expression.variables == {"a", "b"}
+    assert expression.evaluate(a=2, b=3) == 7
+    with pytest.raises(ValueError, match="Missing"):
+        expression.evaluate(a=2)
+
+
+def test_calculator():
+    assert calculate("2+2") == "The result of 2+2 is 4."
+    assert calculate("1/0").startswith("Error calculating expression")
+    assert calculate("__import__('os')").startswith("Error calculating expression")
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from oracle_server.http_client import HttpClientPool, HttpPoolSettings
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_reuses_connections(server_url):
+    pool = HttpClientPool(HttpPoolSettings(max_connections=4))
+
+    for _ in range(3):
+        assert pool.client.get(server_url).text == "ok"
+
+    stats = pool.stats()
+    assert (stats["requests"], stats["connections"], stats["idle"]) == (3, 1, 1)
+    assert stats["utilization"] == 0
+    assert pool.client is pool.client
+
+
+def test_async_client_reuses_connections(server_url):
+    pool = HttpClientPool()
+
+    async def get_three():
+        for _ in range(3):
+            await pool.async_client.get(server_url)
+
+    asyncio.run(get_three())
+
+    assert (pool.stats()["requests"], pool.stats()["connections"]) == (3, 1)
+
+
+def test_streamed_response_holds_a_connection(server_url):
+    pool = HttpClientPool(HttpPoolSettings(max_connections=4))
+
+    with pool.client.stream("GET", server_url):
+        stats = pool.stats()
+        assert (stats["busy"], stats["utilization"]) == (1, 0.25)
+    assert pool.stats()["busy"] == 0
+
+
+def test_configure_applies_settings():
+    pool = HttpClientPool()
+    client = pool.client
+
+    pool.configure(HttpPoolSettings(connect_timeout=1, read_timeout=9))
+
+    assert pool.client is not client
+    assert pool.client.timeout.connect == 1
+    assert pool.client.timeout.read == 9
+    assert pool.stats()["requests"] == 0
@@ -0,0 +1,350 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from oracle_server.ingestion import (
+    EmbeddingPool,
+    IngestionManifest,
+    batched,
+    chunk_documents,
+    data_lake_collections,
+    ingest,
+    record_documents,
+)
+from oracle_server.vectorstore import NumpyVectorStore
+
+MODEL = "BAAI/bge-small-en-v1.5"
+
+
+class FakeCursor:
+    """A cursor over a list of records, counting the records it hands out."""
+
+    def __init__(self, collection, batch_size):
+        self._collection = collection
+        self.batch_size = batch_size
+        self.closed = False
+
+    def __iter__(self):
+        for record in self._collection.records:
+            self._collection.read += 1
+            yield record
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    def __init__(self, records):
+        self.records = records
+        self.read = 0
+        self.cursors = []
+
+    def find(self, query, sort=None, batch_size=0):
+        assert query == {}
+        cursor = FakeCursor(self, batch_size)
+        self.cursors.append(cursor)
+        return cursor
+
+
+class FakeDatabase:
+    """Stands in for a pymongo `Database`."""
+
+    def __init__(self, collections):
+        self.collections = {
+            name: FakeCollection(records) for name, records in collections.items()
+        }
+
+    def list_collection_names(self):
+        return list(self.collections)
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def _transactions(count, start=0):
+    return [
+        {
+            "_id": i,
+            "TransactionId": f"t-{i}",
+            "Description": f"Coffee shop {i}",
+            "Amount": 3.5 + i,
+            "Tags": ["food"],
+        }
+        for i in range(start, start + count)
+    ]
+
+
+class RecordingStore:
+    """A vector store which records its writes and what had been read by then."""
+
+    def __init__(self, database):
+        self._database = database
+        self.batches = []
+        self.read_at_write = []
+        self.deleted = []
+
+    def upsert_documents(self, documents):
+        self.batches.append(documents)
+        self.read_at_write.append(
+            sum(c.read for c in self._database.collections.values())
+        )
+
+    def delete_documents(self, ids):
+        self.deleted.extend(ids)
+
+
+@pytest.fixture
+def database():
+    return FakeDatabase(
+        {
+            "chase-data-2024": _transactions(45),
+            "chase-data-2025": _transactions(30, start=45),
+            "other": _transactions(5, start=100),
+        }
+    )
+
+
+def test_data_lake_collections_match_prefix(database):
+    assert data_lake_collections(database, "chase-data-") == [
+        "chase-data-2024",
+        "chase-data-2025",
+    ]
+
+
+def test_record_documents():
+    (document,) = record_documents([("chase-data-2024", _transactions(1)[0])])
+
+    assert document.page_content == (
+        "TransactionId: t-0\nDescription: Coffee shop 0\nAmount: 3.5\nTags: ['food']"
+    )
+    assert document.metadata == {
+        "TransactionId": "t-0",
+        "Description": "Coffee shop 0",
+        "Amount": 3.5,
+        "source": "chase-data-2024",
+        "record_id": "0",
+    }
+
+
+def test_record_document_ids_follow_content():
+    record = _transactions(1)[0]
+    (document,) = record_documents([("chase-data-2024", record)])
+    (same,) = record_documents([("chase-data-2024", dict(record))])
+    (other_collection,) = record_documents([("chase-data-2025", record)])
+    (edited,) = record_documents([("chase-data-2024", {**record, "Amount": 4})])
+
+    assert document.id == same.id
+    assert len({document.id, other_collection.id, edited.id}) == 3
+
+
+def test_chunk_documents_splits_long_text():
+    document = Document(page_content="word " * 100, metadata={"source": "s"})
+
+    chunks = list(chunk_documents([document], chunk_size=100, chunk_overlap=0))
+
+    assert len(chunks) > 1
+    assert all(len(chunk.page_content) <= 100 for chunk in chunks)
+    assert [chunk.metadata["chunk"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk.metadata["source"] == "s" for chunk in chunks)
+    assert all(chunk.metadata["chunks"] == len(chunks) for chunk in chunks)
+
+
+def test_chunk_ids_derive_from_document_id():
+    document = Document(page_content="word " * 100, id="doc")
+
+    chunks = list(chunk_documents([document], chunk_size=100, chunk_overlap=0))
+
+    assert [chunk.id for chunk in chunks] == [f"doc:{i}" for i in range(len(chunks))]
+    assert all(chunk.metadata["document_id"] == "doc" for chunk in chunks)
+
+
+def test_batched():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert not list(batched([], 3))
+    with pytest.raises(ValueError):
+        list(batched(range(3), 0))
+
+
+def test_ingest_writes_bounded_batches(database):
+    store = RecordingStore(database)
+
+    stats = ingest(database, store, cursor_batch_size=7, write_batch_size=10)
+
+    assert [len(batch) for batch in store.batches] == [10] * 7 + [5]
+    assert (stats.collections, stats.records, stats.chunks, stats.batches) == (
+        2,
+        75,
+        75,
+        8,
+    )
+    sources = {doc.metadata["source"] for batch in store.batches for doc in batch}
+    assert sources == {"chase-data-2024", "chase-data-2025"}
+    assert database["other"].read == 0
+    cursors = [c for name in sources for c in database[name].cursors]
+    assert all(c.batch_size == 7 and c.closed for c in cursors)
+
+
+def test_ingest_streams_records(database):
+    """Records are read as batches are written, not all up front."""
+    store = RecordingStore(database)
+
+    ingest(database, store, write_batch_size=10)
+
+    assert store.read_at_write[:3] == [10, 20, 30]
+
+
+def test_ingest_into_numpy_store(tmp_path, database):
+    model = DeterministicFakeEmbedding(size=16)
+    with patch("oracle_server.vectorstore.embeddings", return_value=model):
+        store = NumpyVectorStore(model=MODEL, data_dir=str(tmp_path), collection="t")
+        ingest(database, store, write_batch_size=16)
+
+        assert len(store) == 75
+        (document, _), *_ = store.similarity_search(
+            "TransactionId: t-3\nDescription: Coffee shop 3\nAmount: 6.5\n"
+            "Tags: ['food']",
+            top_k=1,
+        )
+    assert document.metadata["record_id"] == "3"
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    texts: list = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def numpy_store(tmp_path):
+    model = CountingEmbedding(size=16, texts=[])
+    with patch("oracle_server.vectorstore.embeddings", return_value=model):
+        yield NumpyVectorStore(model=MODEL, data_dir=str(tmp_path), collection="t")
+
+
+def _ingest(database, store, path, model=MODEL, pool=None):
+    manifest = IngestionManifest(str(path), model=model)
+    try:
+        return ingest(
+            database, store, write_batch_size=16, manifest=manifest, pool=pool
+        )
+    finally:
+        manifest.close()
+
+
+def test_reingest_skips_unchanged_records(tmp_path, database, numpy_store):
+    manifest_path = tmp_path / "manifest.sqlite"
+    _ingest(database, numpy_store, manifest_path)
+    numpy_store.model.texts.clear()
+
+    stats = _ingest(database, numpy_store, manifest_path)
+
+    assert not numpy_store.model.texts
+    assert (stats.records, stats.unchanged, stats.chunks, stats.deleted) == (
+        75,
+        75,
+        0,
+        0,
+    )
+    assert len(numpy_store) == 75
+
+
+def test_reingest_embeds_changes_and_deletes_vanished(
+    tmp_path, database, numpy_store
+):
+    manifest_path = tmp_path / "manifest.sqlite"
+    _ingest(database, numpy_store, manifest_path)
+    numpy_store.model.texts.clear()
+    records = database["chase-data-2024"].records
+    records[0] = {**records[0], "Description": "Bakery"}
+    del records[1]
+    records.append(_transactions(1, start=200)[0])
+
+    stats = _ingest(database, numpy_store, manifest_path)
+
+    assert len(numpy_store.model.texts) == 2
+    assert (stats.unchanged, stats.chunks, stats.deleted) == (73, 2, 2)
+    assert len(numpy_store) == 75
+    record_ids = {doc.metadata["record_id"] for doc in numpy_store._documents}
+    assert "1" not in record_ids and "200" in record_ids
+    descriptions = [
+        doc.page_content for doc in numpy_store._documents
+        if doc.metadata["record_id"] == "0"
+    ]
+    assert descriptions == [
+        "TransactionId: t-0\nDescription: Bakery\nAmount: 3.5\nTags: ['food']"
+    ]
+
+
+def test_reingest_with_another_model_embeds_everything(
+    tmp_path, database, numpy_store
+):
+    manifest_path = tmp_path / "manifest.sqlite"
+    _ingest(database, numpy_store, manifest_path)
+    numpy_store.model.texts.clear()
+
+    stats = _ingest(database, numpy_store, manifest_path, model="other-model")
+
+    assert len(numpy_store.model.texts) == 75
+    assert (stats.unchanged, stats.deleted) == (0, 0)
+    assert len(numpy_store) == 75
+
+
+def test_ingest_without_manifest_does_not_duplicate(database, numpy_store):
+    ingest(database, numpy_store, write_batch_size=16)
+    ingest(database, numpy_store, write_batch_size=16)
+
+    assert len(numpy_store) == 75
+
+
+def _fake_model():
+    return DeterministicFakeEmbedding(size=16)
+
+
+def _shared_memory_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+def test_ingest_with_worker_pool(tmp_path, database, numpy_store):
+    blocks = _shared_memory_blocks()
+
+    with EmbeddingPool(_fake_model, workers=2) as pool:
+        stats = _ingest(database, numpy_store, tmp_path / "manifest.sqlite", pool=pool)
+
+    # Embedded on the workers, not by the store's model.
+    assert not numpy_store.model.texts
+    assert (stats.records, stats.chunks) == (75, 75)
+    assert len(numpy_store) == 75
+    (document, distance), *_ = numpy_store.similarity_search(
+        "TransactionId: t-3\nDescription: Coffee shop 3\nAmount: 6.5\n"
+        "Tags: ['food']",
+        top_k=1,
+    )
+    assert document.metadata["record_id"] == "3"
+    assert distance == pytest.approx(0.0, abs=1e-5)
+    assert _shared_memory_blocks() <= blocks
+
+
+def test_worker_pool_splits_large_batches(tmp_path, database, numpy_store):
+    store = RecordingStore(database)
+    store.upsert_embeddings = lambda chunks, vectors: store.batches.append(
+        (chunks, vectors)
+    )
+
+    with EmbeddingPool(_fake_model, workers=1) as pool:
+        ingest(
+            database,
+            store,
+            write_batch_size=10,
+            chunk_size=40,
+            chunk_overlap=0,
+            pool=pool,
+        )
+
+    assert all(len(chunks) <= 10 for chunks, _ in store.batches)
+    assert all(vectors.shape == (len(chunks), 16) for chunks, vectors in store.batches)
+    assert sum(len(chunks) for chunks, _ in store.batches) > 75
@@ -0,0 +1,75 @@
+import pytest
+from langchain_core.documents import Document
+
+from oracle_server.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+TRANSACTIONS = {
+    "0": "Coffee shop Blue Bottle 4.50",
+    "1": "Grocery store Whole Foods 82.17",
+    "2": "Gas station Shell 45.00",
+    "3": "Coffee shop Starbucks 5.25",
+    "4": "Rent payment 1,850.00",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(tmp_path / "test")
+    index.add(
+        [Document(page_content=text, id=doc_id) for doc_id, text in TRANSACTIONS.items()]
+    )
+    return index
+
+
+def test_tokenize_keeps_amounts():
+    assert tokenize("Paid $1,850.00 to ACME-42") == ["paid", "1850.00", "to", "acme", "42"]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=1)
+
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == pytest.approx(1 / 2 + 1 / 3)
+
+
+def test_search_ranks_exact_tokens(index):
+    assert [doc_id for doc_id, _ in index.search("starbucks", 5)] == ["3"]
+    assert {doc_id for doc_id, _ in index.search("coffee", 5)} == {"0", "3"}
+    assert index.search("1,850.00", 5)[0][0] == "4"
+    assert index.search("unknown", 5) == []
+
+
+def test_add_replaces_documents_with_same_id(index):
+    index.add([Document(page_content="Bookstore Powell's", id="3")])
+
+    assert len(index) == len(TRANSACTIONS)
+    assert index.search("starbucks", 5) == []
+    assert [doc_id for doc_id, _ in index.search("bookstore", 5)] == ["3"]
+
+
+def test_delete(index):
+    index.delete(["0", "missing"])
+
+    assert len(index) == len(TRANSACTIONS) - 1
+    assert [doc_id for doc_id, _ in index.search("coffee", 5)] == ["3"]
+
+
+def test_index_persists(index, tmp_path):
+    index.delete(["2"])
+    reopened = BM25Index(tmp_path / "test")
+
+    assert len(reopened) == len(TRANSACTIONS) - 1
+    assert [doc_id for doc_id, _ in reopened.search("whole foods", 5)] == ["1"]
+    assert reopened.search("shell", 5) == []
+
+
+def test_small_segments_are_merged(tmp_path):
+    index = BM25Index(tmp_path / "test")
+    for i in range(64):
+        index.add([Document(page_content=f"merchant{i} purchase", id=str(i))])
+
+    assert len(index) == 64
+    # Merging keeps a logarithmic number of segments.
+    assert len(list(tmp_path.glob("test.bm25.*.docs.npy"))) <= 7
+    assert [doc_id for doc_id, _ in index.search("merchant17", 5)] == ["17"]
+    assert len(index.search("purchase", 100)) == 64
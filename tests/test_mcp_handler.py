@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from oracle_server.error import ToolError
+from oracle_server.mcp_handler import ahandle_mcp_request, handle_mcp_request, parse_tool_calls
+from oracle_server.tools.registry import TOOLS, ToolCall, ToolRegistry
+
+
+def test_parse_tool_calls():
+    calls = parse_tool_calls(
+        "[get_weather(location=London)] and [calculate(expression=(2+3)*4)]"
+    )
+
+    assert calls == [
+        ToolCall("get_weather", {"location": "London"}),
+        ToolCall("calculate", {"expression": "(2+3)*4"}),
+    ]
+
+
+def test_handle_single_tool_call():
+    assert handle_mcp_request({"user_input": "[get_weather(location=London)]"}) == {
+        "response": "The weather in London is sunny."
+    }
+
+
+def test_handle_from_running_event_loop():
+    async def from_async_controller():
+        return handle_mcp_request({"user_input": "[get_weather(location=London)]"})
+
+    assert asyncio.run(from_async_controller()) == {
+        "response": "The weather in London is sunny."
+    }
+
+
+def test_handle_without_tool_call():
+    assert handle_mcp_request({"user_input": "Hello"}) == {
+        "response": "I can help with that."
+    }
+
+
+def test_handle_invalid_parameters():
+    assert handle_mcp_request({"user_input": "[calculate(2+2)]"}) == {
+        "response": "Invalid tool parameters."
+    }
+
+
+def test_unknown_tool_and_arguments_are_reported():
+    response = handle_mcp_request(
+        {"user_input": "[nope(a=1)] [get_weather(city=Paris)] [calculate(expression=1+1)]"}
+    )["response"].split("\n")
+
+    assert response[0] == "Unknown tool: nope"
+    assert response[1].startswith("Invalid parameters for get_weather")
+    assert response[2] == "The result of 1+1 is 2."
+
+
+def test_builtin_tools_are_declared():
+    names = [schema["name"] for schema in TOOLS.schemas()]
+
+    assert {"calculate", "get_weather"} <= set(names)
+    assert TOOLS.get("calculate").schema()["inputSchema"]["required"] == ["expression"]
+
+
+@pytest.fixture
+def registry():
+    registry = ToolRegistry(timeout_seconds=0.5)
+
+    @registry.tool(name="sleep", description="Sleep", parameters={
+        "type": "object", "properties": {"seconds": {}}, "required": ["seconds"],
+    })
+    def sleep(seconds):
+        time.sleep(float(seconds))
+        return f"slept {seconds}"
+
+    @registry.tool(name="asleep", description="Sleep asynchronously", parameters={
+        "type": "object", "properties": {"seconds": {}},
+    })
+    async def asleep(seconds="0"):
+        await asyncio.sleep(float(seconds))
+        return f"awoke after {seconds}"
+
+    @registry.tool(name="fail", description="Fail")
+    def fail():
+        raise RuntimeError("broken")
+
+    return registry
+
+
+def test_calls_run_concurrently(registry):
+    calls = [ToolCall("sleep", {"seconds": "0.2"}) for _ in range(3)]
+    calls.append(ToolCall("asleep", {"seconds": "0.2"}))
+
+    start = time.perf_counter()
+    results = asyncio.run(registry.execute(calls))
+
+    assert [r.output for r in results] == ["slept 0.2"] * 3 + ["awoke after 0.2"]
+    assert time.perf_counter() - start < 0.5
+
+
+def test_slow_call_times_out_without_blocking_others(registry):
+    start = time.perf_counter()
+    response = asyncio.run(
+        ahandle_mcp_request(
+            {"user_input": "[asleep(seconds=5)] [sleep(seconds=2)] [asleep(seconds=0)]"},
+            registry=registry,
+        )
+    )["response"].split("\n")
+
+    assert response[0] == "asleep timed out after 0.5s"
+    assert response[1] == "sleep timed out after 0.5s"
+    assert response[2] == "awoke after 0"
+    assert time.perf_counter() - start < 1.5
+
+
+def test_failing_tool(registry):
+    with pytest.raises(ToolError, match="fail failed: broken"):
+        asyncio.run(registry.call(ToolCall("fail")))
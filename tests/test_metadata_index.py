@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+
+from oracle_server.metadata_index import MetadataIndex, chroma_where, matches
+
+ROWS = [
+    {"Account": "checking", "UtcTimestamp": "2025-08-30", "Amount": 12.5},
+    {"Account": "savings", "UtcTimestamp": "2025-09-01", "Amount": 100},
+    {"Account": "checking", "UtcTimestamp": "2025-09-15", "Amount": 4.25},
+    {"Account": "checking", "UtcTimestamp": "2025-10-01", "Amount": 60},
+    {"Account": "credit", "Amount": "n/a"},
+]
+
+
+@pytest.fixture(params=[256, 0], ids=["bitmaps", "sorted-only"])
+def index(request):
+    documents = [Document(page_content="", metadata=row) for row in ROWS]
+    return MetadataIndex(documents, bitmap_max_values=request.param)
+
+
+@pytest.mark.parametrize(
+    "where, positions",
+    [
+        ({}, [0, 1, 2, 3, 4]),
+        ({"Account": "checking"}, [0, 2, 3]),
+        ({"Account": {"$in": ["savings", "credit"]}}, [1, 4]),
+        ({"UtcTimestamp": {"$gte": "2025-09-01", "$lt": "2025-10-01"}}, [1, 2]),
+        ({"Account": "checking", "UtcTimestamp": {"$gt": "2025-09-01"}}, [2, 3]),
+        ({"Amount": {"$lte": 12.5}}, [0, 2]),
+        ({"Amount": {"$gt": 50}, "Account": "savings"}, [1]),
+        ({"Amount": "n/a"}, [4]),
+        ({"Account": "brokerage"}, []),
+        ({"Missing": 1}, []),
+    ],
+)
+def test_select(index, where, positions):
+    assert index.select(where).tolist() == positions
+    assert [i for i, row in enumerate(ROWS) if matches(row, where)] == positions
+
+
+def test_invalid_filters_are_rejected(index):
+    with pytest.raises(ValueError):
+        index.select({"Amount": {"$regex": "1.*"}})
+    with pytest.raises(ValueError):
+        index.select({"Account": {"$in": "checking"}})
+    with pytest.raises(ValueError):
+        index.select({"Tags": ["food"]})
+
+
+def test_chroma_where():
+    assert chroma_where({}) is None
+    assert chroma_where({"Account": "checking"}) == {"Account": {"$eq": "checking"}}
+    assert chroma_where({"Account": "checking", "Amount": {"$gt": 5, "$lt": 9}}) == {
+        "$and": [
+            {"Account": {"$eq": "checking"}},
+            {"Amount": {"$gt": 5}},
+            {"Amount": {"$lt": 9}},
+        ]
+    }
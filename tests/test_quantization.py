@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from oracle_server.quantization import (
+    BinaryIndex,
+    Int8Index,
+    create_compact_index,
+    quantize_binary,
+    quantize_int8,
+)
+
+
+def _unit_vectors(count, dim=64, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_quantize_int8_round_trip():
+    vectors = _unit_vectors(10)
+    codes, scales = quantize_int8(vectors)
+
+    assert codes.dtype == np.int8
+    assert np.abs(codes).max() == 127
+    np.testing.assert_allclose(codes * scales[:, None], vectors, atol=0.01)
+
+
+def test_quantize_binary_packs_sign_bits():
+    codes = quantize_binary(np.array([[1.0, -1.0, 0.5, -0.5, 1, 1, 1, 1, -1]]))
+
+    assert codes.tolist() == [[0b10101111, 0b00000000]]
+
+
+@pytest.mark.parametrize("index_type", [Int8Index, BinaryIndex])
+def test_candidates_contain_nearest_neighbours(tmp_path, index_type):
+    vectors = _unit_vectors(2000, dim=384)
+    # Queries close to some documents, as real questions are to their answers.
+    queries = vectors[:20] + 0.05 * _unit_vectors(20, dim=384, seed=1)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    index = index_type(tmp_path / "test")
+    index.add(vectors[:1000])
+    index.add(vectors[1000:])
+
+    for query in queries:
+        assert np.argmax(vectors @ query) in index.candidates(query, 20)
+    assert len(index) == len(vectors)
+    assert index.nbytes < vectors.nbytes / 3
+
+
+@pytest.mark.parametrize("name", ["int8", "binary"])
+def test_save_and_load(tmp_path, name):
+    vectors = _unit_vectors(100)
+    index = create_compact_index(name, tmp_path / "test")
+    index.add(vectors)
+    index.save()
+
+    loaded = create_compact_index(name, tmp_path / "test")
+
+    assert loaded.load()
+    np.testing.assert_array_equal(loaded.scores(vectors[0]), index.scores(vectors[0]))
+    assert not create_compact_index(name, tmp_path / "other").load()
+
+
+def test_unknown_quantization(tmp_path):
+    with pytest.raises(ValueError):
+        create_compact_index("pq", tmp_path / "test")
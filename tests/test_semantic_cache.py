@@ -0,0 +1,68 @@
+from oracle_server.semantic_cache import SemanticCache, create_semantic_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_similar_question_hits():
+    cache = SemanticCache(threshold=0.9)
+    cache.store([1.0, 0.0], "rent was $2000")
+
+    assert cache.lookup([0.95, 0.05]) == "rent was $2000"
+    assert cache.lookup([0.0, 1.0]) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_best_match_wins():
+    cache = SemanticCache(threshold=0.5)
+    cache.store([1.0, 0.0], "first")
+    cache.store([0.0, 1.0], "second")
+
+    assert cache.lookup([0.2, 0.9]) == "second"
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = SemanticCache(ttl_seconds=10, clock=clock)
+    cache.store([1.0, 0.0], "answer")
+
+    clock.now = 9
+    assert cache.lookup([1.0, 0.0]) == "answer"
+    clock.now = 10
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.store([1.0, 0.0, 0.0], "a")
+    cache.store([0.0, 1.0, 0.0], "b")
+    cache.lookup([1.0, 0.0, 0.0])
+    cache.store([0.0, 0.0, 1.0], "c")
+
+    assert cache.lookup([1.0, 0.0, 0.0]) == "a"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([0.0, 0.0, 1.0]) == "c"
+
+
+def test_corpus_change_drops_answers():
+    cache = SemanticCache()
+    cache.store([1.0, 0.0], "answer", corpus_version=1)
+
+    assert cache.lookup([1.0, 0.0], corpus_version=1) == "answer"
+    assert cache.lookup([1.0, 0.0], corpus_version=2) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_create_semantic_cache():
+    assert create_semantic_cache({}) is None
+    cache = create_semantic_cache(
+        {"SEMANTIC_CACHE_ENABLED": True, "SEMANTIC_CACHE_THRESHOLD": 0.8}
+    )
+    assert cache is not None
+    assert cache.threshold == 0.8
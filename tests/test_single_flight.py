@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from oracle_server.single_flight import SingleFlight
+
+
+def _blocking_call(release, calls):
+    def call():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "result"
+
+    return call
+
+
+def _wait_for(predicate):
+    for _ in range(500):
+        if predicate():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("Timed out")
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [
+            pool.submit(flight.do, "key", _blocking_call(release, calls))
+            for _ in range(4)
+        ]
+        _wait_for(lambda: flight.stats()["calls"] == 4)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 4, "coalesced": 3, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_finished_calls_are_not_cached():
+    flight = SingleFlight("test")
+    calls = []
+
+    flight.do("key", lambda: calls.append(1))
+    flight.do("key", lambda: calls.append(1))
+
+    assert len(calls) == 2
+
+
+def test_error_is_shared_and_cleared():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fail():
+        release.wait(timeout=5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(flight.do, "key", fail) for _ in range(2)]
+        _wait_for(lambda: flight.stats()["calls"] == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result(timeout=5)
+
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_async_calls_share_one_result():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def burst():
+        return await asyncio.gather(*(flight.ado("key", work) for _ in range(3)))
+
+    assert asyncio.run(burst()) == ["answer"] * 3
+    assert len(calls) == 1
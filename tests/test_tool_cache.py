@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from oracle_server.tools.cache import ToolCachePolicy, ToolResultCache
+from oracle_server.tools.registry import ToolCall, ToolRegistry
+
+LATENCY_SECONDS = 0.2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeWeatherUpstream(BaseHTTPRequestHandler):
+    """Answers GET /weather?locations=a,b after a delay; rejects 'nowhere'."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+    forecast = "sunny"
+
+    def do_GET(self):
+        locations = self.path.split("locations=", 1)[1].split(",")
+        FakeWeatherUpstream.requests.append(locations)
+        time.sleep(LATENCY_SECONDS)
+        body = json.dumps(
+            {
+                location: None if location == "nowhere" else self.forecast
+                for location in locations
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    FakeWeatherUpstream.requests = []
+    FakeWeatherUpstream.forecast = "sunny"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWeatherUpstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def registry(upstream, clock):
+    registry = ToolRegistry(cache=ToolResultCache(clock=clock))
+
+    def fetch(locations):
+        response = httpx.get(f"{upstream}/weather?locations={','.join(locations)}")
+        forecasts = response.json()
+        return [
+            ValueError(f"unknown location {location}")
+            if forecasts[location] is None
+            else f"{location}: {forecasts[location]}"
+            for location in locations
+        ]
+
+    def weather(location):
+        result = fetch([location])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    registry.tool(
+        name="weather",
+        description="Weather",
+        parameters={"type": "object", "properties": {"location": {}}},
+        cache=ToolCachePolicy(ttl_seconds=60, negative_ttl_seconds=10, stale_seconds=30),
+        batch=lambda calls: fetch([call["location"] for call in calls]),
+    )(weather)
+    return registry
+
+
+def _calls(*locations):
+    return [ToolCall("weather", {"location": location}) for location in locations]
+
+
+def _outputs(results):
+    return [result.output if result.ok else result.error for result in results]
+
+
+def test_batch_makes_one_upstream_call(registry):
+    start = time.perf_counter()
+    results = asyncio.run(registry.execute(_calls("London", "Paris", "Rome", "London")))
+
+    assert _outputs(results) == [
+        "London: sunny", "Paris: sunny", "Rome: sunny", "London: sunny"
+    ]
+    assert FakeWeatherUpstream.requests == [["London", "Paris", "Rome"]]
+    assert time.perf_counter() - start < 2 * LATENCY_SECONDS
+
+
+def test_cached_results_skip_upstream(registry):
+    asyncio.run(registry.execute(_calls("London", "Paris")))
+
+    start = time.perf_counter()
+    results = asyncio.run(registry.execute(_calls("Paris", "Rome", "London")))
+
+    assert _outputs(results) == ["Paris: sunny", "Rome: sunny", "London: sunny"]
+    # Only the uncached location was fetched.
+    assert FakeWeatherUpstream.requests[1:] == [["Rome"]]
+    assert registry.stats()["cache_hits"] == 2
+    assert time.perf_counter() - start < 2 * LATENCY_SECONDS
+
+
+def test_failures_are_cached_for_their_negative_ttl(registry, clock):
+    for _ in range(2):
+        with pytest.raises(Exception, match="unknown location nowhere"):
+            asyncio.run(registry.call(ToolCall("weather", {"location": "nowhere"})))
+    assert len(FakeWeatherUpstream.requests) == 1
+
+    clock.now = 11
+    asyncio.run(registry.execute(_calls("nowhere")))
+    assert len(FakeWeatherUpstream.requests) == 2
+
+
+def test_stale_result_is_served_and_refreshed(registry, clock):
+    asyncio.run(registry.call(ToolCall("weather", {"location": "London"})))
+    FakeWeatherUpstream.forecast = "rainy"
+
+    clock.now = 70
+    start = time.perf_counter()
+    stale = asyncio.run(registry.call(ToolCall("weather", {"location": "London"})))
+
+    assert stale == "London: sunny"
+    assert time.perf_counter() - start < LATENCY_SECONDS
+    while registry.cache.stats()["refreshing"]:
+        time.sleep(0.01)
+    assert len(FakeWeatherUpstream.requests) == 2
+    fresh = asyncio.run(registry.call(ToolCall("weather", {"location": "London"})))
+    assert fresh == "London: rainy"
+
+
+def test_expired_result_is_fetched_again(registry, clock):
+    asyncio.run(registry.call(ToolCall("weather", {"location": "London"})))
+
+    clock.now = 100
+    asyncio.run(registry.call(ToolCall("weather", {"location": "London"})))
+
+    assert len(FakeWeatherUpstream.requests) == 2
+
+
+def test_cache_is_bounded():
+    cache = ToolResultCache(max_entries=2)
+    policy = ToolCachePolicy(ttl_seconds=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, policy, output=key)
+
+    assert cache.get("a") is None
+    assert cache.get("c").output == "c"
+    assert cache.stats()["entries"] == 2
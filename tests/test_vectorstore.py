@@ -0,0 +1,673 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from oracle_server.error import VectorDBError
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from oracle_server.vectorstore import (
+    ChromaVectorStore,
+    EmbeddingBatcher,
+    EmbeddingCache,
+    NumpyVectorStore,
+    _append_rows,
+    create_vector_store,
+    normalize_query,
+)
+
+MODEL = "BAAI/bge-small-en-v1.5"
+
+
+def _normalized(vector):
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector]
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """
+    A fake embedding model which counts forward passes. Like bge, it
+    returns unit-length embeddings.
+    """
+
+    query_calls: int = 0
+    batches: list = []
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return _normalized(super().embed_query(text))
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [_normalized(vector) for vector in super().embed_documents(texts)]
+
+
+@pytest.fixture
+def embedding_model():
+    model = CountingEmbedding(size=16, batches=[])
+    with patch("oracle_server.vectorstore.embeddings", return_value=model):
+        yield model
+
+
+@pytest.fixture
+def store(tmp_path, embedding_model):
+    store = ChromaVectorStore(
+        model=MODEL,
+        sqlite_dir=str(tmp_path / "chroma"),
+        collection="test",
+        embedding_cache=EmbeddingCache(),
+    )
+    store.add_documents(
+        [Document(page_content="rent"), Document(page_content="groceries")]
+    )
+    return store
+
+
+def test_repeated_query_skips_forward_pass(store, embedding_model):
+    first = store.similarity_search("How much did I spend on rent?", top_k=1)
+    second = store.similarity_search("  how much did I   spend on RENT? ", top_k=1)
+
+    assert embedding_model.query_calls == 1
+    assert [doc.page_content for doc, _ in first] == [
+        doc.page_content for doc, _ in second
+    ]
+    assert store.embedding_cache.stats()["hits"] == 1
+    assert store.embedding_cache.stats()["misses"] == 1
+
+
+def test_cached_embedding_matches_model(store, embedding_model):
+    expected = embedding_model.embed_query("rent")
+    store.embed_query("rent")
+
+    assert store.embed_query("rent") == pytest.approx(expected, rel=1e-6)
+
+
+def test_cache_keys_include_model():
+    cache = EmbeddingCache()
+    cache.put("model-a", "rent", [1.0, 2.0])
+
+    assert cache.get("model-b", "rent") is None
+    assert cache.get("model-a", "RENT") == [1.0, 2.0]
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = EmbeddingCache()
+    cache.put("m", "a", [0.0] * 4)
+    entry_bytes = cache.stats()["bytes"]
+    cache.resize(2 * entry_bytes)
+    cache.put("m", "b", [1.0] * 4)
+    cache.get("m", "a")
+    cache.put("m", "c", [2.0] * 4)
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") is not None
+    assert cache.get("m", "c") is not None
+    assert cache.stats()["bytes"] <= 2 * entry_bytes
+
+
+def test_normalize_query():
+    assert normalize_query("  Hello\tWORLD \n") == "hello world"
+
+
+def test_add_documents_bumps_corpus_version(store):
+    version = store.corpus_version
+    store.add_documents([Document(page_content="utilities")])
+
+    assert store.corpus_version == version + 1
+
+
+def test_batch_search_matches_single_searches(store, embedding_model):
+    queries = ["rent", "groceries", "RENT"]
+    embedding_model.batches.clear()
+
+    results = store.similarity_search_batch(queries, top_k=2)
+
+    # One forward pass, for the distinct uncached queries only.
+    assert embedding_model.batches == [["rent", "groceries"]]
+    assert [result.query for result in results] == queries
+    for query, result in zip(queries, results):
+        assert result.ok
+        expected = store.similarity_search(query, top_k=2)
+        assert [doc.page_content for doc, _ in result.records] == [
+            doc.page_content for doc, _ in expected
+        ]
+        assert [score for _, score in result.records] == pytest.approx(
+            [score for _, score in expected]
+        )
+
+
+def test_batch_search_isolates_failing_queries(store):
+    def search(query_text, top_k):
+        if query_text == "bad":
+            raise VectorDBError(message="failed", cause=None)
+        return [(Document(page_content=query_text), 0.0)]
+
+    with patch.object(
+        store.db_client._collection, "query", side_effect=RuntimeError("down")
+    ), patch.object(store, "similarity_search", side_effect=search):
+        results = store.similarity_search_batch(["rent", "bad", "groceries"])
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error.message == "failed"
+    assert results[2].records[0][0].page_content == "groceries"
+
+
+def test_batch_search_empty(store):
+    assert store.similarity_search_batch([]) == []
+
+
+class SlowBatchEmbedder:
+    """Fake forward pass which costs the same however many texts it embeds."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text))] for text in texts]
+
+
+def test_batcher_coalesces_concurrent_requests():
+    embedder = SlowBatchEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch=64, max_wait_ms=20)
+    texts = [f"query {'x' * i}" for i in range(32)]
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher.embed, texts))
+
+    assert results == [[float(len(text))] for text in texts]
+    assert len(embedder.batches) < len(texts) / 4
+    stats = batcher.stats()
+    assert stats["items"] == len(texts)
+    assert stats["batches"] == len(embedder.batches)
+    assert stats["queue_depth"] == 0
+    assert stats["max_queue_depth"] >= 1
+
+
+def test_batcher_respects_max_batch():
+    embedder = SlowBatchEmbedder(delay=0)
+    batcher = EmbeddingBatcher(embedder, max_batch=4, max_wait_ms=50)
+
+    futures = [batcher.submit(str(i)) for i in range(10)]
+    [future.result() for future in futures]
+
+    assert max(len(batch) for batch in embedder.batches) <= 4
+    assert batcher.stats()["largest_batch"] <= 4
+
+
+def test_batcher_fails_whole_batch():
+    def failing(texts):
+        raise RuntimeError("model crashed")
+
+    batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+
+    with pytest.raises(RuntimeError):
+        batcher.embed("rent")
+
+
+def test_store_embeds_queries_through_batcher(store, embedding_model):
+    store.enable_batching(max_batch=8, max_wait_ms=1)
+    embedding_model.batches.clear()
+
+    embedding = store.embed_query("utilities")
+
+    assert embedding_model.batches == [["utilities"]]
+    assert embedding_model.query_calls == 0
+    assert embedding == pytest.approx(
+        embedding_model.embed_query("utilities"), rel=1e-6
+    )
+
+
+TRANSACTIONS = ["rent", "groceries", "utilities", "coffee", "gym"]
+
+
+@pytest.fixture
+def numpy_store(tmp_path, embedding_model):
+    store = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path / "vectors"),
+        collection="test",
+        embedding_cache=EmbeddingCache(),
+    )
+    store.add_documents(
+        [
+            Document(page_content=text, metadata={"rank": i}, id=str(i))
+            for i, text in enumerate(TRANSACTIONS)
+        ]
+    )
+    return store
+
+
+def test_numpy_store_exact_match_ranks_first(numpy_store):
+    results = numpy_store.similarity_search("groceries", top_k=3)
+
+    assert len(results) == 3
+    document, distance = results[0]
+    assert document.page_content == "groceries"
+    assert document.metadata == {"rank": 1}
+    assert distance == pytest.approx(0.0, abs=1e-5)
+    assert [score for _, score in results] == sorted(score for _, score in results)
+
+
+def test_numpy_store_matches_chroma_ranking(numpy_store, tmp_path):
+    chroma = ChromaVectorStore(
+        model=MODEL,
+        sqlite_dir=str(tmp_path / "chroma"),
+        collection="test",
+        embedding_cache=EmbeddingCache(),
+    )
+    chroma.add_documents([Document(page_content=text) for text in TRANSACTIONS])
+
+    for query in TRANSACTIONS:
+        assert [
+            doc.page_content for doc, _ in numpy_store.similarity_search(query, 3)
+        ] == [doc.page_content for doc, _ in chroma.similarity_search(query, 3)]
+
+
+def test_numpy_store_persists(numpy_store, tmp_path):
+    reopened = NumpyVectorStore(
+        model=MODEL, data_dir=str(tmp_path / "vectors"), collection="test"
+    )
+
+    assert len(reopened) == len(TRANSACTIONS)
+    assert reopened.similarity_search("coffee", top_k=1)[0][0].id == "3"
+
+
+def test_numpy_store_batch_search(numpy_store):
+    results = numpy_store.similarity_search_batch(["gym", "rent"], top_k=2)
+
+    assert [result.records[0][0].page_content for result in results] == ["gym", "rent"]
+    assert all(result.ok for result in results)
+
+
+def test_numpy_store_empty(tmp_path, embedding_model):
+    store = NumpyVectorStore(model=MODEL, data_dir=str(tmp_path), collection="empty")
+
+    assert store.similarity_search("rent") == []
+
+
+def test_create_vector_store(tmp_path, embedding_model):
+    store = create_vector_store(
+        {"VECTOR_STORE_BACKEND": "numpy", "NUMPY_VECTOR_DIR": str(tmp_path)}, MODEL
+    )
+    assert isinstance(store, NumpyVectorStore)
+
+    with pytest.raises(ValueError):
+        create_vector_store({"VECTOR_STORE_BACKEND": "faiss"}, MODEL)
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_numpy_store_rescores_exactly(
+    tmp_path, embedding_model, quantization
+):
+    store = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path),
+        collection="test",
+        embedding_cache=EmbeddingCache(),
+        quantization=quantization,
+        rescore_factor=2,
+    )
+    store.add_documents([Document(page_content=text) for text in TRANSACTIONS])
+
+    document, distance = store.similarity_search("utilities", top_k=1)[0]
+
+    assert document.page_content == "utilities"
+    # Results are scored on the full vectors, not the compact codes.
+    assert distance == pytest.approx(0.0, abs=1e-5)
+    assert store.index_bytes < 4 * 16 * len(TRANSACTIONS)
+
+
+def test_quantized_index_is_built_for_existing_store(numpy_store, tmp_path):
+    reopened = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path / "vectors"),
+        collection="test",
+        quantization="int8",
+    )
+
+    assert reopened.index_bytes == len(TRANSACTIONS) * (16 + 4)
+    assert reopened.similarity_search("gym", top_k=1)[0][0].page_content == "gym"
+    assert (tmp_path / "vectors" / "test.int8.codes.npy").exists()
+
+
+def test_numpy_store_upsert_replaces_by_id(numpy_store, tmp_path):
+    numpy_store.upsert_documents(
+        [
+            Document(page_content="mortgage", metadata={"rank": 0}, id="0"),
+            Document(page_content="travel", metadata={"rank": 5}, id="5"),
+        ]
+    )
+
+    assert len(numpy_store) == len(TRANSACTIONS) + 1
+    assert numpy_store.similarity_search("mortgage", top_k=1)[0][0].id == "0"
+    assert numpy_store.similarity_search("rent", top_k=1)[0][0].page_content != "rent"
+    reopened = NumpyVectorStore(
+        model=MODEL, data_dir=str(tmp_path / "vectors"), collection="test"
+    )
+    assert [doc.page_content for doc in reopened._documents][:2] == [
+        "mortgage",
+        "groceries",
+    ]
+
+
+@pytest.mark.parametrize("quantization", [None, "int8", "binary"])
+def test_numpy_store_writes_grow_files_in_place(
+    tmp_path, embedding_model, quantization
+):
+    store = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path / "vectors"),
+        collection="test",
+        quantization=quantization,
+    )
+    store.add_documents([Document(page_content="rent", id="0")])
+    vectors_path = tmp_path / "vectors" / "test.npy"
+    documents_path = tmp_path / "vectors" / "test.jsonl"
+    inodes = (vectors_path.stat().st_ino, documents_path.stat().st_ino)
+
+    with patch("oracle_server.vectorstore._save_array") as save_array:
+        store.add_documents([Document(page_content="groceries", id="1")])
+        store.upsert_documents(
+            [
+                Document(page_content="mortgage", id="0"),
+                Document(page_content="coffee", id="2"),
+            ]
+        )
+    save_array.assert_not_called()
+
+    assert (vectors_path.stat().st_ino, documents_path.stat().st_ino) == inodes
+    reopened = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path / "vectors"),
+        collection="test",
+        quantization=quantization,
+    )
+    assert [doc.page_content for doc in reopened._documents] == [
+        "mortgage",
+        "groceries",
+        "coffee",
+    ]
+    assert np.allclose(reopened._vectors, store._vectors)
+    assert reopened.similarity_search("mortgage", top_k=1)[0][0].id == "0"
+
+
+def test_append_rows_drops_rows_of_interrupted_append(tmp_path):
+    path = tmp_path / "rows.npy"
+    _append_rows(path, np.ones((2, 3), dtype=np.float32))
+    # Rows written past the header's count, as by an append cut short.
+    with path.open("ab") as npy_file:
+        npy_file.write(b"\0" * 5)
+
+    _append_rows(path, np.full((1, 3), 2, dtype=np.float32))
+
+    assert np.load(path).tolist() == [[1, 1, 1], [1, 1, 1], [2, 2, 2]]
+    with pytest.raises(ValueError):
+        _append_rows(path, np.ones((1, 4), dtype=np.float32))
+
+
+def test_numpy_store_upsert_requires_ids(numpy_store):
+    with pytest.raises(ValueError):
+        numpy_store.upsert_documents([Document(page_content="travel")])
+
+
+@pytest.mark.parametrize("quantization", [None, "int8"])
+def test_numpy_store_delete(numpy_store, tmp_path, quantization):
+    store = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path / "vectors"),
+        collection="test",
+        quantization=quantization,
+    )
+    version = store.corpus_version
+
+    store.delete_documents(["1", "3", "missing"])
+
+    assert len(store) == len(TRANSACTIONS) - 2
+    assert store.corpus_version == version + 1
+    assert store.similarity_search("groceries", top_k=1)[0][0].page_content != (
+        "groceries"
+    )
+    assert store.similarity_search("gym", top_k=1)[0][0].id == "4"
+    reopened = NumpyVectorStore(
+        model=MODEL,
+        data_dir=str(tmp_path / "vectors"),
+        collection="test",
+        quantization=quantization,
+    )
+    assert [doc.id for doc in reopened._documents] == ["0", "2", "4"]
+    store.delete_documents(["0", "2", "4"])
+    assert store.similarity_search("gym") == []
+
+
+def test_chroma_store_upsert_and_delete(tmp_path, embedding_model):
+    store = ChromaVectorStore(
+        model=MODEL,
+        sqlite_dir=str(tmp_path / "chroma"),
+        collection="test",
+        embedding_cache=EmbeddingCache(),
+    )
+    documents = [Document(page_content=text, id=text) for text in TRANSACTIONS]
+    store.upsert_documents(documents)
+    store.upsert_documents(documents)
+
+    assert len(store.similarity_search("rent", top_k=10)) == len(TRANSACTIONS)
+
+    store.delete_documents(["rent"])
+
+    assert "rent" not in {doc.id for doc, _ in store.similarity_search("rent", 10)}
+
+
+MERCHANTS = [
+    "Coffee shop Blue Bottle 4.50",
+    "Grocery store Whole Foods 82.17",
+    "Gas station Shell 45.00",
+    "Coffee shop Starbucks 5.25",
+    "Rent payment 1850.00",
+]
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_hybrid_search_finds_exact_tokens(tmp_path, embedding_model, backend):
+    store = create_vector_store(
+        {
+            "VECTOR_STORE_BACKEND": backend,
+            "CHROMA_SQLITE_DIR": str(tmp_path),
+            "NUMPY_VECTOR_DIR": str(tmp_path),
+            "HYBRID_RETRIEVAL": True,
+        },
+        MODEL,
+    )
+    store.add_documents([Document(page_content=text) for text in MERCHANTS])
+
+    # The fake embeddings rank documents at random; BM25 finds the merchant.
+    (document, score), *_ = store.search("How much at Starbucks?", top_k=2)
+
+    assert document.page_content == "Coffee shop Starbucks 5.25"
+    assert score > 0
+    assert len(store.search("whole foods 82.17", top_k=10)) == len(MERCHANTS)
+
+
+def test_hybrid_search_follows_upserts_and_deletes(tmp_path, embedding_model):
+    store = NumpyVectorStore(
+        model=MODEL, data_dir=str(tmp_path), collection="test", hybrid=True
+    )
+    store.upsert_documents(
+        [Document(page_content=text, id=str(i)) for i, text in enumerate(MERCHANTS)]
+    )
+    store.upsert_documents([Document(page_content="Bookstore Powell's", id="3")])
+    store.delete_documents(["1"])
+
+    assert store.lexical_index.search("starbucks", 5) == []
+    assert store.search("powell's", top_k=1)[0][0].id == "3"
+    assert "1" not in {doc.id for doc, _ in store.search("whole foods", top_k=10)}
+
+
+def test_hybrid_index_is_built_for_existing_store(numpy_store, tmp_path):
+    reopened = NumpyVectorStore(
+        model=MODEL, data_dir=str(tmp_path / "vectors"), collection="test", hybrid=True
+    )
+
+    assert len(reopened.lexical_index) == len(TRANSACTIONS)
+    assert reopened.search("utilities", top_k=1)[0][0].id == "2"
+
+
+def test_search_without_lexical_index_is_similarity_search(numpy_store):
+    assert numpy_store.lexical_index is None
+    assert numpy_store.search("gym", top_k=2) == numpy_store.similarity_search(
+        "gym", top_k=2
+    )
+
+
+def _dated_documents():
+    return [
+        Document(
+            page_content=f"transaction {i}",
+            metadata={
+                "Account": "checking" if i % 2 else "savings",
+                "UtcTimestamp": f"2025-{i % 12 + 1:02d}-15",
+                "Amount": float(i),
+            },
+            id=str(i),
+        )
+        for i in range(48)
+    ]
+
+
+def test_numpy_store_filtered_search(tmp_path, embedding_model):
+    store = NumpyVectorStore(model=MODEL, data_dir=str(tmp_path), collection="test")
+    store.add_documents(_dated_documents())
+    where = {
+        "Account": "savings",
+        "UtcTimestamp": {"$gte": "2025-09-01", "$lt": "2025-10-01"},
+    }
+
+    results = store.similarity_search("transaction 20", top_k=10, where=where)
+
+    assert sorted(doc.id for doc, _ in results) == ["20", "32", "44", "8"]
+    assert results[0][0].id == "20"
+    assert results[0][1] == pytest.approx(0.0, abs=1e-5)
+    assert not store.similarity_search("x", where={**where, "Account": "checking"})
+
+
+def test_numpy_store_filter_follows_writes(tmp_path, embedding_model):
+    store = NumpyVectorStore(model=MODEL, data_dir=str(tmp_path), collection="test")
+    store.add_documents(_dated_documents())
+    where = {"Amount": {"$gte": 46}}
+    assert {doc.id for doc, _ in store.similarity_search("x", 5, where=where)} == {
+        "46",
+        "47",
+    }
+
+    store.delete_documents(["47"])
+    store.add_documents(
+        [Document(page_content="refund", metadata={"Amount": 99.0}, id="99")]
+    )
+
+    assert {doc.id for doc, _ in store.similarity_search("x", 5, where=where)} == {
+        "46",
+        "99",
+    }
+    with pytest.raises(VectorDBError):
+        store.similarity_search("x", where={"Amount": {"$like": 1}})
+
+
+def test_chroma_store_filtered_search(tmp_path, embedding_model):
+    store = ChromaVectorStore(model=MODEL, sqlite_dir=str(tmp_path), collection="test")
+    store.add_documents(_dated_documents())
+
+    results = store.similarity_search(
+        "x", top_k=50, where={"Account": "savings", "Amount": {"$lt": 10}}
+    )
+
+    assert sorted(int(doc.id) for doc, _ in results) == [0, 2, 4, 6, 8]
+
+
+def test_hybrid_search_applies_filter(tmp_path, embedding_model):
+    store = NumpyVectorStore(
+        model=MODEL, data_dir=str(tmp_path), collection="test", hybrid=True
+    )
+    store.add_documents(_dated_documents())
+
+    results = store.search("transaction 3", top_k=48, where={"Account": "savings"})
+
+    assert results
+    assert all(doc.metadata["Account"] == "savings" for doc, _ in results)
+
+
+def test_hybrid_search_match_all_filter_keeps_ranking(tmp_path, embedding_model):
+    store = NumpyVectorStore(
+        model=MODEL, data_dir=str(tmp_path), collection="test", hybrid=True
+    )
+    store.add_documents(_dated_documents())
+    where = {"Account": {"$in": ["checking", "savings"]}}
+
+    def ranking(query, **kwargs):
+        return [(doc.id, score) for doc, score in store.search(query, 2, **kwargs)]
+
+    # Lexical hits fetched to check the filter get no dense rank.
+    for i in range(0, 48, 4):
+        query = f"transaction {i + 1}"
+        assert ranking(query, where=where) == ranking(query)
+
+
+def test_warm_up_bypasses_cache(store, embedding_model):
+    embedding_model.batches.clear()
+    store.warm_up()
+
+    assert embedding_model.query_calls == 1
+    assert len(embedding_model.batches) == 1
+    assert store.embedding_cache.stats()["entries"] == 0
+
+
+def test_concurrent_identical_searches_are_coalesced(numpy_store):
+    release = threading.Event()
+    similarity_search = numpy_store.similarity_search
+
+    def slow_search(*args, **kwargs):
+        release.wait(timeout=5)
+        return similarity_search(*args, **kwargs)
+
+    with patch.object(
+        numpy_store, "similarity_search", side_effect=slow_search
+    ) as search:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [
+                pool.submit(numpy_store.search, query, 2)
+                for query in ("gym", " GYM", "gym")
+            ]
+            while numpy_store.search_stats["calls"] < 3:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+    assert search.call_count == 1
+    assert results[0] == results[1] == results[2]
+    assert numpy_store.search_stats["coalesced"] == 2
+
+
+def test_corpus_version_is_shared_between_processes(tmp_path, embedding_model):
+    def open_store():
+        return ChromaVectorStore(
+            model=MODEL,
+            sqlite_dir=str(tmp_path / "chroma"),
+            collection="shared",
+            embedding_cache=EmbeddingCache(),
+        )
+
+    server, ingestion = open_store(), open_store()
+    version = server.corpus_version
+
+    # As the ingestion CLI writing to the collection the server reads.
+    ingestion.add_documents([Document(page_content="utilities")])
+    ingestion.delete_documents(["missing"])
+
+    assert server.corpus_version == version + 2